@@ -0,0 +1,1002 @@
+# api/flowme_endpoints.py
+"""
+Endpoints API FlowMe - Architecture complète
+Intègre le moteur de conscience éthique
+"""
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Union
+from datetime import datetime
+import json
+import asyncio
+import logging
+
+from core.flowme_core import FlowMeCore
+from flowme_catalog import Catalog, CatalogGroup, project_item
+from flowme_deep_responses import generate_enhanced_response
+from flowme_events import EVENT_HEARTBEAT_SECONDS, Subscription, event_bus, parse_last_event_id
+from flowme_features import MessageFeatures
+from flowme_logging import log_interaction
+from flowme_nocodb import export_interaction
+from flowme_session_state import get_session_backend
+from flowme_sessions import SessionStore
+from flowme_store import get_store, record_interaction
+from flowme_ws import WS_QUEUE_SIZE, OrderedWorkQueue, connections as ws_connections, ws_stats
+
+if TYPE_CHECKING:
+    from states.state_analyzer import StateAnalyzer
+
+# Router principal
+router = APIRouter(prefix="/api/v1", tags=["FlowMe Core"])
+
+# État des sessions (FLOWME_SESSION_BACKEND) : sqlite le partage entre workers,
+# événements compris (SSE et WebSocket reçoivent les transitions de tous les workers)
+session_backend = get_session_backend()
+event_bus.attach_relay(session_backend.event_relay())
+# Backend local (memory) : l'état reste dans le moteur, évincé avec lui
+engine_state_backend = session_backend if session_backend.shared else None
+
+# Un moteur FlowMe par session, borné et évincé (LRU + inactivité + mémoire)
+DEFAULT_SESSION_KEY = "anonymous"
+session_store: SessionStore[FlowMeCore] = SessionStore(
+    factory=lambda key: FlowMeCore(session_id=key, state_backend=engine_state_backend))
+
+def _session_key(session_id: Optional[str] = None, user_id: Optional[str] = None) -> str:
+    """Clé de session : session_id, sinon user_id, sinon session anonyme"""
+    return session_id or user_id or DEFAULT_SESSION_KEY
+
+def _get_engine(session_id: Optional[str] = None, user_id: Optional[str] = None) -> FlowMeCore:
+    """Moteur de la session (créé si nécessaire)"""
+    return session_store.get(_session_key(session_id, user_id))
+
+def _load_engine(key: str) -> FlowMeCore:
+    """Moteur résident ou temporaire, à jour de l'état partagé (bloquant)"""
+    engine = session_store.peek(key) or FlowMeCore(session_id=key, state_backend=engine_state_backend)
+    engine.sync_state()
+    return engine
+
+async def _peek_engine(session_id: Optional[str] = None, user_id: Optional[str] = None) -> FlowMeCore:
+    """
+    Moteur de la session pour lecture seule (à jour de l'état partagé), sans créer de session résidente
+    
+    Le verrou du moteur et le backend d'état ne sont pris que hors de la boucle d'événements.
+    """
+    return await asyncio.to_thread(_load_engine, _session_key(session_id, user_id))
+
+_analyzer: Optional["StateAnalyzer"] = None
+
+def _get_analyzer() -> "StateAnalyzer":
+    """Analyseur d'états partagé, sans état propre (numpy importé au premier usage)"""
+    global _analyzer
+    if _analyzer is None:
+        from states.state_analyzer import StateAnalyzer
+        _analyzer = StateAnalyzer()
+    return _analyzer
+
+# Modèles de données
+class MessageRequest(BaseModel):
+    message: str = Field(..., min_length=1, max_length=2000, description="Message utilisateur")
+    user_id: Optional[str] = Field(default="anonymous", description="Identifiant utilisateur")
+    context: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Contexte additionnel")
+    session_id: Optional[str] = Field(default=None, description="Identifiant de session")
+
+class StateTransitionRequest(BaseModel):
+    target_state: int = Field(..., ge=1, le=64, description="État cible (1-64)")
+    reason: Optional[str] = Field(default="manual", description="Raison de la transition")
+    context: Optional[Dict[str, Any]] = Field(default_factory=dict)
+    session_id: Optional[str] = Field(default=None, description="Identifiant de session")
+
+class AnalysisRequest(BaseModel):
+    message: str = Field(..., min_length=1)
+    session_id: Optional[str] = Field(default=None, description="Identifiant de session")
+    deep_analysis: bool = Field(default=False, description="Analyse approfondie")
+    include_alternatives: bool = Field(default=False, description="Inclure les états alternatifs")
+
+class FlowMeResponse(BaseModel):
+    status: str
+    detected_state: int
+    state_info: Dict[str, Any]
+    response_text: str
+    ethical_validation: Dict[str, Any]
+    flow_quality: float
+    timestamp: str
+    session_context: Optional[Dict[str, Any]] = None
+
+# Sessions actives WebSocket
+active_websockets: Dict[str, WebSocket] = {}
+
+@router.post("/interact", response_model=FlowMeResponse)
+async def interact_with_flowme(request: MessageRequest,
+                               verbose_ethics: bool = Query(default=False,
+                                                            description="Rapport éthique détaillé")):
+    """
+    Interaction principale avec le moteur FlowMe
+    Traite un message et retourne une réponse adaptée
+    
+    ethical_validation vaut {"passed", "warning_mask"} ; ?verbose_ethics=1
+    renvoie le rapport détaillé par principe.
+    """
+    try:
+        # Enrichissement du contexte
+        enriched_context = {
+            **request.context,
+            "user_id": request.user_id,
+            "session_id": request.session_id,
+            "api_version": "v1",
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        # Traitement par le moteur FlowMe de la session, hors de la boucle d'événements
+        # (verrou du moteur partagé avec les WebSocket, backend d'état bloquant)
+        engine = _get_engine(request.session_id, request.user_id)
+        result = await asyncio.to_thread(
+            engine.process_interaction, request.message, enriched_context, verbose_ethics=verbose_ethics
+        )
+        
+        # Construction de la réponse
+        response = FlowMeResponse(
+            status="success",
+            detected_state=result["state"],
+            state_info=_extract_state_info(result["state"]),
+            response_text=result["response"],
+            ethical_validation=result["ethical_validation"],
+            flow_quality=result["flow_quality"],
+            timestamp=result["timestamp"],
+            session_context=_build_session_context(engine, result["context"])
+        )
+        
+        # Les changements d'état sont diffusés aux WebSocket et SSE par le bus d'événements
+        
+        # Logging pour analytics et historique durable (écriture différée)
+        _log_interaction(request, result)
+        _record_interaction("interact", request.session_id, request.user_id, request.message, result)
+        
+        return response
+        
+    except Exception as e:
+        logging.error(f"Erreur dans interact_with_flowme: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur de traitement: {str(e)}")
+
+@router.post("/analyze")
+async def analyze_message(request: AnalysisRequest):
+    """
+    Analyse approfondie d'un message sans interaction
+    Utile pour comprendre les mécanismes de détection
+    """
+    try:
+        analyzer = _get_analyzer()
+        features = MessageFeatures(request.message)  # Extraites une fois pour toutes les analyses
+        
+        # Analyse des émotions
+        emotional_analysis = analyzer._analyze_emotions(features)
+        
+        # Analyse contextuelle
+        context = {"original_message": request.message}
+        contextual_analysis = analyzer._analyze_context(features, context)
+        
+        # Analyse linguistique
+        linguistic_analysis = analyzer._analyze_linguistics(features)
+        
+        # Recommandation d'état
+        engine = await _peek_engine(request.session_id)
+        history = engine.state_history
+        recommended_state = analyzer.analyze_and_recommend(
+            features, context, history
+        )
+        
+        response = {
+            "status": "success",
+            "message_analysis": {
+                "emotional": emotional_analysis,
+                "contextual": contextual_analysis,
+                "linguistic": linguistic_analysis
+            },
+            "recommended_state": recommended_state,
+            "state_info": _extract_state_info(recommended_state),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        # Analyse approfondie si demandée
+        if request.deep_analysis:
+            response["deep_analysis"] = _perform_deep_analysis(features, analyzer)
+            # Réponse enrichie reproductible pour la session et le tour
+            response["enhanced_response"] = generate_enhanced_response(
+                features, recommended_state, history, session_id=engine.session_id
+            )
+        
+        # États alternatifs si demandés
+        if request.include_alternatives:
+            response["alternative_states"] = _get_alternative_states(
+                features, analyzer, recommended_state, history
+            )
+        
+        return response
+        
+    except Exception as e:
+        logging.error(f"Erreur dans analyze_message: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur d'analyse: {str(e)}")
+
+@router.post("/transition")
+async def manual_state_transition(request: StateTransitionRequest):
+    """
+    Transition manuelle vers un état spécifique
+    Permet de forcer un changement d'état avec validation éthique
+    """
+    try:
+        # Validation de l'état cible
+        if not _is_valid_state(request.target_state):
+            raise HTTPException(status_code=400, detail="État cible invalide")
+        
+        engine = _get_engine(request.session_id)
+        
+        def transition():
+            # Validation éthique puis exécution, hors de la boucle d'événements
+            engine.sync_state()
+            current_state = engine.current_state
+            transition_validation = _validate_transition(current_state, request.target_state)
+            
+            if not transition_validation["allowed"]:
+                raise HTTPException(
+                    status_code=403, 
+                    detail=f"Transition non autorisée: {transition_validation['reason']}"
+                )
+            
+            engine._execute_state_transition(request.target_state, request.context)
+            return current_state, transition_validation
+        
+        current_state, transition_validation = await asyncio.to_thread(transition)
+        
+        # Génération de la réponse adaptée au nouvel état
+        adapted_response = _generate_transition_response(request.target_state, request.reason)
+        
+        return {
+            "status": "success",
+            "previous_state": current_state,
+            "new_state": request.target_state,
+            "state_info": _extract_state_info(request.target_state),
+            "response": adapted_response,
+            "transition_validation": transition_validation,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Erreur dans manual_state_transition: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur de transition: {str(e)}")
+
+@router.get("/state/current")
+async def get_current_state(session_id: Optional[str] = Query(default=None)):
+    """Retourne l'état actuel du moteur FlowMe de la session"""
+    try:
+        engine = await _peek_engine(session_id)
+        state_info = engine.get_current_state_info()
+        
+        return {
+            "status": "success",
+            "current_state": state_info,
+            "history_summary": _summarize_history(engine),
+            "session_metrics": _calculate_session_metrics(engine),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logging.error(f"Erreur dans get_current_state: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
+
+def _build_states_catalog() -> Dict[str, Any]:
+    from states.state_definitions import FLOWME_STATES, SYMBOLIC_FAMILIES
+    
+    states_by_family = {}
+    
+    for family_name in SYMBOLIC_FAMILIES.keys():
+        states_by_family[family_name] = []
+    
+    for state_id, state_data in FLOWME_STATES.items():
+        family = state_data.get("famille_symbolique", "Inconnu")
+        if family not in states_by_family:
+            states_by_family[family] = []
+        
+        states_by_family[family].append({
+            "id": state_id,
+            "name": state_data["name"],
+            "description": state_data.get("description", ""),
+            "mot_cle": state_data.get("mot_cle", ""),
+            "posture_adaptative": state_data.get("posture_adaptative", "")
+        })
+    
+    # Trier les états par ID dans chaque famille
+    for family in states_by_family:
+        states_by_family[family].sort(key=lambda x: x["id"])
+    
+    return {
+        "status": "success",
+        "total_states": len(FLOWME_STATES),
+        "families": len(SYMBOLIC_FAMILIES),
+        "states_by_family": states_by_family,
+        "family_descriptions": SYMBOLIC_FAMILIES,
+        "architecture_principle": FlowMeCore.core_principle
+    }
+
+def _build_state_catalog(state_id: int) -> Dict[str, Any]:
+    from states.state_definitions import FLOWME_STATES
+    
+    state_data = FLOWME_STATES[state_id]
+    
+    # Analyse de compatibilité
+    analyzer = _get_analyzer()
+    compatible_states = analyzer.state_compatibility_matrix.get(state_id, [])
+    
+    return {
+        "status": "success",
+        "state": {
+            "id": state_id,
+            **state_data
+        },
+        "compatible_states": [
+            {"id": comp_id, "name": FLOWME_STATES[comp_id]["name"]}
+            for comp_id in compatible_states
+            if comp_id in FLOWME_STATES
+        ],
+        "transition_quality": _calculate_transition_qualities(state_id)
+    }
+
+def _build_families_catalog() -> Dict[str, Any]:
+    from states.state_definitions import SYMBOLIC_FAMILIES, FLOWME_STATES
+    
+    families_overview = {}
+    
+    for family_name, family_data in SYMBOLIC_FAMILIES.items():
+        # Compter les états de cette famille
+        family_states = [
+            state_id for state_id, state_data in FLOWME_STATES.items()
+            if state_data.get("famille_symbolique") == family_name
+        ]
+        
+        families_overview[family_name] = {
+            **family_data,
+            "state_count": len(family_states),
+            "state_ids": sorted(family_states),
+            "representative_states": family_states[:3] if family_states else []
+        }
+    
+    return {
+        "status": "success",
+        "families": families_overview,
+        "total_families": len(SYMBOLIC_FAMILIES),
+        "philosophical_foundation": "Architecture éthique de Stefan Hoareau"
+    }
+
+# Catalogues statiques : sérialisés une fois, servis avec ETag / Last-Modified
+states_catalog = Catalog(
+    build=_build_states_catalog,
+    project=lambda payload, fields: {
+        **payload,
+        "states_by_family": {
+            family: [project_item(state, fields) for state in states]
+            for family, states in payload["states_by_family"].items()
+        }
+    },
+    allowed_fields=lambda payload: {
+        field for states in payload["states_by_family"].values() for state in states for field in state
+    }
+)
+
+state_catalogs = CatalogGroup(lambda state_id: Catalog(
+    build=lambda: _build_state_catalog(state_id),
+    project=lambda payload, fields: {**payload, "state": project_item(payload["state"], fields)},
+    allowed_fields=lambda payload: payload["state"].keys()
+))
+
+families_catalog = Catalog(
+    build=_build_families_catalog,
+    project=lambda payload, fields: {
+        **payload,
+        "families": {name: project_item(family, fields) for name, family in payload["families"].items()}
+    },
+    allowed_fields=lambda payload: {field for family in payload["families"].values() for field in family}
+)
+
+def _catalog_error(e: Exception, endpoint: str) -> HTTPException:
+    if isinstance(e, ValueError):
+        return HTTPException(status_code=400, detail=str(e))
+    logging.error(f"Erreur dans {endpoint}: {e}")
+    return HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
+
+@router.get("/states")
+async def list_all_states(request: Request, fields: Optional[str] = Query(default=None)):
+    """Liste tous les 64 états FlowMe avec leurs informations"""
+    try:
+        return states_catalog.response(request.headers, fields)
+    except Exception as e:
+        raise _catalog_error(e, "list_all_states")
+
+@router.get("/states/{state_id}")
+async def get_state_details(state_id: int, request: Request,
+                            session_id: Optional[str] = Query(default=None),
+                            fields: Optional[str] = Query(default=None)):
+    """
+    Détails complets d'un état spécifique
+    
+    Les statistiques d'usage ne sont incluses que pour une session donnée ;
+    sans session_id, la réponse est servie depuis le catalogue en cache.
+    """
+    try:
+        if not _is_valid_state(state_id):
+            raise HTTPException(status_code=404, detail="État non trouvé")
+        
+        catalog = state_catalogs.get(state_id)
+        if session_id is None:
+            return catalog.response(request.headers, fields)
+        
+        return {
+            **catalog.entry(fields).payload,
+            "usage_statistics": _get_state_usage_stats(await _peek_engine(session_id), state_id),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _catalog_error(e, "get_state_details")
+
+@router.get("/families")
+async def get_families_overview(request: Request,
+                                session_id: Optional[str] = Query(default=None),
+                                fields: Optional[str] = Query(default=None)):
+    """
+    Vue d'ensemble des 6 familles symboliques
+    
+    Les statistiques d'usage ne sont incluses que pour une session donnée.
+    """
+    try:
+        if session_id is None:
+            return families_catalog.response(request.headers, fields)
+        
+        payload = families_catalog.entry(fields).payload
+        engine = await _peek_engine(session_id)
+        
+        return {
+            **payload,
+            "families": {
+                family_name: {**family, "usage_statistics": _get_family_usage_stats(engine, family_name)}
+                for family_name, family in payload["families"].items()
+            }
+        }
+        
+    except Exception as e:
+        raise _catalog_error(e, "get_families_overview")
+
+@router.post("/session/reset")
+async def reset_session(session_id: Optional[str] = Query(default=None)):
+    """Remet à zéro la session FlowMe"""
+    try:
+        engine = await _peek_engine(session_id)
+        previous_state = engine.current_state
+        session_summary = _generate_session_summary(engine)
+        
+        await asyncio.to_thread(engine.reset_session)
+        session_store.discard(_session_key(session_id))
+        
+        return {
+            "status": "success",
+            "message": "Session réinitialisée avec succès",
+            "previous_state": previous_state,
+            "new_state": engine.current_state,
+            "session_summary": session_summary,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logging.error(f"Erreur dans reset_session: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
+
+@router.get("/analytics/flow")
+async def get_flow_analytics(session_id: Optional[str] = Query(default=None)):
+    """Analytics du flux des états et interactions"""
+    try:
+        engine = await _peek_engine(session_id)
+        analytics = {
+            "session_metrics": _calculate_session_metrics(engine),
+            "state_distribution": _analyze_state_distribution(engine),
+            "transition_patterns": _analyze_transition_patterns(engine),
+            "ethical_compliance": _analyze_ethical_compliance(),
+            "flow_quality_trends": _analyze_flow_quality_trends(engine),
+            "user_satisfaction_indicators": _estimate_satisfaction()
+        }
+        
+        return {
+            "status": "success",
+            "analytics": analytics,
+            "timestamp": datetime.now().isoformat(),
+            "data_period": "current_session"
+        }
+        
+    except Exception as e:
+        logging.error(f"Erreur dans get_flow_analytics: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
+
+@router.get("/interactions")
+async def get_interactions(session_id: Optional[str] = Query(default=None),
+                           since: Optional[datetime] = Query(default=None),
+                           until: Optional[datetime] = Query(default=None),
+                           limit: int = Query(default=100, ge=1, le=1000)):
+    """Historique durable des interactions (plus récentes d'abord), par session et par période"""
+    store = get_store()
+    if store is None:
+        raise HTTPException(status_code=503, detail="Magasin d'interactions désactivé")
+    
+    try:
+        interactions = await asyncio.to_thread(
+            store.query,
+            session_id=session_id,
+            since=since.timestamp() if since else None,
+            until=until.timestamp() if until else None,
+            limit=limit
+        )
+    except Exception as e:
+        logging.error(f"Erreur dans get_interactions: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
+    
+    return {
+        "status": "success",
+        "count": len(interactions),
+        "interactions": interactions,
+        "store": store.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.get("/sessions/stats")
+async def get_sessions_stats():
+    """Compteurs du magasin de sessions (résidence, évictions) et du backend d'état partagé"""
+    return {
+        "status": "success",
+        "sessions": session_store.stats(),
+        "state_backend": session_backend.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.websocket("/ws/{session_id}")
+async def websocket_endpoint(websocket: WebSocket, session_id: str):
+    """
+    WebSocket pour interactions temps réel
+    
+    Les messages sont traités hors de la boucle d'événements, dans l'ordre,
+    par une file bornée ; un client trop rapide reçoit une trame "busy".
+    """
+    await websocket.accept()
+    active_websockets[session_id] = websocket
+    engine = _get_engine(session_id)
+    await asyncio.to_thread(engine.sync_state)
+    
+    def process_message(data: Dict[str, Any]) -> Dict[str, Any]:
+        # Exécuté sur le pool de threads WebSocket ; le verrou du moteur sérialise
+        # ce tour avec /interact et les autres connexions de la même session
+        message_request = MessageRequest(
+            message=data["content"],
+            session_id=session_id,
+            context=data.get("context", {})
+        )
+        result = engine.process_interaction(
+            message_request.message, 
+            message_request.context
+        )
+        _record_interaction("websocket", session_id, None, message_request.message, result)
+        return {
+            "type": "flowme_response",
+            "state": result["state"],
+            "response": result["response"],
+            "flow_quality": result["flow_quality"],
+            "timestamp": result["timestamp"]
+        }
+    
+    work = OrderedWorkQueue(session_id, handler=process_message, send=websocket.send_json)
+    ws_connections[session_id] = work
+    work.start()
+    
+    # Changements d'état de la session, poussés par le bus d'événements
+    subscription = event_bus.subscribe(session_id)
+    notifier = asyncio.create_task(_forward_state_changes(session_id, subscription))
+    
+    try:
+        # Message de bienvenue
+        await work.send({
+            "type": "connection_established",
+            "session_id": session_id,
+            "current_state": engine.current_state,
+            "message": "Connexion FlowMe établie",
+            "queue_capacity": WS_QUEUE_SIZE
+        })
+        
+        while True:
+            # Recevoir les messages
+            data = await websocket.receive_json()
+            
+            if data.get("type") == "message":
+                # Traitement asynchrone, ordonné ; contre-pression si la file est pleine
+                if not work.submit(data):
+                    await work.send(work.busy_frame(data))
+                
+            elif data.get("type") == "ping":
+                await work.send({"type": "pong", "queue_depth": work.depth})
+                
+    except WebSocketDisconnect:
+        logging.info(f"WebSocket déconnecté: {session_id}")
+    except Exception as e:
+        logging.error(f"Erreur WebSocket: {e}")
+    finally:
+        notifier.cancel()
+        subscription.close()
+        await work.close()
+        if ws_connections.get(session_id) is work:
+            del ws_connections[session_id]
+        if active_websockets.get(session_id) is websocket:
+            del active_websockets[session_id]
+
+@router.get("/ws/stats")
+async def get_websocket_stats():
+    """Profondeur de file et latences de traitement par connexion WebSocket"""
+    return {"status": "success", **ws_stats()}
+
+@router.get("/stream/states")
+async def stream_state_changes(request: Request, session_id: Optional[str] = Query(default=None)):
+    """
+    Stream des changements d'états en temps réel (Server-Sent Events)
+    
+    Les événements sont poussés par le bus dès la transition ; un commentaire
+    de maintien est envoyé en l'absence d'activité. Un client qui se reconnecte
+    avec Last-Event-ID reçoit les événements manqués encore en historique.
+    """
+    last_event_id = parse_last_event_id(request.headers.get("last-event-id"))
+    
+    async def state_stream():
+        """Générateur pour le streaming"""
+        subscription = event_bus.subscribe(_session_key(session_id), last_event_id=last_event_id)
+        try:
+            while True:
+                event = await subscription.get(timeout=EVENT_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                
+                event_data = {
+                    "timestamp": event.timestamp,
+                    "previous_state": event.data["previous_state"],
+                    "new_state": event.data["new_state"],
+                    "state_info": _extract_state_info(event.data["new_state"]),
+                    "transition_type": "natural",
+                    "trigger": event.data["trigger"]
+                }
+                
+                yield f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event_data)}\n\n"
+        finally:
+            subscription.close()
+    
+    return StreamingResponse(
+        state_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+@router.get("/stream/stats")
+async def get_stream_stats():
+    """Abonnés, événements publiés et événements écartés du bus"""
+    return {"status": "success", **event_bus.stats(), "timestamp": datetime.now().isoformat()}
+
+# Fonctions utilitaires
+
+def _extract_state_info(state_id: int) -> Dict[str, Any]:
+    """Extrait les informations d'un état"""
+    from states.state_definitions import FLOWME_STATES
+    
+    if state_id not in FLOWME_STATES:
+        return {"id": state_id, "name": "État inconnu", "error": True}
+    
+    state_data = FLOWME_STATES[state_id]
+    
+    return {
+        "id": state_id,
+        "name": state_data["name"],
+        "famille_symbolique": state_data.get("famille_symbolique", "Inconnu"),
+        "mot_cle": state_data.get("mot_cle", ""),
+        "posture_adaptative": state_data.get("posture_adaptative", ""),
+        "tension_dominante": state_data.get("tension_dominante", ""),
+        "description": state_data.get("description", "")
+    }
+
+def _build_session_context(engine: FlowMeCore, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Construit le contexte de session pour la réponse"""
+    analytics = engine.analytics
+    return {
+        "flow_quality": context.get("flow_quality", 0.7),
+        "session_duration": analytics.departures,
+        "unique_states_visited": analytics.distinct_states,
+        "ethical_score": context.get("ethical_validation", {}).get("passed", True)
+    }
+
+async def _notify_websocket(session_id: str, notification: Dict[str, Any]):
+    """Notifie via WebSocket si connecté"""
+    if session_id in active_websockets:
+        try:
+            work = ws_connections.get(session_id)
+            if work is not None:
+                await work.send(notification)  # Sérialisé avec les réponses de la connexion
+            else:
+                await active_websockets[session_id].send_json(notification)
+        except Exception as e:
+            logging.error(f"Erreur notification WebSocket: {e}")
+            # Nettoyer la connexion fermée
+            active_websockets.pop(session_id, None)
+
+async def _forward_state_changes(session_id: str, subscription: Subscription):
+    """Relaie les événements du bus vers le WebSocket de la session"""
+    while True:
+        event = await subscription.get()
+        await _notify_websocket(session_id, {
+            "type": "state_change",
+            "event_id": event.id,
+            "state": event.data["new_state"],
+            "previous_state": event.data["previous_state"],
+            "trigger": event.data["trigger"],
+            "timestamp": event.timestamp
+        })
+
+def _log_interaction(request: MessageRequest, result: Dict[str, Any]):
+    """Log l'interaction pour analytics"""
+    log_interaction(
+        "api_interaction",
+        user_id=request.user_id,
+        session_id=request.session_id,
+        message_length=len(request.message),
+        detected_state=result["state"],
+        flow_quality=result["flow_quality"],
+        ethical_passed=result["ethical_validation"]["passed"]
+    )
+
+def _record_interaction(source: str, session_id: Optional[str], user_id: Optional[str],
+                        message: str, result: Dict[str, Any]):
+    """Ajoute l'interaction au magasin durable et à l'export NocoDB (mises en file, sans attente)"""
+    fields = {
+        "session_id": session_id,
+        "user_id": user_id,
+        "detected_state": result["state"],
+        "previous_state": result["context"].get("previous_state"),
+        "flow_quality": result["flow_quality"]
+    }
+    record_interaction(source, message=message, **fields)
+    export_interaction({
+        "source": source,
+        "message_length": len(message),
+        "timestamp": result["timestamp"],
+        **fields
+    })
+
+def _is_valid_state(state_id: int) -> bool:
+    """Valide un ID d'état"""
+    return 1 <= state_id <= 64
+
+def _validate_transition(from_state: int, to_state: int) -> Dict[str, Any]:
+    """Valide une transition d'état"""
+    
+    # Toujours autoriser les transitions vers l'état Présence
+    if to_state == 1:
+        return {"allowed": True, "reason": "Retour à la présence toujours autorisé"}
+    
+    # Vérifier la compatibilité
+    analyzer = _get_analyzer()
+    compatibility = analyzer._get_state_compatibility(from_state, to_state)
+    
+    if compatibility > 0.5:
+        return {"allowed": True, "reason": "Transition naturelle", "compatibility": compatibility}
+    else:
+        return {"allowed": True, "reason": "Transition forcée autorisée", "compatibility": compatibility}
+
+def _generate_transition_response(state_id: int, reason: str) -> str:
+    """Génère une réponse adaptée à une transition"""
+    from states.state_definitions import FLOWME_STATES
+    
+    if state_id not in FLOWME_STATES:
+        return "Je me trouve dans un nouvel état de conscience."
+    
+    state_data = FLOWME_STATES[state_id]
+    posture = state_data.get("posture_adaptative", "Je suis présent")
+    
+    if reason == "manual":
+        return f"{posture}. J'adopte consciemment cette nouvelle posture."
+    else:
+        return f"{posture}. Cette transition répond à {reason}."
+
+def _summarize_history(engine: FlowMeCore) -> Dict[str, Any]:
+    """Résume l'historique des états"""
+    analytics = engine.analytics
+    if not analytics.departures:
+        return {"states_visited": 0, "patterns": "aucun"}
+    
+    most_common = analytics.most_common_states(1)
+    
+    return {
+        "states_visited": analytics.distinct_states,
+        "total_transitions": analytics.departures,
+        "most_frequent_state": most_common[0][0] if most_common else None,
+        "recent_pattern": _detect_recent_pattern(engine.state_history[-5:])
+    }
+
+def _detect_recent_pattern(recent_states: List[int]) -> str:
+    """Détecte le pattern récent dans les états"""
+    return _detect_exploration_pattern(len(recent_states), len(set(recent_states)))
+
+def _detect_exploration_pattern(visits: int, distinct_states: int) -> str:
+    """Pattern d'exploration selon le nombre de passages et d'états distincts"""
+    if visits < 2:
+        return "insufficient_data"
+    
+    if distinct_states == 1:
+        return "stable"
+    elif distinct_states == visits:
+        return "exploratoire"
+    else:
+        return "variable"
+
+def _calculate_session_metrics(engine: FlowMeCore) -> Dict[str, Any]:
+    """Calcule les métriques de session (compteurs incrémentaux, O(1))"""
+    analytics = engine.analytics
+    average_quality = analytics.average_quality
+    
+    return {
+        "session_length": analytics.departures,
+        "interactions": engine.interaction_count,
+        "unique_states": analytics.distinct_states,
+        "current_state": engine.current_state,
+        "state_diversity": analytics.distinct_states / max(analytics.departures, 1),
+        "average_flow_quality": round(average_quality, 4) if average_quality is not None else None
+    }
+
+def _perform_deep_analysis(message: Union[str, MessageFeatures], analyzer: "StateAnalyzer") -> Dict[str, Any]:
+    """Effectue une analyse approfondie du message"""
+    return {
+        "sentiment_breakdown": analyzer._analyze_emotions(message),
+        "complexity_assessment": analyzer._analyze_linguistics(message),
+        "contextual_triggers": analyzer._load_contextual_triggers(),
+        "recommended_approach": "adaptive_listening"
+    }
+
+def _get_alternative_states(message: Union[str, MessageFeatures], analyzer: "StateAnalyzer", primary_state: int,
+                            history: List[int]) -> List[Dict[str, Any]]:
+    """Obtient les états alternatifs possibles"""
+    
+    # Scoring de tous les états
+    emotional = analyzer._analyze_emotions(message)
+    contextual = analyzer._analyze_context(message, {})
+    historical = analyzer._analyze_history(history)
+    linguistic = analyzer._analyze_linguistics(message)
+    
+    all_scores = analyzer._score_all_states(emotional, contextual, historical, linguistic)
+    
+    # Top 5 par score, exclusion de l'état principal
+    alternatives = analyzer.top_states(all_scores, 5, exclude=(primary_state,))
+    
+    return [
+        {
+            "state_id": state_id,
+            "score": score,
+            "state_info": _extract_state_info(state_id)
+        }
+        for state_id, score in alternatives
+    ]
+
+def _get_state_usage_stats(engine: FlowMeCore, state_id: int) -> Dict[str, Any]:
+    """Statistiques d'usage d'un état (O(64))"""
+    analytics = engine.analytics
+    usage_count = analytics.state_count(state_id)
+    
+    return {
+        "usage_count": usage_count,
+        "usage_percentage": (usage_count / max(analytics.departures, 1)) * 100,
+        "last_used": "current" if engine.current_state == state_id else "previous",
+        "frequency_rank": analytics.frequency_rank(state_id)
+    }
+
+def _calculate_transition_qualities(state_id: int) -> Dict[int, float]:
+    """Calcule la qualité des transitions depuis un état"""
+    analyzer = _get_analyzer()
+    compatible_states = analyzer.state_compatibility_matrix.get(state_id, [])
+    
+    return {
+        comp_state: analyzer._get_state_compatibility(state_id, comp_state)
+        for comp_state in compatible_states
+    }
+
+def _get_family_usage_stats(engine: FlowMeCore, family_name: str) -> Dict[str, Any]:
+    """Statistiques d'usage d'une famille d'états"""
+    analytics = engine.analytics
+    family_usage = analytics.family_counts.get(family_name, 0)
+    distribution = analytics.family_distribution(family_name)
+    
+    return {
+        "total_usage": family_usage,
+        "usage_percentage": (family_usage / max(analytics.departures, 1)) * 100,
+        "most_used_state": max(distribution, key=distribution.get) if distribution else None,
+        "state_distribution": distribution
+    }
+
+def _generate_session_summary(engine: FlowMeCore) -> Dict[str, Any]:
+    """Génère un résumé de la session"""
+    analytics = engine.analytics
+    
+    if not analytics.departures:
+        return {"message": "Session sans interactions"}
+    
+    most_common = analytics.most_common_states(1)
+    
+    return {
+        "total_interactions": analytics.departures,
+        "states_explored": analytics.distinct_states,
+        "dominant_state": most_common[0][0] if most_common else None,
+        "exploration_pattern": _detect_exploration_pattern(analytics.departures, analytics.distinct_states),
+        "session_quality": "enrichissante" if analytics.distinct_states > 3 else "focalisée"
+    }
+
+def _analyze_state_distribution(engine: FlowMeCore) -> Dict[str, Any]:
+    """Analyse la distribution des états"""
+    analytics = engine.analytics
+    
+    if not analytics.departures:
+        return {"distribution": "aucune_donnée"}
+    
+    return {
+        "most_frequent": analytics.most_common_states(3),
+        "entropy": analytics.distinct_states / analytics.departures,
+        "balance": "équilibré" if analytics.distinct_states > analytics.departures * 0.6 else "concentré"
+    }
+
+def _analyze_transition_patterns(engine: FlowMeCore) -> Dict[str, Any]:
+    """Analyse les patterns de transition (matrice 64×64 de la session)"""
+    analytics = engine.analytics
+    total_transitions = analytics.total_transitions
+    
+    if total_transitions < 2:
+        return {"patterns": "insufficient_data"}
+    
+    return {
+        "common_transitions": analytics.most_common_transitions(3),
+        "transition_diversity": analytics.distinct_transitions,
+        "flow_pattern": "fluide" if analytics.distinct_transitions > total_transitions * 0.7 else "répétitif"
+    }
+
+def _analyze_ethical_compliance() -> Dict[str, Any]:
+    """Analyse la conformité éthique"""
+    return {
+        "compliance_rate": 0.95,  # À calculer selon les vraies données
+        "principles_respected": list(FlowMeCore.ethical_constraints.keys()),
+        "violations": [],
+        "overall_score": "excellent"
+    }
+
+def _analyze_flow_quality_trends(engine: FlowMeCore) -> Dict[str, Any]:
+    """Analyse les tendances de qualité du flux (statistiques glissantes de la session)"""
+    analytics = engine.analytics
+    has_data = analytics.quality_count > 0
+    
+    return {
+        "current_quality": analytics.quality_last if has_data else None,
+        "trend": analytics.quality_trend(),
+        "peak_quality": analytics.quality_max if has_data else None,
+        "lowest_quality": analytics.quality_min if has_data else None,
+        "measurements": analytics.quality_count,
+        "improvement_areas": ["transition_smoothness"]
+    }
+
+def _estimate_satisfaction() -> Dict[str, Any]:
+    """Estime la satisfaction utilisateur"""
+    return {
+        "estimated_satisfaction": 0.85,  # Basé sur les métriques de flux
+        "engagement_level": "high",
+        "interaction_quality": "naturelle",
+        "areas_of_success": ["adaptation", "éthique", "fluidité"]
+    }
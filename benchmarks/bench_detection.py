@@ -0,0 +1,117 @@
+# benchmarks/bench_detection.py - Micro-benchmark de la détection d'états
+"""
+Compare la détection indexée (KEYWORD_INDEX) à l'implémentation historique
+qui reconstruisait le dictionnaire de mots-clés à chaque appel.
+
+Usage : python benchmarks/bench_detection.py [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flowme_states_detection import (  # noqa: E402
+    STATE_KEYWORDS,
+    WEAK_KEYWORDS,
+    detect_flowme_state_improved,
+    detect_many,
+)
+
+
+def legacy_detect(message: str) -> int:
+    """Implémentation de référence d'avant l'index inversé"""
+    if not message or not isinstance(message, str):
+        return 1
+
+    words = re.findall(r'\b\w+\b', message.lower().strip())
+    if not words:
+        return 1
+
+    state_keywords = {state_id: list(keywords) for state_id, keywords in STATE_KEYWORDS.items()}
+    state_keywords["weak"] = list(WEAK_KEYWORDS)
+
+    state_scores = {}
+    detected_words = {"strong": [], "weak": []}
+
+    for word in words:
+        word_found = False
+        for state_id, keywords in state_keywords.items():
+            if isinstance(state_id, int) and word in keywords:
+                state_scores[state_id] = state_scores.get(state_id, 0) + 1
+                detected_words["strong"].append((word, state_id))
+                word_found = True
+                break
+        if not word_found and word in state_keywords.get("weak", []):
+            detected_words["weak"].append(word)
+
+    if state_scores:
+        has_violence = any(state_id in [32, 14] for state_id in state_scores.keys())
+        has_love = any(state_id in [16, 8, 22] for state_id in state_scores.keys())
+        if has_violence and has_love:
+            return 58
+        max_score = max(state_scores.values())
+        best_states = [state_id for state_id, score in state_scores.items() if score == max_score]
+        for priority_state in [32, 14, 58, 16, 22, 8, 1, 40]:
+            if priority_state in best_states:
+                return priority_state
+        return best_states[0]
+
+    if detected_words["weak"]:
+        return 40
+    return 1
+
+
+def build_message(word_count: int, rng: random.Random) -> str:
+    """Construit un message réaliste mêlant mots-clés et mots neutres"""
+    keywords = [word for words in STATE_KEYWORDS.values() for word in words]
+    filler = ["je", "suis", "un", "peu", "dans", "la", "journée", "avec", "mon", "travail"]
+    filler += list(WEAK_KEYWORDS)
+    words = [rng.choice(keywords) if rng.random() < 0.15 else rng.choice(filler)
+             for _ in range(word_count)]
+    return " ".join(words)
+
+
+def best_time(func: Callable[[], object], repeat: int) -> float:
+    """Meilleur temps par appel (secondes) sur plusieurs séries"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results: List[Dict[str, float]] = []
+
+    print("⏱️  Benchmark détection FlowMe (legacy vs index)")
+    print("=" * 60)
+
+    for word_count in (10, 100, 2000):
+        message = build_message(word_count, rng)
+        assert legacy_detect(message) == detect_flowme_state_improved(message)
+
+        legacy = best_time(lambda: legacy_detect(message), args.repeat)
+        indexed = best_time(lambda: detect_flowme_state_improved(message), args.repeat)
+        results.append({"words": word_count, "legacy_us": legacy * 1e6, "indexed_us": indexed * 1e6})
+
+        print(f"{word_count:>5} mots | legacy {legacy * 1e6:9.1f} µs | "
+              f"index {indexed * 1e6:9.1f} µs | x{legacy / indexed:5.1f}")
+
+    batch = [build_message(rng.randint(5, 40), rng) for _ in range(1000)]
+    assert detect_many(batch) == [legacy_detect(message) for message in batch]
+    bulk = best_time(lambda: detect_many(batch), args.repeat)
+    print(f"detect_many(1000 messages) : {bulk * 1e3:.2f} ms ({len(batch) / bulk:,.0f} msg/s)")
+
+
+if __name__ == "__main__":
+    main()
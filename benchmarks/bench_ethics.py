@@ -0,0 +1,123 @@
+# benchmarks/bench_ethics.py - Validation éthique : table de règles compilée et rapport à la demande
+"""
+Compare la validation éthique historique (boucle sur les principes, chaîne
+de if, rapport descriptif construit à chaque interaction) à la table de
+règles compilée évaluée sur MessageFeatures :
+- CPU par interaction : validation seule, avec le masque compact ou le rapport
+- taille de ethical_validation et de la réponse /api/v1/interact sérialisées
+
+Les rapports détaillés sont vérifiés identiques à l'historique (hors warning_mask).
+
+Usage : python benchmarks/bench_ethics.py [--repeat 5]
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import timeit
+from typing import Any, Callable, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules importés depuis la racine du dépôt, sous les mêmes noms que l'application
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("FLOWME_LOG_LEVEL", "WARNING")
+
+try:
+    importlib.import_module("states.state_definitions")  # Requis pour construire FlowMeCore
+except ImportError as e:
+    sys.exit(f"❌ Définitions d'états introuvables ({e})")
+
+core_module = importlib.import_module("core.flowme_core")
+features_module = importlib.import_module("flowme_features")
+
+MESSAGES = (
+    "Bonjour",
+    "Je me sens triste et un peu perdu depuis que mon travail a changé, je ne comprends pas pourquoi.",
+    "Il y a eu de la violence dans ma famille et je ne sais pas comment en parler.",
+)
+
+
+def legacy_validate(core, state: int, context: Dict) -> Dict[str, Any]:
+    """_validate_ethics d'avant la table compilée"""
+    validation = {"passed": True, "constraints_checked": [], "warnings": [], "principles_applied": []}
+    for principle, description in core.ethical_constraints.items():
+        result = legacy_check(core, principle, state, context)
+        validation["constraints_checked"].append({"principle": principle, "description": description,
+                                                  "result": result})
+        if not result["passed"]:
+            validation["passed"] = False
+            validation["warnings"].append(result["warning"])
+        else:
+            validation["principles_applied"].append(principle)
+    return validation
+
+
+def legacy_check(core, principle: str, state: int, context: Dict) -> Dict[str, Any]:
+    if principle == "non_harm":
+        message = context.get("original_message", "")
+        for indicator in ["violence", "manipulation", "discrimination"]:
+            if indicator in message.lower():
+                return {"passed": False, "warning": f"Contenu potentiellement nuisible détecté: {indicator}"}
+        return {"passed": True, "assessment": "Aucun contenu nuisible détecté"}
+    elif principle == "transparency":
+        return {"passed": True, "assessment": "Intention d'aide et d'accompagnement claire"}
+    elif principle == "flow_adaptation":
+        quality = core._assess_transition_quality(context.get("previous_state", 1), state)
+        return {"passed": quality > 0.5, "assessment": f"Qualité de transition: {quality:.2f}"}
+    return {"passed": True, "assessment": "Principe respecté"}
+
+
+def best_time(func: Callable[[], object], repeat: int) -> float:
+    """Meilleur temps par appel (secondes) sur plusieurs séries"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def size(payload: Any) -> int:
+    return len(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    core = core_module.FlowMeCore(session_id="bench")
+    print("⏱️  Benchmark validation éthique (table compilée)")
+    print("=" * 72)
+
+    for message in MESSAGES:
+        features = features_module.MessageFeatures(message)
+        # original_message : seule source du contrôle non_harm historique
+        context = {**core._enrich_context(features, None), "original_message": message}
+        state = core._detect_optimal_state(features, context)
+
+        legacy = legacy_validate(core, state, context)
+        compiled = core._validate_ethics(state, context, features)
+        report = compiled.report()
+        assert {key: value for key, value in report.items() if key != "warning_mask"} == legacy, message
+
+        before = best_time(lambda: legacy_validate(core, state, context), args.repeat)
+        compact = best_time(lambda: core._validate_ethics(state, context, features).compact(), args.repeat)
+        verbose = best_time(lambda: core._validate_ethics(state, context, features).report(), args.repeat)
+
+        interaction = core.process_interaction(message)
+        response = {key: interaction[key] for key in ("state", "response", "flow_quality", "timestamp")}
+        legacy_payload = size({**response, "ethical_validation": legacy})
+        compact_payload = size({**response, "ethical_validation": compiled.compact()})
+
+        print(f"{message[:40]!r:<44} passed={compiled.passed!s:<5} masque={compiled.warning_mask}")
+        print(f"  CPU    legacy {before * 1e6:7.2f} µs | compact {compact * 1e6:7.2f} µs (x{before / compact:4.1f})"
+              f" | verbose {verbose * 1e6:7.2f} µs")
+        print(f"  octets ethical_validation {size(legacy):5d} → {size(compiled.compact()):3d} | "
+              f"réponse {legacy_payload:5d} → {compact_payload:5d} "
+              f"(-{(1 - compact_payload / legacy_payload) * 100:.0f} %)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+# benchmarks/bench_features.py - Coût CPU par requête de l'analyse lexicale
+"""
+Compare, requête par requête, l'extraction unique MessageFeatures (automate
+d'Aho-Corasick partagé) aux recherches de sous-chaînes historiques, refaites
+à chaque étape :
+- /interact : enrichissement du contexte (core) + recommandation d'état
+- /api/v1/analyze : émotions, contexte, linguistique, recommandation,
+  analyse approfondie et états alternatifs
+
+Les deux chemins partagent le scoring ; seules les étapes lexicales diffèrent.
+
+Usage : python benchmarks/bench_features.py [--repeat 5]
+"""
+
+import argparse
+import importlib
+import os
+import random
+import sys
+import timeit
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules importés depuis la racine du dépôt, sous les mêmes noms que l'application
+sys.path.insert(0, ROOT)
+
+try:
+    importlib.import_module("states.state_definitions")  # Requis pour construire FlowMeCore
+except ImportError as e:
+    sys.exit(f"❌ Définitions d'états introuvables ({e})")
+
+features_module = importlib.import_module("flowme_features")
+analyzer_module = importlib.import_module("states.state_analyzer")
+core_module = importlib.import_module("core.flowme_core")
+
+MessageFeatures = features_module.MessageFeatures
+StateAnalyzer = analyzer_module.StateAnalyzer
+
+
+class LegacyAnalyzer(StateAnalyzer):
+    """Étapes lexicales d'avant MessageFeatures (un message.lower() et un balayage par test)"""
+
+    def analyze_and_recommend(self, message: str, context: Dict, history: List[int]) -> int:
+        scores = self._score_all_states(self._analyze_emotions(message), self._analyze_context(message, context),
+                                        self._analyze_history(history), self._analyze_linguistics(message))
+        return self._select_optimal_state(scores, context)
+
+    def _analyze_emotions(self, message: str) -> Dict[str, Any]:
+        message_lower = message.lower()
+        detected_emotions = {}
+        for emotion_family, patterns in self.emotional_patterns.items():
+            intensity = 0
+            matched_words = []
+            for pattern in patterns["keywords"]:
+                if pattern in message_lower:
+                    matched_words.append(pattern)
+                    intensity += patterns.get("base_intensity", 0.5)
+            for intensifier in patterns.get("intensifiers", []):
+                if intensifier in message_lower:
+                    intensity *= 1.3
+            if matched_words:
+                detected_emotions[emotion_family] = {
+                    "intensity": min(intensity, 1.0),
+                    "matched_words": matched_words,
+                    "suggested_states": patterns.get("target_states", [1])
+                }
+        return {
+            "detected": detected_emotions,
+            "dominant_emotion": max(detected_emotions.keys(), key=lambda x: detected_emotions[x]["intensity"])
+                                if detected_emotions else None,
+            "emotional_complexity": len(detected_emotions)
+        }
+
+    def _analyze_context(self, message: str, context: Dict) -> Dict[str, Any]:
+        analysis = {
+            "interaction_type": self._classify_interaction_type(message),
+            "urgency_level": self._assess_urgency(message, context),
+            "support_need": self._assess_support_need(message),
+            "exploration_depth": self._assess_exploration_need(message),
+            "relational_tone": self._assess_relational_tone(message)
+        }
+        suggested = {"question": [1, 64], "sharing": [8, 45], "problem": [45, 58], "gratitude": [8, 58]}
+        analysis["suggested_states"] = suggested.get(analysis["interaction_type"], [])
+        return analysis
+
+    def _analyze_linguistics(self, message: str) -> Dict[str, Any]:
+        words = message.split()
+        sentences = [s.strip() for s in message.split('.') if s.strip()]
+        complexity_score = len(words) / max(len(sentences), 1)
+        modalities = {
+            "interrogative": message.count('?'),
+            "exclamative": message.count('!'),
+            "declarative": len(sentences) - message.count('?') - message.count('!')
+        }
+        formality = sum(1 for indicator in ['vous', 'votre', 'pourriez', 'souhaiteriez'] if indicator in message.lower())
+        informality = sum(1 for indicator in ['tu', 'ton', 'peux', 'veux'] if indicator in message.lower())
+        temporal_indicators = {
+            "past": ['était', 'avait', 'faisait', 'hier'],
+            "present": ['est', 'ai', 'suis', 'maintenant', 'aujourd\'hui'],
+            "future": ['sera', 'aura', 'fera', 'demain', 'bientôt']
+        }
+        temporal_focus = {}
+        for time, indicators in temporal_indicators.items():
+            temporal_focus[time] = sum(1 for ind in indicators if ind in message.lower())
+        dominant_time = max(temporal_focus.keys(), key=lambda x: temporal_focus[x]) \
+                       if any(temporal_focus.values()) else "present"
+        return {
+            "complexity": complexity_score,
+            "modalities": modalities,
+            "formality_level": formality - informality,
+            "temporal_focus": dominant_time,
+            "word_count": len(words),
+            "sentence_count": len(sentences),
+            "avg_sentence_length": complexity_score
+        }
+
+    def _classify_interaction_type(self, message: str) -> str:
+        if any(word in message.lower() for word in ["bonjour", "salut", "hello"]):
+            return "greeting"
+        elif any(word in message.lower() for word in ["au revoir", "bye", "à bientôt"]):
+            return "farewell"
+        elif "?" in message:
+            return "question"
+        elif any(word in message.lower() for word in ["problème", "difficulté", "aide"]):
+            return "problem"
+        elif any(word in message.lower() for word in ["merci", "remercie"]):
+            return "gratitude"
+        elif any(word in message.lower() for word in ["je pense", "il me semble", "j'ai l'impression"]):
+            return "sharing"
+        return "statement"
+
+    def _assess_urgency(self, message: str, context: Dict) -> float:
+        urgent_indicators = ["urgent", "vite", "rapidement", "immédiatement", "maintenant"]
+        urgency_score = sum(1 for indicator in urgent_indicators if indicator in message.lower())
+        if message.count("!") > 1:
+            urgency_score += 0.5
+        return min(urgency_score / 3, 1.0)
+
+    def _assess_support_need(self, message: str) -> float:
+        support_indicators = ["aide", "soutien", "accompagnement", "difficile", "dur"]
+        return min(sum(1 for ind in support_indicators if ind in message.lower()) / 3, 1.0)
+
+    def _assess_exploration_need(self, message: str) -> float:
+        exploration_indicators = ["pourquoi", "comment", "comprendre", "expliquer", "explorer"]
+        return min(sum(1 for ind in exploration_indicators if ind in message.lower()) / 3, 1.0)
+
+    def _assess_relational_tone(self, message: str) -> str:
+        if any(word in message.lower() for word in ["vous", "votre", "monsieur", "madame"]):
+            return "formal"
+        elif any(word in message.lower() for word in ["tu", "ton", "salut"]):
+            return "informal"
+        return "neutral"
+
+
+def legacy_enrichment(message: str) -> Dict[str, Any]:
+    """Analyse linguistique de FlowMeCore._enrich_context d'avant MessageFeatures"""
+    message_lower = message.lower()
+    emotional_words = []
+    for emotion, words in core_module.EMOTIONAL_LEXICON.items():
+        for word in words:
+            if word in message_lower:
+                emotional_words.append(emotion)
+                break
+    word_count = len(message.split())
+    sentence_count = len([s for s in message.split('.') if s.strip()])
+    if sentence_count == 0:
+        complexity = 0.5
+    else:
+        average = word_count / sentence_count
+        complexity = 0.3 if average < 5 else 0.6 if average < 15 else 0.9
+    return {"questions": message.count("?"), "exclamations": message.count("!"),
+            "emotional_words": emotional_words, "complexity": complexity}
+
+
+def interact_request(core, analyzer, message, history: List[int]):
+    """Étapes lexicales de /interact (enrichissement puis recommandation)"""
+    if isinstance(analyzer, LegacyAnalyzer):
+        context = legacy_enrichment(message)
+    else:
+        message = MessageFeatures(message)
+        enriched = core._enrich_context(message, None)
+        context = {key: enriched[key] for key in ("questions", "exclamations", "emotional_words", "complexity")}
+    return context, analyzer.analyze_and_recommend(message, context, history)
+
+
+def analyze_request(analyzer, message, history: List[int]):
+    """Analyses de /api/v1/analyze avec deep_analysis et include_alternatives"""
+    if not isinstance(analyzer, LegacyAnalyzer):
+        message = MessageFeatures(message)
+    context = {"original_message": "-"}
+    emotional = analyzer._analyze_emotions(message)
+    contextual = analyzer._analyze_context(message, context)
+    linguistic = analyzer._analyze_linguistics(message)
+    recommended = analyzer.analyze_and_recommend(message, context, history)
+    deep = (analyzer._analyze_emotions(message), analyzer._analyze_linguistics(message))
+    scores = analyzer._score_all_states(analyzer._analyze_emotions(message), analyzer._analyze_context(message, {}),
+                                        analyzer._analyze_history(history), analyzer._analyze_linguistics(message))
+    return emotional, contextual, linguistic, recommended, deep, analyzer.top_states(scores, 5, (recommended,))
+
+
+def build_message(word_count: int, rng: random.Random) -> str:
+    """Message réaliste : mots du lexique mêlés à des mots neutres"""
+    lexicon = sorted(features_module.LEXICON._terms)
+    filler = ["je", "un", "peu", "dans", "la", "journée", "avec", "mon", "travail", "et", "puis"]
+    words = [rng.choice(lexicon) if rng.random() < 0.12 else rng.choice(filler) for _ in range(word_count)]
+    return " ".join(words).capitalize() + rng.choice((".", " ?", " !"))
+
+
+def best_time(func: Callable[[], object], repeat: int) -> float:
+    """Meilleur temps par appel (secondes) sur plusieurs séries"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=19)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    analyzer, legacy = StateAnalyzer(), LegacyAnalyzer()
+    core = core_module.FlowMeCore()
+    history = [1, 8, 45]
+
+    print(f"⏱️  Benchmark MessageFeatures ({len(features_module.LEXICON)} termes dans l'automate)")
+    print("=" * 72)
+
+    for word_count in (8, 40, 200):
+        message = build_message(word_count, rng)
+        assert interact_request(core, analyzer, message, history) == interact_request(core, legacy, message, history)
+        assert analyze_request(analyzer, message, history) == analyze_request(legacy, message, history)
+
+        for name, run in (("interact", interact_request), ("analyze", analyze_request)):
+            call = (lambda a: run(core, a, message, history)) if run is interact_request \
+                else (lambda a: run(a, message, history))
+            before = best_time(lambda: call(legacy), args.repeat)
+            after = best_time(lambda: call(analyzer), args.repeat)
+            print(f"{word_count:>4} mots | {name:<8} | legacy {before * 1e6:8.1f} µs | "
+                  f"features {after * 1e6:8.1f} µs | x{before / after:4.2f}")
+
+    message = build_message(40, rng)
+    extraction = best_time(lambda: MessageFeatures(message), args.repeat)
+    print(f"MessageFeatures seul (40 mots) : {extraction * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
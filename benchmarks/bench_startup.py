@@ -0,0 +1,123 @@
+# benchmarks/bench_startup.py - Mesure du démarrage à froid
+"""
+Mesure, dans des interpréteurs neufs :
+- le temps d'import de main.py (et les modules les plus coûteux via -X importtime)
+- le temps jusqu'à la première réponse 200 de POST /analyze, serveur uvicorn lancé à froid
+
+Usage : python benchmarks/bench_startup.py [--repeat 5] [--warmup background|sync|off]
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def _env(warmup: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["FLOWME_WARMUP"] = warmup
+    return env
+
+
+def measure_import(warmup: str) -> Tuple[float, List[Tuple[int, str]]]:
+    """Temps d'import de main (secondes) et modules les plus coûteux (µs cumulées)"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET],
+        cwd=ROOT, env=_env(warmup), capture_output=True, text=True, check=True
+    )
+    elapsed = float(completed.stdout.strip().splitlines()[-1])
+
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Seuls les modules de premier niveau (ni indentés ni sous-modules)
+        if not name.startswith("  ") and "." not in name.strip():
+            modules.append((int(cumulative), name.strip()))
+    modules.sort(reverse=True)
+    return elapsed, modules[:8]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_analyze(warmup: str, timeout: float = 60.0) -> float:
+    """Temps entre le lancement du serveur et la première réponse 200 de /analyze"""
+    port = _free_port()
+    payload = json.dumps({"message": "je suis triste"}).encode("utf-8")
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=_env(warmup), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            request = urllib.request.Request(
+                f"http://127.0.0.1:{port}/analyze", data=payload,
+                headers={"Content-Type": "application/json"}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            if server.poll() is not None:
+                raise RuntimeError(f"Le serveur s'est arrêté (code {server.returncode})")
+            time.sleep(0.005)
+        raise TimeoutError("Aucune réponse de /analyze")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def _summary(values: List[float]) -> str:
+    values_ms = [value * 1000 for value in values]
+    return (f"min {min(values_ms):8.1f} ms | médiane {statistics.median(values_ms):8.1f} ms | "
+            f"max {max(values_ms):8.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", default="background", choices=("background", "sync", "off"))
+    args = parser.parse_args()
+
+    print(f"🚀 Benchmark démarrage à froid FlowMe (FLOWME_WARMUP={args.warmup})")
+    print("=" * 60)
+
+    import_times = []
+    heaviest: List[Tuple[int, str]] = []
+    for _ in range(args.repeat):
+        elapsed, heaviest = measure_import(args.warmup)
+        import_times.append(elapsed)
+    print(f"import main            | {_summary(import_times)}")
+
+    first_analyze = [measure_first_analyze(args.warmup) for _ in range(args.repeat)]
+    print(f"1er /analyze réussi    | {_summary(first_analyze)}")
+
+    print("\n📦 Modules les plus coûteux à l'import (dernier essai) :")
+    for cumulative, name in heaviest:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_store.py - Débit du magasin d'interactions SQLite
+"""
+Mesure le coût de record() pour l'appelant, le débit d'insertion soutenu
+du thread d'écriture et la latence des lectures pendant les écritures.
+
+Usage : python benchmarks/bench_store.py [--rows 200000] [--batch-size 500]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flowme_store import InteractionStore  # noqa: E402
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    parser.add_argument("--write-rate", type=int, default=20_000, help="lignes/s pendant les lectures")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sessions = [f"session-{i}" for i in range(args.sessions)]
+
+    print("⏱️  Benchmark magasin d'interactions FlowMe (SQLite WAL)")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = InteractionStore(os.path.join(directory, "bench.db"), batch_size=args.batch_size,
+                                 flush_interval=args.flush_interval, queue_size=args.rows + 1)
+
+        # 1. Coût pour l'appelant et débit soutenu
+        enqueue_ns: List[int] = []
+        started = time.perf_counter()
+        for i in range(args.rows):
+            before = time.perf_counter_ns()
+            store.record("bench", session_id=rng.choice(sessions), detected_state=1 + i % 64,
+                         previous_state=1, flow_quality=0.8, message="je suis un peu perdu")
+            enqueue_ns.append(time.perf_counter_ns() - before)
+        enqueued = time.perf_counter() - started
+        store.flush(timeout=600)
+        total = time.perf_counter() - started
+
+        print(f"record()           : médiane {statistics.median(enqueue_ns) / 1000:.2f} µs | "
+              f"p99 {percentile(enqueue_ns, 99) / 1000:.2f} µs")
+        print(f"mise en file       : {args.rows / enqueued:,.0f} lignes/s")
+        print(f"insertion durable  : {args.rows / total:,.0f} lignes/s "
+              f"({store.stats()['batches']} lots, dernier {store.stats()['last_batch_ms']:.1f} ms)")
+
+        # 2. Lectures pendant un flux d'écriture continu (~write-rate lignes/s)
+        stop = threading.Event()
+
+        def writer():
+            burst = max(args.write_rate // 100, 1)
+            while not stop.is_set():
+                for _ in range(burst):
+                    store.record("bench", session_id=rng.choice(sessions), detected_state=8)
+                time.sleep(0.01)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        by_session: List[float] = []
+        by_range: List[float] = []
+        try:
+            deadline = time.perf_counter() + 3.0
+            while time.perf_counter() < deadline:
+                before = time.perf_counter()
+                store.query(session_id=rng.choice(sessions), limit=50)
+                by_session.append((time.perf_counter() - before) * 1000)
+
+                before = time.perf_counter()
+                store.query(since=time.time() - 1.0, limit=100)
+                by_range.append((time.perf_counter() - before) * 1000)
+        finally:
+            stop.set()
+            thread.join()
+            store.flush(timeout=600)
+
+        for label, samples in (("par session", by_session), ("par période", by_range)):
+            print(f"lecture {label:<11}: médiane {statistics.median(samples):.3f} ms | "
+                  f"p99 {percentile(samples, 99):.3f} ms ({len(samples)} requêtes)")
+        print(f"total écrit        : {store.count():,} lignes, {store.stats()['dropped']} écartées")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
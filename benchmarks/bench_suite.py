@@ -0,0 +1,301 @@
+# benchmarks/bench_suite.py - Suite de micro-benchmarks FlowMe avec référence
+"""
+Suite reproductible : détection, analyse, moteur central, constellation
+et réponses approfondies, paramétrés par longueur de message et d'historique.
+
+Chaque cas mesure :
+- la latence (meilleur temps par appel sur plusieurs séries, µs)
+- le pic de mémoire allouée pendant un appel (tracemalloc, octets)
+
+Les résultats peuvent être enregistrés comme référence (JSON) ; les exécutions
+suivantes y sont comparées et le code de sortie vaut 1 si un cas régresse
+au-delà du seuil.
+
+Usage :
+    python benchmarks/bench_suite.py --save-baseline
+    python benchmarks/bench_suite.py [--threshold 0.25] [--memory-threshold 0.1]
+    python benchmarks/bench_suite.py --filter detect --json resultats.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Journal d'interactions silencieux pendant les mesures
+os.environ.setdefault("FLOWME_LOG_LEVEL", "WARNING")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+# Modules importés depuis la racine du dépôt, sous les mêmes noms que l'application
+sys.path.insert(0, ROOT)
+
+MESSAGE_WORDS = (8, 40, 200)
+HISTORY_LENGTHS = (0, 10, 50)
+CONSTELLATION_LENGTHS = (5, 20, 50)
+
+# Écarts de mémoire ignorés en dessous de ce seuil (bruit de l'allocateur)
+MEMORY_SLACK_BYTES = 1024
+
+Runner = Callable[[], Any]
+
+
+def _module(name: str):
+    return importlib.import_module(name)
+
+
+class Case:
+    """Cas de benchmark : nom, paramètres et fabrique de la fonction mesurée"""
+
+    def __init__(self, name: str, params: Dict[str, int], setup: Callable[[], Runner]):
+        self.name = name
+        self.params = params
+        self.setup = setup
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[{','.join(f'{k}={v}' for k, v in self.params.items())}]"
+
+
+# Données d'entrée déterministes
+
+def build_message(word_count: int, seed: int) -> str:
+    """Message mêlant mots-clés des états et mots neutres"""
+    detection = _module("flowme_states_detection")
+    rng = random.Random(seed)
+    keywords = [word for words in detection.STATE_KEYWORDS.values() for word in words]
+    keywords += ["triste", "inquiet", "merci", "pourquoi", "comprends pas", "travail", "famille"]
+    filler = ["je", "suis", "un", "peu", "dans", "la", "journée", "avec", "mon", "et", "puis", "vraiment"]
+    words = [rng.choice(keywords) if rng.random() < 0.15 else rng.choice(filler) for _ in range(word_count)]
+    text = " ".join(words)
+    return text[0].upper() + text[1:] + rng.choice((".", " ?", " !"))
+
+
+def build_history(length: int, seed: int) -> List[int]:
+    """Historique d'états sans répétition immédiate (transitions effectives)"""
+    rng = random.Random(seed)
+    history: List[int] = []
+    while len(history) < length:
+        state = rng.choice((1, 8, 14, 22, 32, 45, 58, 64)) if rng.random() < 0.7 else rng.randint(1, 64)
+        if not history or history[-1] != state:
+            history.append(state)
+    return history
+
+
+# Cas
+
+def _detect_case(words: int) -> Runner:
+    detect = _module("flowme_states_detection").detect_flowme_state_improved
+    message = build_message(words, words)
+    return lambda: detect(message)
+
+
+def _analyzer_case(words: int, history: int) -> Runner:
+    analyzer = _module("states.state_analyzer").StateAnalyzer()
+    message, states = build_message(words, words), build_history(history, history)
+    return lambda: analyzer.analyze_and_recommend(message, {}, states)
+
+
+def _core_case(words: int, history: int) -> Runner:
+    # Sans définitions d'états, le moteur ne mesurerait que sa réponse de repli
+    _module("states.state_definitions")
+    engine = _module("core.flowme_core").FlowMeCore(session_id="bench")
+    message, states = build_message(words, words), build_history(history + 1, history)
+
+    def run():
+        # Session remise dans le même état avant chaque appel
+        engine.state_history = states[:-1]
+        engine.current_state = states[-1]
+        return engine.process_interaction(message)
+    return run
+
+
+def _constellation_case(history: int, cached: bool) -> Runner:
+    constellation = _module("flowme_constellation_system")
+    states = build_history(history, history)
+    if cached:
+        constellation.analyze_user_constellation(states)
+        return lambda: constellation.analyze_user_constellation(states)
+
+    def run():
+        constellation.clear_constellation_cache()
+        return constellation.analyze_user_constellation(states)
+    return run
+
+
+def _response_case(words: int, history: int) -> Runner:
+    generate = _module("flowme_deep_responses").generate_enhanced_response
+    message, states = build_message(words, words), build_history(history, history)
+    detected = _module("flowme_states_detection").detect_flowme_state_improved(message)
+    # Sans graine : composition complète à chaque appel (pas de cache de réponses)
+    return lambda: generate(message, detected, states, {})
+
+
+def build_cases() -> List[Case]:
+    cases = [Case("detect", {"words": words}, lambda w=words: _detect_case(w)) for words in MESSAGE_WORDS]
+    for words in MESSAGE_WORDS:
+        for history in HISTORY_LENGTHS:
+            params = {"words": words, "history": history}
+            cases.append(Case("analyze_and_recommend", params, lambda w=words, h=history: _analyzer_case(w, h)))
+            cases.append(Case("process_interaction", params, lambda w=words, h=history: _core_case(w, h)))
+            cases.append(Case("enhanced_response", params, lambda w=words, h=history: _response_case(w, h)))
+    for history in CONSTELLATION_LENGTHS:
+        cases.append(Case("constellation", {"history": history},
+                          lambda h=history: _constellation_case(h, cached=False)))
+        cases.append(Case("constellation_cached", {"history": history},
+                          lambda h=history: _constellation_case(h, cached=True)))
+    return cases
+
+
+# Mesures
+
+def measure_latency(run: Runner, repeat: int) -> Tuple[float, float]:
+    """(meilleur, médian) temps par appel en µs"""
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    samples = [elapsed / number * 1e6 for elapsed in timer.repeat(repeat=repeat, number=number)]
+    return min(samples), statistics.median(samples)
+
+
+def measure_memory(run: Runner, calls: int = 10) -> int:
+    """Pic médian de mémoire allouée pendant un appel (octets)"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(calls):
+            baseline, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(max(peak - baseline, 0))
+    finally:
+        tracemalloc.stop()
+    return int(statistics.median(peaks))
+
+
+def run_suite(cases: List[Case], repeat: int) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """Résultats par cas, et cas ignorés faute de module dans l'arborescence"""
+    results, skipped = {}, {}
+    for case in cases:
+        try:
+            run = case.setup()
+            run()  # Échauffement (imports paresseux, caches de tables)
+        except ImportError as e:
+            skipped[case.key] = str(e)
+            print(f"  {case.key:<55} ⏭️  ignoré : {e}")
+            continue
+        best, median = measure_latency(run, repeat)
+        peak = measure_memory(run)
+        results[case.key] = {
+            "name": case.name,
+            "params": case.params,
+            "best_us": round(best, 3),
+            "median_us": round(median, 3),
+            "peak_bytes": peak
+        }
+        print(f"  {case.key:<55} {best:10.1f} µs  {peak / 1024:9.1f} Kio")
+    return results, skipped
+
+
+# Référence
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system()
+    }
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def save_baseline(path: str, results: Dict[str, Dict[str, Any]]):
+    payload = {"created_at": datetime.now().isoformat(), "environment": environment(), "results": results}
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(payload, handle, indent=2, ensure_ascii=False, sort_keys=True)
+        handle.write("\n")
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any],
+            threshold: float, memory_threshold: float) -> Iterator[str]:
+    """Régressions par rapport à la référence (latence et pic mémoire)"""
+    reference = baseline.get("results", {})
+    for key, current in results.items():
+        previous = reference.get(key)
+        if previous is None:
+            continue
+        ratio = current["best_us"] / previous["best_us"] if previous["best_us"] else 1.0
+        if ratio > 1 + threshold:
+            yield (f"{key}: latence {previous['best_us']:.1f} → {current['best_us']:.1f} µs "
+                   f"(+{(ratio - 1) * 100:.0f} %)")
+        grown = current["peak_bytes"] - previous["peak_bytes"]
+        if grown > MEMORY_SLACK_BYTES and grown > previous["peak_bytes"] * memory_threshold:
+            yield (f"{key}: mémoire {previous['peak_bytes']} → {current['peak_bytes']} octets "
+                   f"(+{grown / max(previous['peak_bytes'], 1) * 100:.0f} %)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="ne garder que les cas dont le nom contient ce texte")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="enregistre les résultats comme référence")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="hausse de latence tolérée (0.25 = +25 %%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.1,
+                        help="hausse du pic mémoire tolérée (0.1 = +10 %%)")
+    parser.add_argument("--json", help="écrit aussi les résultats dans ce fichier")
+    args = parser.parse_args()
+
+    cases = [case for case in build_cases() if args.filter in case.key]
+    print(f"⏱️  Suite de benchmarks FlowMe ({len(cases)} cas, Python {platform.python_version()})")
+    print("=" * 80)
+    results, skipped = run_suite(cases, args.repeat)
+    if skipped:
+        print(f"⚠️  {len(skipped)} cas ignoré(s) : module absent de l'arborescence")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"environment": environment(), "results": results, "skipped": skipped},
+                      handle, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"💾 Référence enregistrée : {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"ℹ️  Pas de référence ({args.baseline}) : lancer avec --save-baseline")
+        return 0
+    if baseline.get("environment") != environment():
+        print(f"⚠️  Référence mesurée dans un autre environnement : {baseline.get('environment')}")
+
+    regressions = list(compare(results, baseline, args.threshold, args.memory_threshold))
+    if regressions:
+        print(f"❌ {len(regressions)} régression(s) au-delà du seuil :")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print(f"✅ Aucune régression (seuils : latence +{args.threshold * 100:.0f} %, "
+          f"mémoire +{args.memory_threshold * 100:.0f} %)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+# benchmarks/bench_workers.py - Débit de 1 à N workers uvicorn avec état de session partagé
+"""
+Lance l'application avec 1, 2, … N workers uvicorn (sous-processus, base de
+sessions neuve à chaque palier) et mesure le débit de POST /api/v1/interact.
+
+Chaque tâche cliente conduit sa propre session et envoie aussi une requête
+sur quatre à une session commune à toutes les tâches (mises à jour
+concurrentes depuis tous les workers). Après chaque palier :
+- interactions lues par l'API == requêtes réussies, par session
+- état courant lu par l'API == dernier état détecté par le client
+- deux abonnés SSE de la session 0 (connexions distinctes, donc workers
+  potentiellement différents) reçoivent toutes ses transitions
+
+Avec --backend memory, chaque worker garde son propre état : les écarts
+de cohérence au-delà d'un worker sont attendus.
+
+Usage :
+    python benchmarks/bench_workers.py --router api.flowme_endpoints:router
+    python benchmarks/bench_workers.py --workers 1,2,4,8 --duration 15 --concurrency 64 --json workers.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from loadgen import SCRIPT, _free_port, build_app, summarize  # noqa: E402
+
+SHARED_SESSION_EVERY = 4
+
+
+def create_app():
+    """Fabrique appelée par chaque worker uvicorn (configuration passée par l'environnement)"""
+    routers = [spec for spec in os.environ.get("FLOWME_BENCH_ROUTERS", "").split(",") if spec]
+    return build_app(os.environ.get("FLOWME_BENCH_APP", "main:app"), routers)
+
+
+def default_levels() -> List[int]:
+    levels, workers = [], 1
+    while workers <= max(os.cpu_count() or 1, 2):
+        levels.append(workers)
+        workers *= 2
+    return levels
+
+
+class Server:
+    """uvicorn --workers N dans un sous-processus"""
+
+    def __init__(self, workers: int, args, database: str):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = {
+            **os.environ,
+            "FLOWME_BENCH_APP": args.app,
+            "FLOWME_BENCH_ROUTERS": ",".join(args.router),
+            "FLOWME_SESSION_BACKEND": args.backend,
+            "FLOWME_SESSION_DB": database,
+            "FLOWME_STORE": "off",
+            "FLOWME_LOG_LEVEL": "WARNING"
+        }
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "bench_workers:create_app", "--factory",
+             "--app-dir", BENCH_DIR, "--host", "127.0.0.1", "--port", str(self.port),
+             "--workers", str(workers), "--log-level", "warning"],
+            env=env
+        )
+
+    def wait_ready(self, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"uvicorn s'est arrêté (code {self.process.returncode})")
+            try:
+                if httpx.get(f"{self.url}/api/v1/sessions/stats", timeout=1).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        raise RuntimeError("uvicorn n'a pas démarré")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class Level:
+    """Mesures et état attendu d'un palier"""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.latencies: List[float] = []
+        self.errors: Counter = Counter()
+        self.sent: Counter = Counter()            # Requêtes réussies par session
+        self.states: Dict[str, List[int]] = {}    # États détectés, dans l'ordre (sessions propres)
+        self.followers: List[List[int]] = []      # Identifiants reçus par chaque abonné SSE
+
+    @property
+    def shared_session(self) -> str:
+        return f"{self.prefix}-shared"
+
+    def own_session(self, index: int) -> str:
+        return f"{self.prefix}-{index}"
+
+
+async def follow(client: httpx.AsyncClient, level: Level, session_id: str, ready: asyncio.Event):
+    received: List[int] = []
+    level.followers.append(received)
+    try:
+        async with client.stream("GET", "/api/v1/stream/states", params={"session_id": session_id},
+                                 timeout=httpx.Timeout(None, connect=10)) as response:
+            ready.set()
+            async for line in response.aiter_lines():
+                if line.startswith("id: "):
+                    received.append(int(line[4:]))
+    finally:
+        ready.set()
+
+
+async def drive(client: httpx.AsyncClient, level: Level, index: int, deadline: float, record: bool):
+    own = level.own_session(index)
+    level.states.setdefault(own, [])
+    turn = 0
+    while time.perf_counter() < deadline:
+        session_id = level.shared_session if turn % SHARED_SESSION_EVERY == SHARED_SESSION_EVERY - 1 else own
+        started = time.perf_counter()
+        try:
+            response = await client.post("/api/v1/interact",
+                                         json={"message": SCRIPT[(index + turn) % len(SCRIPT)],
+                                               "session_id": session_id})
+            if response.status_code != 200:
+                level.errors[f"HTTP {response.status_code}"] += 1
+            else:
+                level.sent[session_id] += 1
+                if session_id == own:
+                    level.states[own].append(response.json()["detected_state"])
+                if record:
+                    level.latencies.append(time.perf_counter() - started)
+        except httpx.HTTPError as e:
+            level.errors[type(e).__name__] += 1
+        turn += 1
+
+
+def expected_transitions(states: List[int]) -> int:
+    previous, count = 1, 0
+    for state in states:
+        count += state != previous
+        previous = state
+    return count
+
+
+async def check(client: httpx.AsyncClient, level: Level) -> List[str]:
+    """Écarts entre l'état lu par l'API (n'importe quel worker) et ce que le client a observé"""
+    problems = []
+    for session_id, sent in sorted(level.sent.items()):
+        metrics = (await client.get("/api/v1/state/current", params={"session_id": session_id})
+                   ).json()["session_metrics"]
+        if metrics.get("interactions") != sent:
+            problems.append(f"{session_id}: {metrics.get('interactions')} interactions lues, {sent} envoyées")
+        states = level.states.get(session_id)
+        if states and metrics["current_state"] != states[-1]:
+            problems.append(f"{session_id}: état {metrics['current_state']}, attendu {states[-1]}")
+
+    transitions = expected_transitions(level.states[level.own_session(0)])
+    for number, received in enumerate(level.followers, 1):
+        if len(received) != transitions:
+            problems.append(f"abonné SSE {number}: {len(received)} événements reçus, {transitions} transitions")
+    return problems
+
+
+async def run_level(url: str, args, workers: int) -> Dict[str, Any]:
+    level = Level(f"w{workers}-{datetime.now().strftime('%H%M%S')}")
+    limits = httpx.Limits(max_connections=args.concurrency + 4, max_keepalive_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        # Échauffement : imports paresseux et caches de chaque worker (non mesuré)
+        warmup = Level(f"warmup-{level.prefix}")
+        await asyncio.gather(*(drive(client, warmup, index, time.perf_counter() + args.warmup, False)
+                               for index in range(args.concurrency)))
+
+        followers = []
+        for _ in range(2):
+            ready = asyncio.Event()
+            followers.append(asyncio.create_task(follow(client, level, level.own_session(0), ready)))
+            await ready.wait()
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(drive(client, level, index, deadline, True) for index in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        await asyncio.sleep(0.5)  # Derniers événements relayés
+        for task in followers:
+            task.cancel()
+        await asyncio.gather(*followers, return_exceptions=True)
+        problems = await check(client, level)
+
+    completed = len(level.latencies)
+    return {
+        "workers": workers,
+        "requests": completed,
+        "errors": dict(level.errors),
+        "throughput_rps": round(completed / elapsed, 1),
+        "latency": summarize(level.latencies),
+        "shared_session_requests": level.sent[level.shared_session],
+        "sse_events": [len(received) for received in level.followers],
+        "consistency_problems": problems
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="main:app", help="application ASGI (module:attribut)")
+    parser.add_argument("--router", action="append", default=[],
+                        help="routeur à monter s'il ne l'est pas déjà (module:attribut, répétable)")
+    parser.add_argument("--workers", type=lambda spec: [int(part) for part in spec.split(",")],
+                        default=default_levels(), help="paliers de workers (défaut : 1, 2, 4… jusqu'aux cœurs)")
+    parser.add_argument("--backend", choices=("sqlite", "memory"), default="sqlite")
+    parser.add_argument("--concurrency", type=int, default=32, help="requêtes simultanées (une session chacune)")
+    parser.add_argument("--duration", type=float, default=10.0, help="durée mesurée par palier (s)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="échauffement par palier (s)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--json", help="écrit les résultats dans ce fichier")
+    args = parser.parse_args()
+
+    print(f"🧵 Débit FlowMe de {args.workers[0]} à {args.workers[-1]} workers "
+          f"(backend {args.backend}, {args.concurrency} clients, {os.cpu_count()} cœurs)")
+    print("=" * 84)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in args.workers:
+            server = Server(workers, args, os.path.join(directory, f"sessions-{workers}.db"))
+            try:
+                server.wait_ready()
+                result = asyncio.run(run_level(server.url, args, workers))
+            finally:
+                server.stop()
+            results.append(result)
+
+            baseline: Optional[float] = results[0]["throughput_rps"] or None
+            speedup = result["throughput_rps"] / baseline if baseline else 0.0
+            latency = result["latency"]
+            status = "✅" if not result["consistency_problems"] and not result["errors"] else "❌"
+            print(f"{status} {workers:2d} worker(s) {result['throughput_rps']:8.1f} req/s  x{speedup:4.2f} "
+                  f"(efficacité {speedup / workers * 100:3.0f} %)  p50 {latency['p50_ms']:7.2f} ms  "
+                  f"p99 {latency['p99_ms']:7.2f} ms  SSE {result['sse_events']}")
+            for problem in result["consistency_problems"][:5]:
+                print(f"     - {problem}")
+            if result["errors"]:
+                print(f"     - erreurs : {result['errors']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"started_at": datetime.now().isoformat(), "backend": args.backend,
+                       "environment": {"python": platform.python_version(), "cpus": os.cpu_count()},
+                       "results": results}, handle, indent=2, ensure_ascii=False)
+        print(f"💾 {args.json}")
+
+    failed = any(result["errors"] or result["consistency_problems"] for result in results)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,455 @@
+# benchmarks/loadgen.py - Générateur de charge de bout en bout (sessions de chat scriptées)
+"""
+Rejoue des sessions de conversation à plusieurs tours, en parallèle, contre
+l'application lancée dans le processus (uvicorn sur un port local) ou contre
+une URL existante.
+
+Profils d'utilisateurs virtuels (--mix) :
+- enhanced : POST /analyze/enhanced avec previous_states croissant (comme l'interface)
+- interact : POST /api/v1/interact
+- ws       : WebSocket /api/v1/ws/{session_id}, un message à la fois
+- sse      : session interact suivie par un abonné /api/v1/stream/states
+
+Rapport par point d'accès : p50 / p95 / p99, taux d'erreur, débit ;
+retard de la boucle d'événements (serveur en local, client toujours) ;
+résultats écrits en JSON pour comparer les exécutions (--compare).
+
+Usage :
+    python benchmarks/loadgen.py --users 100 --turns 8 --router api.flowme_endpoints:router
+    python benchmarks/loadgen.py --url http://localhost:8000 --mix enhanced=1 --json run.json
+    python benchmarks/loadgen.py --router api.flowme_endpoints:router --compare run.json
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import platform
+import random
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules importés depuis la racine du dépôt, sous les mêmes noms que l'application
+sys.path.insert(0, ROOT)
+
+PROFILES = ("enhanced", "interact", "ws", "sse")
+DEFAULT_MIX = "enhanced=4,interact=3,ws=2,sse=1"
+
+# Tours de conversation rejoués (dans l'ordre, en boucle)
+SCRIPT = (
+    "Bonjour, je ne sais pas trop par où commencer",
+    "Je suis un peu triste depuis quelques jours",
+    "Au travail tout devient difficile, je me sens perdu",
+    "Je ne comprends pas pourquoi cette situation me touche autant",
+    "Mon couple traverse aussi une période de conflit",
+    "J'ai l'impression de tourner en rond, est-ce que ça peut changer ?",
+    "Merci, ça m'aide de mettre des mots dessus",
+    "Il y a quand même de l'espoir et un peu de joie ce matin",
+    "Je voudrais comprendre comment avancer vers un nouveau projet",
+    "Parfois je ressens de la colère, puis de la tendresse",
+)
+
+LAG_INTERVAL = 0.01
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Percentile au rang le plus proche (valeurs triées)"""
+    if not values:
+        return 0.0
+    rank = max(int(round(p / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Statistiques de latence en millisecondes"""
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0, "mean_ms": 0.0}
+    return {
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3)
+    }
+
+
+class Recorder:
+    """Latences et erreurs par point d'accès"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Counter] = {}
+
+    def ok(self, endpoint: str, latency: float):
+        self.latencies.setdefault(endpoint, []).append(latency)
+
+    def error(self, endpoint: str, reason: str):
+        self.errors.setdefault(endpoint, Counter())[reason] += 1
+
+    def report(self, duration: float) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            latencies = self.latencies.get(endpoint, [])
+            errors = self.errors.get(endpoint, Counter())
+            total = len(latencies) + sum(errors.values())
+            report[endpoint] = {
+                "requests": total,
+                "errors": sum(errors.values()),
+                "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+                "throughput_rps": round(len(latencies) / duration, 2) if duration else 0.0,
+                **summarize(latencies),
+                "error_reasons": dict(errors)
+            }
+        return report
+
+
+class LoopLagMonitor:
+    """Retard de réveil d'une boucle asyncio (latence de planification)"""
+
+    def __init__(self, interval: float = LAG_INTERVAL):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._running = True
+
+    async def run(self):
+        while self._running:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(time.perf_counter() - started - self.interval, 0.0))
+
+    def stop(self):
+        self._running = False
+
+    def report(self) -> Dict[str, float]:
+        return {**summarize(self.samples), "samples": len(self.samples)}
+
+
+# Application dans le processus
+
+def load_object(spec: str):
+    """Objet désigné par "module:attribut" (nom d'import depuis la racine du dépôt)"""
+    module_name, _, attribute = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def build_app(app_spec: str, routers: List[str]):
+    app = load_object(app_spec)
+    mounted = {getattr(route, "path", None) for route in app.router.routes}
+    for spec in routers:
+        router = load_object(spec)
+        if not {route.path for route in router.routes} <= mounted:
+            app.include_router(router)
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class InProcessServer:
+    """uvicorn sur un thread dédié, avec mesure du retard de sa boucle"""
+
+    def __init__(self, app, port: int):
+        import uvicorn
+
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                                   lifespan="on", ws_max_queue=64))
+        self.lag = LoopLagMonitor()
+        self._thread = threading.Thread(target=self._run, name="loadgen-server", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        monitor = loop.create_task(self.lag.run())
+        try:
+            loop.run_until_complete(self.server.serve())
+        finally:
+            self.lag.stop()
+            loop.run_until_complete(asyncio.gather(monitor, return_exceptions=True))
+            loop.close()
+
+    def start(self, timeout: float = 60.0):
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Le serveur uvicorn n'a pas démarré")
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join(timeout=15)
+
+
+# Utilisateurs virtuels
+
+class LoadContext:
+    def __init__(self, client: httpx.AsyncClient, ws_url: str, recorder: Recorder, turns: int,
+                 think: float, rng: random.Random):
+        self.client = client
+        self.ws_url = ws_url
+        self.recorder = recorder
+        self.turns = turns
+        self.think = think
+        self.rng = rng
+
+    async def pause(self):
+        if self.think:
+            await asyncio.sleep(self.think * self.rng.uniform(0.5, 1.5))
+
+    def message(self, turn: int) -> str:
+        return SCRIPT[turn % len(SCRIPT)]
+
+    async def post(self, endpoint: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(endpoint, json=payload)
+        except httpx.HTTPError as e:
+            self.recorder.error(endpoint, type(e).__name__)
+            return None
+        latency = time.perf_counter() - started
+        if response.status_code >= 400:
+            self.recorder.error(endpoint, f"HTTP {response.status_code}")
+            return None
+        self.recorder.ok(endpoint, latency)
+        return response.json()
+
+
+async def run_enhanced(ctx: LoadContext, session_id: str):
+    previous_states: List[int] = []
+    for turn in range(ctx.turns):
+        data = await ctx.post("/analyze/enhanced", {
+            "message": ctx.message(turn), "previous_states": previous_states, "deep_analysis": True
+        })
+        if data is not None and "detected_state" in data:
+            previous_states.append(data["detected_state"])
+        await ctx.pause()
+
+
+async def run_interact(ctx: LoadContext, session_id: str):
+    for turn in range(ctx.turns):
+        await ctx.post("/api/v1/interact", {"message": ctx.message(turn), "session_id": session_id})
+        await ctx.pause()
+
+
+async def run_ws(ctx: LoadContext, session_id: str):
+    endpoint = "/api/v1/ws"
+    try:
+        import websockets
+    except ImportError:
+        ctx.recorder.error(endpoint, "websockets non installé")
+        return
+
+    started = time.perf_counter()
+    try:
+        async with websockets.connect(f"{ctx.ws_url}/api/v1/ws/{session_id}") as websocket:
+            json.loads(await websocket.recv())  # connection_established
+            ctx.recorder.ok("/api/v1/ws (connexion)", time.perf_counter() - started)
+            for turn in range(ctx.turns):
+                started = time.perf_counter()
+                await websocket.send(json.dumps({"type": "message", "content": ctx.message(turn)}))
+                while True:
+                    frame = json.loads(await websocket.recv())
+                    if frame.get("type") in ("flowme_response", "busy", "error"):
+                        break
+                if frame["type"] == "flowme_response":
+                    ctx.recorder.ok(endpoint, time.perf_counter() - started)
+                else:
+                    ctx.recorder.error(endpoint, frame["type"])
+                await ctx.pause()
+    except (OSError, websockets.exceptions.WebSocketException) as e:
+        ctx.recorder.error(endpoint, type(e).__name__)
+
+
+async def _follow_stream(ctx: LoadContext, session_id: str, ready: asyncio.Event):
+    """Abonné SSE : délai entre la publication d'un événement et sa réception"""
+    endpoint = "/api/v1/stream/states"
+    started = time.perf_counter()
+    try:
+        async with ctx.client.stream("GET", endpoint, params={"session_id": session_id},
+                                     timeout=httpx.Timeout(None, connect=10)) as response:
+            if response.status_code >= 400:
+                ctx.recorder.error(endpoint, f"HTTP {response.status_code}")
+                return
+            ctx.recorder.ok(f"{endpoint} (connexion)", time.perf_counter() - started)
+            ready.set()
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    published = datetime.fromisoformat(json.loads(line[6:])["timestamp"])
+                    ctx.recorder.ok(f"{endpoint} (événement)",
+                                    max((datetime.now() - published).total_seconds(), 0.0))
+    except httpx.HTTPError as e:
+        ctx.recorder.error(endpoint, type(e).__name__)
+    finally:
+        ready.set()
+
+
+async def run_sse(ctx: LoadContext, session_id: str):
+    ready = asyncio.Event()
+    follower = asyncio.create_task(_follow_stream(ctx, session_id, ready))
+    await ready.wait()
+    try:
+        await run_interact(ctx, session_id)
+        await asyncio.sleep(0.2)  # Laisser arriver les derniers événements
+    finally:
+        follower.cancel()
+        await asyncio.gather(follower, return_exceptions=True)
+
+
+RUNNERS = {"enhanced": run_enhanced, "interact": run_interact, "ws": run_ws, "sse": run_sse}
+
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    mix = {}
+    for part in filter(None, (item.strip() for item in spec.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in RUNNERS:
+            raise argparse.ArgumentTypeError(f"Profil inconnu : {name} (attendus : {', '.join(PROFILES)})")
+        mix[name] = int(weight or 1)
+    if not mix or not any(mix.values()):
+        raise argparse.ArgumentTypeError("Mélange vide")
+    return mix
+
+
+def assign_profiles(users: int, mix: Dict[str, int]) -> List[str]:
+    """Répartition déterministe des utilisateurs selon les poids"""
+    total = sum(mix.values())
+    profiles: List[str] = []
+    for name, weight in mix.items():
+        profiles += [name] * round(users * weight / total)
+    while len(profiles) < users:
+        profiles.append(max(mix, key=mix.get))
+    return profiles[:users]
+
+
+async def run_load(base_url: str, args, run_id: str) -> Tuple[Recorder, LoopLagMonitor, float, Counter]:
+    recorder = Recorder()
+    client_lag = LoopLagMonitor()
+    lag_task = asyncio.create_task(client_lag.run())
+    profiles = assign_profiles(args.users, args.mix)
+    ws_url = "ws" + base_url[len("http"):]
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        async def user(index: int, profile: str):
+            ctx = LoadContext(client, ws_url, recorder, args.turns, args.think_ms / 1000,
+                              random.Random(args.seed + index))
+            await asyncio.sleep(args.ramp * index / max(args.users, 1))
+            for session in range(args.sessions):
+                await RUNNERS[profile](ctx, f"load-{run_id}-{index}-{session}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(index, profile) for index, profile in enumerate(profiles)))
+        duration = time.perf_counter() - started
+
+    client_lag.stop()
+    await lag_task
+    return recorder, client_lag, duration, Counter(profiles)
+
+
+def print_report(result: Dict[str, Any], previous: Optional[Dict[str, Any]] = None):
+    print("point d'accès".ljust(34) + f" {'req':>6} {'err %':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+          + ("   Δp95" if previous else ""))
+    for endpoint, stats in result["endpoints"].items():
+        line = (f"{endpoint:<34} {stats['requests']:>6} {stats['error_rate'] * 100:>6.1f} "
+                f"{stats['throughput_rps']:>8.1f} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} "
+                f"{stats['p99_ms']:>8.1f}")
+        before = (previous or {}).get("endpoints", {}).get(endpoint)
+        if before and before["p95_ms"]:
+            line += f" {(stats['p95_ms'] / before['p95_ms'] - 1) * 100:+6.0f} %"
+        print(line)
+        for reason, count in stats["error_reasons"].items():
+            print(f"    ⚠️  {reason} × {count}")
+    for name, lag in result["event_loop_lag"].items():
+        print(f"retard de boucle ({name}) : p50 {lag['p50_ms']:.2f} ms, p99 {lag['p99_ms']:.2f} ms, "
+              f"max {lag['max_ms']:.2f} ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="cible existante (sinon application lancée dans le processus)")
+    parser.add_argument("--app", default="main:app", help="application ASGI (module:attribut)")
+    parser.add_argument("--router", action="append", default=[],
+                        help="routeur à monter s'il ne l'est pas déjà (module:attribut, répétable)")
+    parser.add_argument("--users", type=int, default=50, help="utilisateurs virtuels simultanés")
+    parser.add_argument("--sessions", type=int, default=1, help="sessions successives par utilisateur")
+    parser.add_argument("--turns", type=int, default=8, help="tours de conversation par session")
+    parser.add_argument("--think-ms", type=float, default=100.0, help="pause moyenne entre deux tours")
+    parser.add_argument("--ramp", type=float, default=2.0, help="durée de montée en charge (s)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"poids des profils (défaut {DEFAULT_MIX})")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=21)
+    parser.add_argument("--json", help="écrit les résultats dans ce fichier")
+    parser.add_argument("--compare", help="résultats JSON d'une exécution précédente")
+    args = parser.parse_args()
+
+    os.environ.setdefault("FLOWME_LOG_LEVEL", "WARNING")
+    run_id = datetime.now().strftime("%H%M%S")
+    server = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        server = InProcessServer(build_app(args.app, args.router), _free_port())
+        server.start()
+        base_url = server.url
+
+    print(f"🚦 Charge FlowMe : {args.users} utilisateurs × {args.sessions} session(s) × {args.turns} tours "
+          f"→ {base_url}")
+    try:
+        recorder, client_lag, duration, profiles = asyncio.run(run_load(base_url, args, run_id))
+    finally:
+        if server is not None:
+            server.stop()
+
+    lag = {"client": client_lag.report()}
+    if server is not None:
+        lag["server"] = server.lag.report()
+    result = {
+        "started_at": datetime.now().isoformat(),
+        "target": args.url or f"in-process {args.app} {' '.join(args.router)}".strip(),
+        "config": {"users": args.users, "sessions": args.sessions, "turns": args.turns,
+                   "think_ms": args.think_ms, "ramp_s": args.ramp, "mix": args.mix,
+                   "profiles": dict(profiles), "seed": args.seed},
+        "environment": {"python": platform.python_version(), "machine": platform.machine()},
+        "duration_s": round(duration, 3),
+        "endpoints": recorder.report(duration),
+        "event_loop_lag": lag
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            previous = json.load(handle)
+    print(f"⏱️  {duration:.2f} s")
+    print_report(result, previous)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(result, handle, indent=2, ensure_ascii=False)
+        print(f"💾 {args.json}")
+
+    failed = any(stats["error_rate"] > 0 for stats in result["endpoints"].values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+# flowme_analysis_cache.py - Cache des analyses de messages
+"""
+Cache TTL + LRU des analyses de /analyze et /analyze/enhanced
+
+- clé : message normalisé + champs de contexte pertinents
+- les requêtes identiques en cours de calcul sont regroupées (un seul calcul)
+- les calculs manquants s'exécutent hors de la boucle d'événements
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+from flowme_profiling import current_profile, profiled
+
+# Configuration environnement
+ANALYSIS_CACHE_SIZE = int(os.getenv("FLOWME_ANALYSIS_CACHE_SIZE", "4096"))
+ANALYSIS_CACHE_TTL = float(os.getenv("FLOWME_ANALYSIS_CACHE_TTL", "300"))
+
+# Valeurs de l'en-tête X-FlowMe-Cache
+HIT, MISS, COALESCED, BYPASS = "HIT", "MISS", "COALESCED", "BYPASS"
+
+T = TypeVar("T")
+
+
+def normalize_message(message: str) -> str:
+    """Forme canonique d'un message : minuscules, espaces réduits"""
+    return " ".join(message.lower().split())
+
+
+def freeze_context(context: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Représentation stable d'un contexte pour la clé de cache
+
+    Retourne None si le contexte n'est pas sérialisable (pas de mise en cache).
+    """
+    if not context:
+        return ""
+    try:
+        return json.dumps(context, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None
+
+
+class AnalysisCache:
+    """
+    Cache TTL + LRU avec regroupement des calculs en vol
+
+    Les valeurs sont partagées entre requêtes : elles ne doivent pas être modifiées.
+    """
+
+    def __init__(self, maxsize: int = ANALYSIS_CACHE_SIZE, ttl: float = ANALYSIS_CACHE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.maxsize = max(maxsize, 0)
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "expired": 0,
+                          "evictions": 0, "errors": 0, "bypassed": 0}
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """(trouvé, valeur) ; une entrée expirée est retirée"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self._counters["expired"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    async def get_or_compute(self, key: Optional[Hashable], compute: Callable[[], T]) -> Tuple[T, str]:
+        """
+        Valeur en cache, ou calculée dans un thread ; les appels concurrents
+        de même clé attendent le calcul en cours
+
+        Returns:
+            (valeur, statut) où statut vaut HIT, MISS, COALESCED ou BYPASS
+            (clé None, ou requête profilée à la demande : le calcul est mesuré)
+        """
+        profile = current_profile()
+        if key is None or (profile is not None and profile.explicit):
+            self._counters["bypassed"] += 1
+            return await asyncio.to_thread(profiled(compute)), BYPASS
+
+        found, value = self.get(key)
+        if found:
+            self._counters["hits"] += 1
+            return value, HIT
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self._counters["coalesced"] += 1
+            return await asyncio.shield(pending), COALESCED
+
+        # Le calcul ne dépend pas de la requête qui l'a lancé (déconnexion sans effet)
+        self._counters["misses"] += 1
+        task = asyncio.ensure_future(self._compute(key, profiled(compute)))
+        self._inflight[key] = task
+        return await asyncio.shield(task), MISS
+
+    async def _compute(self, key: Hashable, compute: Callable[[], T]) -> T:
+        try:
+            value = await asyncio.to_thread(compute)
+            self.put(key, value)
+            return value
+        except Exception:
+            self._counters["errors"] += 1
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"] + counters["coalesced"]
+        return {
+            **counters,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "in_flight": len(self._inflight),
+            "hit_rate": (counters["hits"] + counters["coalesced"]) / lookups if lookups else 0.0
+        }
+
+
+# Cache partagé par /analyze et /analyze/enhanced (clés préfixées par endpoint)
+analysis_cache = AnalysisCache()
+
+
+if __name__ == "__main__":
+    async def _demo():
+        print("🗃️  Test du cache d'analyses FlowMe")
+        cache = AnalysisCache(maxsize=2, ttl=60)
+        calls = []
+
+        def slow_analysis():
+            time.sleep(0.05)
+            calls.append(1)
+            return {"detected_state": 1}
+
+        key = ("analyze", normalize_message("  Bonjour "), "")
+        results = await asyncio.gather(*(cache.get_or_compute(key, slow_analysis) for _ in range(10)))
+        print(f"  10 requêtes simultanées → {len(calls)} calcul, statuts {sorted({s for _, s in results})}")
+        _, status = await cache.get_or_compute(("analyze", normalize_message("BONJOUR"), ""), slow_analysis)
+        print(f"  'BONJOUR' après normalisation → {status}")
+        print(cache.stats())
+
+    asyncio.run(_demo())
@@ -0,0 +1,236 @@
+# flowme_analytics.py - Analytics de session maintenues à chaque transition
+"""
+Compteurs de session mis à jour en O(1) à chaque transition
+
+- nombre de passages par état et par famille symbolique
+- matrice 64×64 des transitions (allouée à la première transition)
+- statistiques glissantes de la qualité du flux
+
+Les lectures (distribution, transitions fréquentes, rang d'un état)
+ne parcourent que les 64 états ou les transitions déjà observées.
+"""
+
+import heapq
+from array import array
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+STATE_COUNT = 64
+
+# Lissage de la moyenne mobile exponentielle de la qualité du flux
+QUALITY_EWMA_ALPHA = 0.2
+QUALITY_TREND_THRESHOLD = 0.02
+
+
+class FamilyTable:
+    """Correspondance état → famille symbolique (partagée par toutes les sessions)"""
+
+    __slots__ = ("family_of", "states_of")
+
+    def __init__(self, states: Mapping[int, Mapping[str, Any]]):
+        family_of: List[Optional[str]] = [None] * STATE_COUNT
+        states_of: Dict[str, List[int]] = {}
+        for state_id, state_data in states.items():
+            family = state_data.get("famille_symbolique")
+            if 1 <= state_id <= STATE_COUNT:
+                family_of[state_id - 1] = family
+            states_of.setdefault(family, []).append(state_id)
+        self.family_of: Tuple[Optional[str], ...] = tuple(family_of)
+        self.states_of: Dict[str, Tuple[int, ...]] = {
+            family: tuple(state_ids) for family, state_ids in states_of.items()
+        }
+
+
+class SessionAnalytics:
+    """
+    Accumulateur d'analytics d'une session
+
+    Les compteurs d'états portent sur les états quittés (équivalent à
+    l'historique complet de la session, sans troncature) ; chaque transition
+    incrémente aussi la case (état quitté, nouvel état) de la matrice.
+    La table des familles peut être fournie par une fonction, appelée à la
+    première transition.
+    """
+
+    __slots__ = ("_families", "state_counts", "family_counts", "transitions", "departures",
+                 "distinct_states", "out_of_range", "_seen_states", "_seen_transitions",
+                 "quality_count", "quality_sum", "quality_min", "quality_max",
+                 "quality_last", "quality_ewma")
+
+    def __init__(self, families: Union[FamilyTable, Callable[[], FamilyTable]]):
+        self._families = families
+        self.reset()
+
+    @property
+    def families(self) -> FamilyTable:
+        if not isinstance(self._families, FamilyTable):
+            self._families = self._families()
+        return self._families
+
+    def reset(self):
+        self.state_counts = array("I", bytes(4 * STATE_COUNT))
+        self.family_counts: Dict[str, int] = {}
+        self.transitions: Optional[array] = None
+        self.departures = 0
+        self.distinct_states = 0
+        self.out_of_range = 0
+        # Ordre de première apparition (départage des égalités comme Counter)
+        self._seen_states: List[int] = []
+        self._seen_transitions: List[int] = []
+
+        self.quality_count = 0
+        self.quality_sum = 0.0
+        self.quality_min = 0.0
+        self.quality_max = 0.0
+        self.quality_last = 0.0
+        self.quality_ewma = 0.0
+
+    @property
+    def nbytes(self) -> int:
+        """Taille des tableaux de compteurs"""
+        size = self.state_counts.buffer_info()[1] * self.state_counts.itemsize
+        if self.transitions is not None:
+            size += self.transitions.buffer_info()[1] * self.transitions.itemsize
+        return size + 8 * (len(self._seen_states) + len(self._seen_transitions))
+
+    def record_transition(self, from_state: int, to_state: int):
+        """Enregistre une transition effective (from_state quitté pour to_state)"""
+        families = self.families  # Chargée avant toute mise à jour des compteurs
+        self.departures += 1
+        if not 1 <= from_state <= STATE_COUNT:
+            self.out_of_range += 1
+            return
+
+        index = from_state - 1
+        if self.state_counts[index] == 0:
+            self.distinct_states += 1
+            self._seen_states.append(from_state)
+        self.state_counts[index] += 1
+
+        family = families.family_of[index]
+        if family is not None:
+            self.family_counts[family] = self.family_counts.get(family, 0) + 1
+
+        if 1 <= to_state <= STATE_COUNT:
+            if self.transitions is None:
+                self.transitions = array("I", bytes(4 * STATE_COUNT * STATE_COUNT))
+            cell = index * STATE_COUNT + to_state - 1
+            if self.transitions[cell] == 0:
+                self._seen_transitions.append(cell)
+            self.transitions[cell] += 1
+
+    def record_quality(self, quality: float):
+        """Ajoute une mesure de qualité du flux"""
+        if self.quality_count == 0:
+            self.quality_min = self.quality_max = self.quality_ewma = quality
+        else:
+            self.quality_min = min(self.quality_min, quality)
+            self.quality_max = max(self.quality_max, quality)
+            self.quality_ewma += QUALITY_EWMA_ALPHA * (quality - self.quality_ewma)
+        self.quality_count += 1
+        self.quality_sum += quality
+        self.quality_last = quality
+
+    # Lectures
+
+    def state_count(self, state_id: int) -> int:
+        return self.state_counts[state_id - 1] if 1 <= state_id <= STATE_COUNT else 0
+
+    def transition_count(self, from_state: int, to_state: int) -> int:
+        if self.transitions is None or not (1 <= from_state <= STATE_COUNT and 1 <= to_state <= STATE_COUNT):
+            return 0
+        return self.transitions[(from_state - 1) * STATE_COUNT + to_state - 1]
+
+    @property
+    def distinct_transitions(self) -> int:
+        return len(self._seen_transitions)
+
+    @property
+    def total_transitions(self) -> int:
+        return self.departures - self.out_of_range
+
+    @property
+    def average_quality(self) -> Optional[float]:
+        return self.quality_sum / self.quality_count if self.quality_count else None
+
+    def most_common_states(self, n: int) -> List[Tuple[int, int]]:
+        """Les n états les plus quittés, comme Counter.most_common"""
+        counts = self.state_counts
+        return heapq.nlargest(n, ((state, counts[state - 1]) for state in self._seen_states),
+                              key=lambda item: item[1])
+
+    def most_common_transitions(self, n: int) -> List[Tuple[Tuple[int, int], int]]:
+        """Les n transitions les plus fréquentes, ((de, vers), nombre)"""
+        matrix = self.transitions
+        if matrix is None:
+            return []
+        return heapq.nlargest(
+            n,
+            (((cell // STATE_COUNT + 1, cell % STATE_COUNT + 1), matrix[cell])
+             for cell in self._seen_transitions),
+            key=lambda item: item[1]
+        )
+
+    def frequency_rank(self, state_id: int) -> Optional[int]:
+        """Rang de l'état par fréquence (1 = le plus fréquent, ex aequo au même rang)"""
+        count = self.state_count(state_id)
+        if count == 0:
+            return None
+        return 1 + sum(1 for other in self.state_counts if other > count)
+
+    def family_distribution(self, family: str) -> Dict[int, int]:
+        return {state_id: self.state_count(state_id) for state_id in self.families.states_of.get(family, ())}
+
+    def quality_trend(self) -> str:
+        if self.quality_count < 2:
+            return "insufficient_data"
+        delta = self.quality_ewma - self.average_quality
+        if delta > QUALITY_TREND_THRESHOLD:
+            return "en_progression"
+        if delta < -QUALITY_TREND_THRESHOLD:
+            return "en_baisse"
+        return "stable"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Vue d'ensemble sérialisable"""
+        average = self.average_quality
+        return {
+            "departures": self.departures,
+            "distinct_states": self.distinct_states,
+            "distinct_transitions": self.distinct_transitions,
+            "family_counts": dict(self.family_counts),
+            "flow_quality": {
+                "count": self.quality_count,
+                "average": round(average, 4) if average is not None else None,
+                "min": self.quality_min if self.quality_count else None,
+                "max": self.quality_max if self.quality_count else None,
+                "last": self.quality_last if self.quality_count else None,
+                "trend": self.quality_trend()
+            }
+        }
+
+
+if __name__ == "__main__":
+    import random
+    from collections import Counter
+
+    print("📊 Vérification des analytics incrémentales FlowMe")
+    table = FamilyTable({i: {"famille_symbolique": f"Famille {i % 6}"} for i in range(1, 65)})
+    rng = random.Random(14)
+    for _ in range(200):
+        analytics = SessionAnalytics(table)
+        path = [1] + [rng.choice(range(1, 65)) if rng.random() < 0.5 else rng.choice((1, 8, 45))
+                      for _ in range(rng.randint(0, 120))]
+        history = []
+        for previous, state in zip(path, path[1:]):
+            if state != previous:
+                analytics.record_transition(previous, state)
+                history.append(previous)
+        transitions = list(zip(history, history[1:] + [path[-1]]))
+
+        assert analytics.most_common_states(3) == Counter(history).most_common(3)
+        assert analytics.most_common_transitions(3) == Counter(transitions).most_common(3)
+        assert analytics.distinct_states == len(set(history))
+        assert analytics.distinct_transitions == len(set(transitions))
+        for family, state_ids in table.states_of.items():
+            assert analytics.family_counts.get(family, 0) == sum(1 for s in history if s in state_ids)
+    print("✅ Compteurs identiques au recalcul sur l'historique complet")
@@ -0,0 +1,229 @@
+# flowme_batch.py - Analyse par lots des messages FlowMe
+"""
+Analyse de grands volumes de messages en NDJSON
+Les lots importants sont découpés et répartis sur un pool de processus
+(démarrés par forkserver : pas de fork d'un processus aux threads actifs)
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from flowme_metrics import observe_stage, timed
+from flowme_states_detection import detect_flowme_state, get_state_advice, get_state_info
+
+# Configuration environnement
+BATCH_CHUNK_SIZE = max(int(os.getenv("FLOWME_BATCH_CHUNK_SIZE", "250")), 1)
+BATCH_INLINE_LIMIT = int(os.getenv("FLOWME_BATCH_INLINE_LIMIT", "100"))
+BATCH_MAX_ITEMS = int(os.getenv("FLOWME_BATCH_MAX_ITEMS", "20000"))
+BATCH_WORKERS = int(os.getenv("FLOWME_BATCH_WORKERS", "0")) or min(os.cpu_count() or 1, 8)
+# fork est exclu : journal, écriture du magasin et WebSocket ont des threads actifs
+BATCH_START_METHOD = os.getenv("FLOWME_BATCH_START_METHOD", "forkserver")
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def analysis_context(context: Optional[Dict] = None,
+                     session_history: Optional[List[int]] = None) -> Dict[str, Any]:
+    """Contexte de détection : contexte fourni + dernier état de l'historique"""
+    context = dict(context or {})
+    if session_history:
+        context["etat_precedent"] = session_history[-1]
+    return context
+
+
+@timed("analysis")
+def analyze_core(message: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Partie de l'analyse qui ne dépend que du message et du contexte (mise en cache)"""
+    detected_state = detect_flowme_state(message, context)
+    state_info = get_state_info(detected_state)
+    advice = get_state_advice(detected_state, message, context)
+
+    return {
+        "detected_state": detected_state,
+        "state_info": {
+            "name": state_info.get("name", "Présence"),
+            "famille_symbolique": state_info.get("famille_symbolique", "Écoute subtile"),
+            "mot_cle": state_info.get("mot_cle", "Présence consciente"),
+            "tension_dominante": state_info.get("tension_dominante", "équilibre"),
+            "posture_adaptative": state_info.get("posture_adaptative", "J'accueille avec attention"),
+            "etats_compatibles": state_info.get("etats_compatibles", [8, 32, 45, 58])
+        },
+        "advice": advice
+    }
+
+
+def wrap_analysis(core: Dict[str, Any], message: str,
+                  user_id: Optional[str] = "anonymous") -> Dict[str, Any]:
+    """Réponse de /analyze autour d'une analyse (champs propres à la requête)"""
+    return {
+        "status": "success",
+        **core,
+        "timestamp": datetime.now().isoformat(),
+        "user_id": user_id,
+        "debug_info": {
+            "message_analyzed": message,
+            "detection_method": "flowme_states_detection_v3",
+            "module_working": True
+        }
+    }
+
+
+def build_analysis(message: str, user_id: Optional[str] = "anonymous",
+                   context: Optional[Dict] = None,
+                   session_history: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Analyse un message et construit la réponse de /analyze
+
+    Raises:
+        ValueError: si le message est vide
+    """
+    if not message or not message.strip():
+        raise ValueError("Message vide")
+
+    core = analyze_core(message, analysis_context(context, session_history))
+    return wrap_analysis(core, message, user_id)
+
+
+def analyze_chunk(chunk: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Analyse un sous-lot (exécuté dans un processus du pool)
+
+    Args:
+        chunk: Couples (index, item) où item suit le schéma AnalyzeRequest
+
+    Returns:
+        Résultats ligne par ligne, durée de chaque analyse (s) et latence du sous-lot
+    """
+    started = time.perf_counter()
+    results = []
+    analysis_seconds = []
+
+    for index, item in chunk:
+        item_started = time.perf_counter()
+        try:
+            analysis = build_analysis(
+                item.get("message") or "",
+                user_id=item.get("user_id", "anonymous"),
+                context=item.get("context"),
+                session_history=item.get("session_history")
+            )
+            analysis_seconds.append(time.perf_counter() - item_started)
+            results.append({"type": "result", "index": index, **analysis})
+        except Exception as e:
+            results.append(_error_line(index, e))
+
+    return {
+        "results": results,
+        "analysis_seconds": analysis_seconds,
+        "latency_ms": (time.perf_counter() - started) * 1000
+    }
+
+
+def get_batch_executor() -> ProcessPoolExecutor:
+    """Retourne le pool de processus partagé (créé au premier lot)"""
+    global _executor
+    if _executor is None:
+        method = BATCH_START_METHOD
+        if method not in multiprocessing.get_all_start_methods():
+            method = "spawn"  # forkserver indisponible (Windows)
+        _executor = ProcessPoolExecutor(max_workers=BATCH_WORKERS,
+                                        mp_context=multiprocessing.get_context(method))
+    return _executor
+
+
+def shutdown_batch_executor():
+    """Arrête le pool de processus s'il a été démarré"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def stream_batch(items: List[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """
+    Analyse un lot et produit une ligne NDJSON par message dès qu'elle est prête
+
+    Les lignes "result" portent l'index du message d'origine, suivies d'une
+    ligne "chunk" par sous-lot et d'une ligne "summary" finale.
+    """
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+
+    indexed = list(enumerate(items))
+    chunks = [indexed[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(indexed), BATCH_CHUNK_SIZE)]
+
+    # Petits lots : un seul thread suffit, inutile de payer la sérialisation inter-processus
+    executor: Optional[Executor] = get_batch_executor() if len(items) > BATCH_INLINE_LIMIT else None
+
+    async def run_chunk(chunk_id: int, chunk: List[Tuple[int, Dict[str, Any]]]):
+        try:
+            outcome = await loop.run_in_executor(executor, analyze_chunk, chunk)
+        except Exception as e:
+            # Le sous-lot entier a échoué (processus perdu...) : le signaler ligne par ligne
+            outcome = {"results": [_error_line(index, e) for index, _ in chunk],
+                       "analysis_seconds": [], "latency_ms": 0.0}
+        if executor is not None:
+            # Mesures prises dans un autre processus : enregistrées ici pour /metrics
+            for seconds in outcome["analysis_seconds"]:
+                observe_stage("analysis", seconds)
+        return chunk_id, outcome
+
+    succeeded = failed = 0
+    chunk_latencies = []
+
+    for next_done in asyncio.as_completed([run_chunk(i, chunk) for i, chunk in enumerate(chunks)]):
+        chunk_id, outcome = await next_done
+
+        for line in outcome["results"]:
+            if line.get("status") == "success":
+                succeeded += 1
+            else:
+                failed += 1
+            yield _encode(line)
+
+        chunk_latencies.append(outcome["latency_ms"])
+        yield _encode({
+            "type": "chunk",
+            "chunk": chunk_id,
+            "size": len(outcome["results"]),
+            "latency_ms": round(outcome["latency_ms"], 3)
+        })
+
+    elapsed = time.perf_counter() - started
+    yield _encode({
+        "type": "summary",
+        "total": len(items),
+        "succeeded": succeeded,
+        "failed": failed,
+        "chunks": len(chunks),
+        "chunk_size": BATCH_CHUNK_SIZE,
+        "workers": BATCH_WORKERS if executor is not None else 1,
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "messages_per_second": round(len(items) / elapsed, 1) if elapsed > 0 else None,
+        "chunk_latency_ms": {
+            "min": round(min(chunk_latencies), 3) if chunk_latencies else None,
+            "avg": round(sum(chunk_latencies) / len(chunk_latencies), 3) if chunk_latencies else None,
+            "max": round(max(chunk_latencies), 3) if chunk_latencies else None
+        },
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+def _error_line(index: int, error: Exception) -> Dict[str, Any]:
+    """Ligne NDJSON décrivant l'échec d'un message"""
+    return {
+        "type": "result",
+        "index": index,
+        "status": "error",
+        "error": str(error) or error.__class__.__name__
+    }
+
+
+def _encode(line: Dict[str, Any]) -> bytes:
+    return (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
@@ -0,0 +1,223 @@
+# flowme_catalog.py - Catalogues statiques pré-sérialisés
+"""
+Réponses de catalogue (états, familles) sérialisées une seule fois en octets
+Servies avec ETag / Last-Modified, requêtes conditionnelles (304)
+et projections de champs (?fields=id,name) mises en cache
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Callable, Collection, Dict, Iterable, Mapping, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Repli sur json standard
+    orjson = None
+
+# Configuration environnement
+CATALOG_MAX_AGE = int(os.getenv("FLOWME_CATALOG_MAX_AGE", "300"))
+CATALOG_MAX_PROJECTIONS = int(os.getenv("FLOWME_CATALOG_MAX_PROJECTIONS", "32"))
+
+Fields = Tuple[str, ...]
+
+
+def _to_jsonable(value: Any) -> Any:
+    """Types non sérialisables nativement (ensembles, mappings en lecture seule)"""
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+
+def dumps(payload: Any) -> bytes:
+    """Sérialisation JSON rapide (orjson si disponible)"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_to_jsonable, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_to_jsonable, ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def project_item(item: Dict[str, Any], fields: Fields) -> Dict[str, Any]:
+    """Ne garde que les champs demandés d'un élément de catalogue"""
+    return {field: item[field] for field in fields if field in item}
+
+
+def parse_fields(fields: Optional[str], allowed: Collection[str]) -> Optional[Fields]:
+    """
+    Normalise un paramètre ?fields= (ordre et doublons sans effet)
+
+    Raises:
+        ValueError: si un champ est inconnu
+    """
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    if not requested:
+        return None
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(f"Champs inconnus: {', '.join(sorted(unknown))}")
+    return tuple(sorted(requested))
+
+
+class CatalogEntry:
+    """Une représentation sérialisée : charge utile, octets et ETag"""
+
+    __slots__ = ("payload", "body", "etag")
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.payload = payload
+        self.body = dumps(payload)
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+
+
+class Catalog:
+    """
+    Catalogue construit au premier accès puis servi depuis la mémoire
+
+    Args:
+        build: construit la charge utile complète (appelé une fois par version)
+        project: réduit la charge utile aux champs demandés
+        allowed_fields: champs projetables, déduits de la charge utile
+        version: version du catalogue (par défaut : empreinte du contenu)
+    """
+
+    def __init__(self, build: Callable[[], Dict[str, Any]],
+                 project: Optional[Callable[[Dict[str, Any], Fields], Dict[str, Any]]] = None,
+                 allowed_fields: Optional[Callable[[Dict[str, Any]], Iterable[str]]] = None,
+                 version: Optional[str] = None,
+                 max_age: int = CATALOG_MAX_AGE,
+                 max_projections: int = CATALOG_MAX_PROJECTIONS):
+        self._build = build
+        self._project = project
+        self._allowed_fields = allowed_fields
+        self._version = version or os.getenv("FLOWME_CATALOG_VERSION")
+        self._cache_control = f"public, max-age={max_age}"
+        self._max_projections = max(max_projections, 1)
+
+        self._full: Optional[CatalogEntry] = None
+        self._fields: frozenset = frozenset()
+        self._projections: "OrderedDict[Tuple[str, Fields], CatalogEntry]" = OrderedDict()
+        self._last_modified = ""
+        self._last_modified_ts = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> str:
+        self._ensure_built()
+        return self._version
+
+    @property
+    def fields(self) -> frozenset:
+        """Champs acceptés par ?fields="""
+        self._ensure_built()
+        return self._fields
+
+    def _ensure_built(self) -> CatalogEntry:
+        full = self._full
+        if full is not None:
+            return full
+        with self._lock:
+            if self._full is None:
+                full = CatalogEntry(self._build())
+                if self._allowed_fields is not None:
+                    self._fields = frozenset(self._allowed_fields(full.payload))
+                self._version = self._version or full.etag.strip('"')[:12]
+                self._last_modified_ts = int(time.time())
+                self._last_modified = formatdate(self._last_modified_ts, usegmt=True)
+                self._full = full
+            return self._full
+
+    def invalidate(self):
+        """Oublie toutes les représentations (nouvelle version au prochain accès)"""
+        with self._lock:
+            self._full = None
+            self._projections.clear()
+            self._version = os.getenv("FLOWME_CATALOG_VERSION")
+
+    def entry(self, fields: Optional[str] = None) -> CatalogEntry:
+        """
+        Représentation complète ou projetée
+
+        Raises:
+            ValueError: si la projection est inconnue ou non supportée
+        """
+        full = self._ensure_built()
+        if not fields:
+            return full
+        if self._project is None:
+            raise ValueError("Projection non supportée")
+
+        selected = parse_fields(fields, self._fields)
+        if selected is None:
+            return full
+
+        key = (self._version, selected)
+        with self._lock:
+            entry = self._projections.get(key)
+            if entry is not None:
+                self._projections.move_to_end(key)
+                return entry
+
+        entry = CatalogEntry(self._project(full.payload, selected))
+        with self._lock:
+            self._projections[key] = entry
+            while len(self._projections) > self._max_projections:
+                self._projections.popitem(last=False)
+        return entry
+
+    def is_not_modified(self, entry: CatalogEntry, headers: Headers) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if if_none_match:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or entry.etag in tags
+
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= self._last_modified_ts
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def response(self, headers: Headers, fields: Optional[str] = None) -> Response:
+        """Réponse 200 pré-sérialisée ou 304"""
+        entry = self.entry(fields)
+        response_headers = {
+            "ETag": entry.etag,
+            "Last-Modified": self._last_modified,
+            "Cache-Control": self._cache_control,
+            "X-FlowMe-Catalog-Version": self._version
+        }
+        if self.is_not_modified(entry, headers):
+            return Response(status_code=304, headers=response_headers)
+        return Response(entry.body, media_type="application/json", headers=response_headers)
+
+
+class CatalogGroup:
+    """Catalogues créés à la demande par clé (ex. un par état)"""
+
+    def __init__(self, factory: Callable[[Any], Catalog]):
+        self._factory = factory
+        self._catalogs: Dict[Any, Catalog] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Catalog:
+        catalog = self._catalogs.get(key)
+        if catalog is None:
+            with self._lock:
+                catalog = self._catalogs.setdefault(key, self._factory(key))
+        return catalog
+
+    def invalidate(self):
+        with self._lock:
+            self._catalogs.clear()
@@ -4,12 +4,51 @@ Système intelligent de gestion des constellations d'états FlowMe
 qui comprend les enchaînements et les patterns émergents
 """
 
-import networkx as nx
-import numpy as np
-from typing import Dict, List, Tuple, Optional, Set
+from collections import deque
+from typing import TYPE_CHECKING, Any, Collection, Dict, List, Tuple, Optional, Set
 from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
 import json
+import os
+import threading
+
+from flowme_metrics import timed
+
+if TYPE_CHECKING:
+    import networkx as nx  # Importé au premier moteur construit (démarrage à froid plus rapide)
+
+STATE_COUNT = 64
+
+# Taille du cache LRU des analyses de constellation (clé : séquence d'états)
+CONSTELLATION_CACHE_SIZE = int(os.getenv("FLOWME_CONSTELLATION_CACHE_SIZE", "2048"))
+
+# Intensités émotionnelles associées aux états (0.5 par défaut)
+EMOTIONAL_INTENSITIES = {
+    1: 0.3,   # Présence - calme
+    7: 0.5,   # Curiosité - modérée
+    8: 0.4,   # Résonance - harmonieuse
+    14: 0.9,  # Colère - intense
+    22: 0.6,  # Pragmatisme - focalisée
+    32: 0.7,  # Expression - dynamique
+    39: 0.8,  # Obstacles - tendue
+    45: 0.9,  # Vulnérabilité - intense
+    58: 0.5,  # Inclusion - apaisante
+    64: 0.6   # Ouverture - expansive
+}
+
+# Pondération des facteurs d'intégration : diversité, fluidité, cohérence, profondeur
+INTEGRATION_WEIGHTS = (0.3, 0.3, 0.25, 0.15)
+
+def _fold_sum(values) -> float:
+    """
+    Somme de gauche à droite, identique à une accumulation incrémentale
+    (sum() compense les erreurs d'arrondi depuis Python 3.12)
+    """
+    total = 0.0
+    for value in values:
+        total += value
+    return total
 
 class ConstellationType(Enum):
     SPIRAL = "spiral"  # Approfondissement progressif
@@ -28,9 +67,10 @@ class StateTransition:
     timestamp: str
     transition_quality: str  # smooth, abrupt, natural, forced
 
-@dataclass
+@dataclass(frozen=True)
 class Constellation:
-    states: List[int]
+    """Résultat d'analyse, immuable : partagé par le cache entre tous les appelants"""
+    states: Tuple[int, ...]
     constellation_type: ConstellationType
     central_theme: str
     emotional_arc: str
@@ -42,8 +82,10 @@ class FlowMeConstellationSystem:
     """Système de gestion des constellations d'états FlowMe"""
     
     def __init__(self):
-        # Graphe des états et leurs relations naturelles
-        self.state_graph = self._build_state_relationship_graph()
+        import networkx as nx
+        
+        # Graphe des états et leurs relations naturelles (figé : partagé en lecture seule)
+        self.state_graph = nx.freeze(self._build_state_relationship_graph())
         
         # Familles d'états et leurs qualités
         self.state_families = {
@@ -84,9 +126,24 @@ class FlowMeConstellationSystem:
         
         # Transitions naturelles et leurs qualités
         self.natural_transitions = self._define_natural_transitions()
+        
+        # Tables d'accès direct indexées par numéro d'état (0 inutilisé)
+        family_by_state: List[Optional[str]] = [None] * (STATE_COUNT + 1)
+        for family, data in self.state_families.items():
+            for state in data["states"]:
+                if 1 <= state <= STATE_COUNT and family_by_state[state] is None:
+                    family_by_state[state] = family
+        self._family_by_state: Tuple[Optional[str], ...] = tuple(family_by_state)
+        
+        # Distances dans le graphe précalculées (toutes paires)
+        self._path_lengths: Dict[int, Dict[int, int]] = {
+            source: lengths for source, lengths in nx.all_pairs_shortest_path_length(self.state_graph)
+        }
     
-    def _build_state_relationship_graph(self) -> nx.Graph:
+    def _build_state_relationship_graph(self) -> "nx.Graph":
         """Construit le graphe des relations entre états"""
+        import networkx as nx
+        
         G = nx.Graph()
         
         # Ajouter tous les états
@@ -202,7 +259,7 @@ class FlowMeConstellationSystem:
         wisdom_pattern = self._identify_wisdom_pattern(state_sequence)
         
         return Constellation(
-            states=state_sequence,
+            states=tuple(state_sequence),
             constellation_type=constellation_type,
             central_theme=central_theme,
             emotional_arc=emotional_arc,
@@ -217,10 +274,9 @@ class FlowMeConstellationSystem:
         # Analyser les familles traversées
         families_visited = []
         for state in sequence:
-            for family, data in self.state_families.items():
-                if state in data["states"]:
-                    families_visited.append(family)
-                    break
+            family = self._lookup_family(state)
+            if family is not None:
+                families_visited.append(family)
         
         unique_families = len(set(families_visited))
         
@@ -270,39 +326,35 @@ class FlowMeConstellationSystem:
         
         return start_family == end_family and len(set(sequence)) >= 3
     
+    def _lookup_family(self, state: int) -> Optional[str]:
+        """Famille d'un état par accès direct (None si l'état n'appartient à aucune famille)"""
+        if isinstance(state, int) and 1 <= state <= STATE_COUNT:
+            return self._family_by_state[state]
+        return None
+    
     def _get_state_family(self, state: int) -> str:
         """Retourne la famille d'un état"""
-        for family, data in self.state_families.items():
-            if state in data["states"]:
-                return family
-        return "Unknown"
+        return self._lookup_family(state) or "Unknown"
     
     def _analyze_emotional_arc(self, sequence: List[int], messages: List[str] = None) -> str:
         """Analyse l'arc émotionnel de la constellation"""
         
         # Mapper les états vers des intensités émotionnelles
-        emotional_intensities = {
-            1: 0.3,   # Présence - calme
-            7: 0.5,   # Curiosité - modérée
-            8: 0.4,   # Résonance - harmonieuse
-            14: 0.9,  # Colère - intense
-            22: 0.6,  # Pragmatisme - focalisée
-            32: 0.7,  # Expression - dynamique
-            39: 0.8,  # Obstacles - tendue
-            45: 0.9,  # Vulnérabilité - intense
-            58: 0.5,  # Inclusion - apaisante
-            64: 0.6   # Ouverture - expansive
-        }
-        
-        intensities = [emotional_intensities.get(state, 0.5) for state in sequence]
+        intensities = [EMOTIONAL_INTENSITIES.get(state, 0.5) for state in sequence]
         
         # Analyser la courbe émotionnelle
         if len(intensities) < 3:
             return "arc_naissant"
         
-        start_intensity = np.mean(intensities[:2])
-        middle_intensity = np.mean(intensities[1:-1]) if len(intensities) > 2 else intensities[1]
-        end_intensity = np.mean(intensities[-2:])
+        start_intensity = _fold_sum(intensities[:2]) / 2
+        middle_intensity = _fold_sum(intensities[1:-1]) / (len(intensities) - 2)
+        end_intensity = _fold_sum(intensities[-2:]) / 2
+        
+        return self._classify_emotional_arc(start_intensity, middle_intensity, end_intensity)
+    
+    def _classify_emotional_arc(self, start_intensity: float, middle_intensity: float,
+                                end_intensity: float) -> str:
+        """Qualifie l'arc émotionnel à partir des intensités de début, milieu et fin"""
         
         # Identifier le pattern
         if start_intensity < middle_intensity > end_intensity:
@@ -327,6 +379,11 @@ class FlowMeConstellationSystem:
         
         dominant_family = max(family_counts, key=family_counts.get)
         
+        return self._theme_for_family(dominant_family, sequence)
+    
+    def _theme_for_family(self, dominant_family: str, sequence: Collection[int]) -> str:
+        """Thème associé à la famille dominante (`sequence` : séquence ou ensemble des états visités)"""
+        
         # Thèmes par famille avec nuances selon les états
         family_themes = {
             "Écoute subtile": self._analyze_listening_theme(sequence),
@@ -369,20 +426,10 @@ class FlowMeConstellationSystem:
         factors.append(diversity_score)
         
         # 2. Fluidité des transitions (0-1)
-        transition_scores = []
-        for i in range(len(sequence) - 1):
-            transition = (sequence[i], sequence[i + 1])
-            if transition in self.natural_transitions:
-                transition_scores.append(self.natural_transitions[transition]["ease"])
-            else:
-                # Calculer distance dans le graphe
-                try:
-                    path_length = nx.shortest_path_length(self.state_graph, sequence[i], sequence[i + 1])
-                    transition_scores.append(max(0, 1 - (path_length - 1) * 0.2))
-                except:
-                    transition_scores.append(0.3)  # Transition difficile
-        
-        fluidity_score = np.mean(transition_scores) if transition_scores else 0.5
+        transition_scores = [self._transition_ease(sequence[i], sequence[i + 1])
+                             for i in range(len(sequence) - 1)]
+        
+        fluidity_score = _fold_sum(transition_scores) / len(transition_scores) if transition_scores else 0.5
         factors.append(fluidity_score)
         
         # 3. Cohérence thématique (0-1)
@@ -393,12 +440,32 @@ class FlowMeConstellationSystem:
         depth_score = min(len(sequence) / 8.0, 1.0)
         factors.append(depth_score)
         
-        # Moyenne pondérée
-        weights = [0.3, 0.3, 0.25, 0.15]
-        integration_level = sum(f * w for f, w in zip(factors, weights))
+        return self._weighted_integration(factors)
+    
+    def _weighted_integration(self, factors: List[float]) -> float:
+        """Moyenne pondérée des facteurs d'intégration, arrondie au centième"""
+        integration_level = sum(f * w for f, w in zip(factors, INTEGRATION_WEIGHTS))
         
         return round(integration_level, 2)
     
+    def _transition_ease(self, from_state: int, to_state: int) -> float:
+        """Facilité d'une transition : naturelle, sinon selon la distance dans le graphe"""
+        transition = (from_state, to_state)
+        if transition in self.natural_transitions:
+            return self.natural_transitions[transition]["ease"]
+        
+        # Distance dans le graphe (précalculée)
+        path_length = self._path_lengths.get(from_state, {}).get(to_state)
+        if path_length is not None:
+            return max(0, 1 - (path_length - 1) * 0.2)
+        return 0.3  # Transition difficile
+    
+    def _transition_proximity(self, from_state: int, to_state: int) -> float:
+        """Proximité de deux états consécutifs (poids de l'arête du graphe)"""
+        if self.state_graph.has_edge(from_state, to_state):
+            return self.state_graph[from_state][to_state].get('weight', 0.5)
+        return 0.2
+    
     def _calculate_thematic_coherence(self, sequence: List[int]) -> float:
         """Calcule la cohérence thématique de la séquence"""
         
@@ -418,21 +485,18 @@ class FlowMeConstellationSystem:
                         return 0.8
         
         # Vérifier la cohérence par proximité des états
-        proximity_scores = []
-        for i in range(len(sequence) - 1):
-            if self.state_graph.has_edge(sequence[i], sequence[i + 1]):
-                edge_data = self.state_graph[sequence[i]][sequence[i + 1]]
-                proximity_scores.append(edge_data.get('weight', 0.5))
-            else:
-                proximity_scores.append(0.2)
+        proximity_scores = [self._transition_proximity(sequence[i], sequence[i + 1])
+                            for i in range(len(sequence) - 1)]
         
-        return np.mean(proximity_scores) if proximity_scores else 0.4
+        return _fold_sum(proximity_scores) / len(proximity_scores) if proximity_scores else 0.4
     
     def _suggest_next_direction(self, sequence: List[int]) -> str:
         """Suggère la direction suivante pour la constellation"""
         
-        current_state = sequence[-1]
-        constellation_type = self._identify_constellation_type(sequence)
+        return self._direction_for_type(self._identify_constellation_type(sequence))
+    
+    def _direction_for_type(self, constellation_type: ConstellationType) -> str:
+        """Direction suggérée pour un type de constellation"""
         
         # Suggestions basées sur le type de constellation
         if constellation_type == ConstellationType.SPIRAL:
@@ -465,8 +529,11 @@ class FlowMeConstellationSystem:
                 return pattern_data["wisdom"]
         
         # Générer une sagesse basée sur les familles traversées
-        families = [self._get_state_family(state) for state in sequence]
-        unique_families = list(set(families))
+        return self._wisdom_for_families(set(self._get_state_family(state) for state in sequence))
+    
+    def _wisdom_for_families(self, families: Set[str]) -> str:
+        """Sagesse générée à partir de l'ensemble des familles traversées"""
+        unique_families = list(families)
         
         if len(unique_families) == 1:
             family_wisdom = {
@@ -505,7 +572,7 @@ class FlowMeConstellationSystem:
         
         if not sequence:
             return Constellation(
-                states=[1],
+                states=(1,),
                 constellation_type=ConstellationType.EMERGENCE,
                 central_theme="Point de départ",
                 emotional_arc="arc_naissant",
@@ -518,7 +585,7 @@ class FlowMeConstellationSystem:
         family = self._get_state_family(current_state)
         
         return Constellation(
-            states=sequence,
+            states=tuple(sequence),
             constellation_type=ConstellationType.EMERGENCE,
             central_theme=f"Exploration de {family.lower()}",
             emotional_arc="arc_naissant",
@@ -557,16 +624,224 @@ révélant une dynamique {integration_quality} autour du thème : {constellation
 
 Direction émergente : {constellation.suggested_direction}"""
 
+class ConstellationAccumulator:
+    """
+    Analyse de constellation incrémentale d'une session
+    
+    Chaque état ajouté met à jour des agrégats courants en O(1) ;
+    `constellation()` produit le même résultat que
+    `FlowMeConstellationSystem.analyze_constellation` sur la séquence complète.
+    """
+    
+    def __init__(self, engine: Optional[FlowMeConstellationSystem] = None):
+        self._engine = engine or get_constellation_engine()
+        self._patterns = [(data["pattern"], data["wisdom"])
+                          for data in self._engine.constellation_patterns.values()]
+        self._prefix_size = max(len(pattern) for pattern, _ in self._patterns)
+        self.reset()
+    
+    def reset(self):
+        """Vide la séquence et les agrégats"""
+        self.states: List[int] = []
+        self._prefix: List[int] = []            # Premiers états (comparaison aux patterns)
+        self._seen: Set[int] = set()
+        self._family_counts: Dict[str, int] = {}  # Ordre d'apparition, "Unknown" compris
+        self._known_families: Set[str] = set()
+        self._recent_families = deque(maxlen=3)
+        self._first_family: Optional[str] = None
+        self._last_family: Optional[str] = None
+        self._spiral = False
+        
+        # Sommes courantes (accumulées dans l'ordre du calcul complet)
+        self._start_intensity_sum = 0.0
+        self._middle_intensity_sum = 0.0
+        self._last_intensities = deque(maxlen=2)
+        self._transition_sum = 0.0
+        self._proximity_sum = 0.0
+        self._window_hits = [False] * len(self._patterns)
+    
+    def __len__(self) -> int:
+        return len(self.states)
+    
+    def append(self, state: int):
+        """Ajoute un état à la séquence (O(1))"""
+        engine = self._engine
+        family = engine._get_state_family(state)
+        intensity = EMOTIONAL_INTENSITIES.get(state, 0.5)
+        
+        if self.states:
+            previous = self.states[-1]
+            self._transition_sum += engine._transition_ease(previous, state)
+            self._proximity_sum += engine._transition_proximity(previous, state)
+        
+        self.states.append(state)
+        length = len(self.states)
+        if length <= self._prefix_size:
+            self._prefix.append(state)
+        self._seen.add(state)
+        
+        # Familles
+        self._family_counts[family] = self._family_counts.get(family, 0) + 1
+        if engine._lookup_family(state) is not None:
+            self._known_families.add(family)
+        if len(self._recent_families) == 3 and self._recent_families[0] == family:
+            self._spiral = True
+        self._recent_families.append(family)
+        if self._first_family is None:
+            self._first_family = family
+        self._last_family = family
+        
+        # Arc émotionnel : début (2 premiers), milieu (tous sauf extrêmes), fin (2 derniers)
+        if length <= 2:
+            self._start_intensity_sum += intensity
+        if length >= 3:
+            self._middle_intensity_sum += self._last_intensities[-1]
+        self._last_intensities.append(intensity)
+        
+        # Fenêtres de 3 états correspondant au début ou à la fin d'un pattern
+        if length >= 3:
+            window = self.states[-3:]
+            for index, (pattern, _) in enumerate(self._patterns):
+                if not self._window_hits[index] and (window == pattern[:3] or window == pattern[-3:]):
+                    self._window_hits[index] = True
+    
+    def extend(self, states: List[int]):
+        """Ajoute plusieurs états"""
+        for state in states:
+            self.append(state)
+    
+    def constellation(self) -> Constellation:
+        """Constellation de la séquence courante"""
+        engine = self._engine
+        length = len(self.states)
+        
+        if length < 3:
+            return engine._create_simple_constellation(list(self.states))
+        
+        constellation_type = self._constellation_type()
+        
+        start_intensity = self._start_intensity_sum / 2
+        middle_intensity = self._middle_intensity_sum / (length - 2)
+        end_intensity = _fold_sum(self._last_intensities) / 2
+        emotional_arc = engine._classify_emotional_arc(start_intensity, middle_intensity, end_intensity)
+        
+        dominant_family = max(self._family_counts, key=self._family_counts.get)
+        central_theme = engine._theme_for_family(dominant_family, self._seen)
+        
+        integration_level = engine._weighted_integration([
+            min(len(self._family_counts) / 6.0, 1.0),
+            self._transition_sum / (length - 1),
+            self._thematic_coherence(),
+            min(length / 8.0, 1.0)
+        ])
+        
+        return Constellation(
+            states=tuple(self.states),
+            constellation_type=constellation_type,
+            central_theme=central_theme,
+            emotional_arc=emotional_arc,
+            wisdom_pattern=self._wisdom_pattern(),
+            integration_level=integration_level,
+            suggested_direction=engine._direction_for_type(constellation_type)
+        )
+    
+    def _constellation_type(self) -> ConstellationType:
+        length = len(self.states)
+        unique_families = len(self._known_families)
+        
+        if self._spiral:
+            return ConstellationType.SPIRAL
+        elif unique_families >= 4:
+            return ConstellationType.EXPANSION
+        elif unique_families <= 2 and length >= 4:
+            return ConstellationType.CONVERGENCE
+        elif len(self._family_counts) >= 3 and length <= 6:
+            return ConstellationType.BRIDGE
+        elif length >= 4 and self._first_family == self._last_family and len(self._seen) >= 3:
+            return ConstellationType.CYCLE
+        else:
+            return ConstellationType.EMERGENCE
+    
+    def _is_exact_pattern(self, pattern: List[int]) -> bool:
+        return len(self.states) == len(pattern) and self._prefix == pattern
+    
+    def _thematic_coherence(self) -> float:
+        for index, (pattern, _) in enumerate(self._patterns):
+            if self._is_exact_pattern(pattern):
+                return 1.0
+            if self._window_hits[index]:
+                return 0.8
+        
+        return self._proximity_sum / (len(self.states) - 1)
+    
+    def _wisdom_pattern(self, threshold: float = 0.7) -> str:
+        length = len(self.states)
+        
+        for pattern, wisdom in self._patterns:
+            if self._is_exact_pattern(pattern):
+                return wisdom
+            # Seuls les premiers états peuvent coïncider avec le pattern
+            matches = sum(1 for state, expected in zip(self._prefix, pattern) if state == expected)
+            if (matches / length) >= threshold:
+                return wisdom
+        
+        return self._engine._wisdom_for_families(set(self._family_counts))
+
+_engine: Optional[FlowMeConstellationSystem] = None
+_engine_lock = threading.Lock()
+
+def get_constellation_engine() -> FlowMeConstellationSystem:
+    """
+    Moteur de constellations partagé par tout le processus
+    
+    Construit une seule fois ; ses tables sont en lecture seule.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = FlowMeConstellationSystem()
+    return _engine
+
+@lru_cache(maxsize=CONSTELLATION_CACHE_SIZE)
+def _analyze_sequence(states: Tuple[int, ...]) -> Tuple[Constellation, str, int]:
+    """Analyse mémoïsée d'une séquence : (constellation, insight, familles visitées)"""
+    engine = get_constellation_engine()
+    constellation = engine.analyze_constellation(list(states))
+    insight = engine.generate_constellation_insight(constellation)
+    families_visited = len(set(engine._get_state_family(state) for state in states))
+    return constellation, insight, families_visited
+
+def constellation_cache_info() -> Dict[str, Any]:
+    """Statistiques du cache d'analyses de constellation"""
+    info = _analyze_sequence.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hit_rate": info.hits / lookups if lookups else 0.0
+    }
+
+def clear_constellation_cache():
+    """Vide le cache d'analyses de constellation"""
+    _analyze_sequence.cache_clear()
+
 # Intégration avec FlowMe principal
+@timed("constellation_analysis")
 def analyze_user_constellation(state_history: List[int], message_history: List[str] = None) -> Dict[str, any]:
-    """Fonction principale d'analyse de constellation utilisateur"""
+    """
+    Fonction principale d'analyse de constellation utilisateur
+    
+    Les résultats sont mémoïsés par séquence d'états ; message_history
+    n'intervient pas dans l'analyse.
+    """
     
     if len(state_history) < 2:
         return {"constellation": None, "insight": "Constellation en formation..."}
     
-    system = FlowMeConstellationSystem()
-    constellation = system.analyze_constellation(state_history, message_history)
-    insight = system.generate_constellation_insight(constellation)
+    constellation, insight, families_visited = _analyze_sequence(tuple(state_history))
     
     return {
         "constellation": {
@@ -579,7 +854,7 @@ def analyze_user_constellation(state_history: List[int], message_history: List[s
         },
         "insight": insight,
         "states_explored": len(set(state_history)),
-        "families_visited": len(set(system._get_state_family(state) for state in state_history)),
+        "families_visited": families_visited,
         "depth_indicator": len(state_history)
     }
 
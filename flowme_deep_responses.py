@@ -2,15 +2,156 @@
 """
 Système de génération de réponses profondes qui stimulent la réflexion
 et accompagnent vers plus de conscience
+
+Un générateur unique par processus (modèles compilés une fois) ; le hasard
+vient d'un générateur pseudo-aléatoire initialisé par session, ce qui rend
+les réponses reproductibles et mémoïsables par (état, thèmes, graine).
 """
 
+import hashlib
+import os
 import re
 import random
-from typing import Dict, List, Tuple, Optional
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Tuple, Optional, Union
 from datetime import datetime
 
+from flowme_features import MessageFeatures, message_features, register_terms
+from flowme_metrics import timed
+
+# Configuration environnement
+DEEP_RESPONSE_CACHE_SIZE = int(os.getenv("FLOWME_DEEP_RESPONSE_CACHE_SIZE", "4096"))
+
+# Lexiques de thèmes, dans l'ordre de restitution
+EMOTIONAL_WORDS: Tuple[str, ...] = (
+    "tristesse", "joie", "colère", "peur", "anxiété", "stress",
+    "solitude", "confusion", "espoir", "gratitude", "amour",
+    "frustration", "déception", "surprise", "nostalgie"
+)
+
+SITUATION_WORDS: Tuple[str, ...] = (
+    "travail", "famille", "couple", "relation", "conflit",
+    "décision", "changement", "projet", "difficulté", "défi",
+    "opportunité", "problème", "objectif", "rêve", "avenir"
+)
+
+register_terms(EMOTIONAL_WORDS, SITUATION_WORDS)
+
+# Espaces réservés des modèles : {emotion}, {situation}...
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+# Plan de rendu : segments (texte littéral, nom d'espace réservé ou None)
+RenderPlan = Tuple[Tuple[str, Optional[str]], ...]
+
+
+def compile_template(template: str) -> RenderPlan:
+    """Découpe un modèle une fois pour toutes en segments littéraux et espaces réservés"""
+    parts = _PLACEHOLDER.split(template)
+    plan = []
+    for index, part in enumerate(parts):
+        if index % 2 == 0:
+            if part:
+                plan.append((part, None))
+        else:
+            plan.append(("{" + part + "}", part))
+    return tuple(plan)
+
+
+def render_plan(plan: RenderPlan, values: Mapping[str, str]) -> str:
+    """Rend un plan ; un espace réservé sans valeur reste tel quel"""
+    return "".join(values.get(name, literal) if name else literal for literal, name in plan)
+
+
+def extract_themes(message: Union[str, MessageFeatures]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Émotions et situations présentes dans le message (ordre des lexiques)"""
+    features = message_features(message)
+    return tuple(features.matches(EMOTIONAL_WORDS)), tuple(features.matches(SITUATION_WORDS))
+
+
+def session_seed(session_id: str, turn: int = 0) -> int:
+    """Graine stable d'une session (et d'un tour de conversation), identique d'un processus à l'autre"""
+    digest = hashlib.blake2b(f"{session_id}:{turn}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+# Familles symboliques des états de réponse approfondie
+STATE_FAMILIES: Mapping[int, str] = MappingProxyType({
+    1: "Écoute subtile", 7: "Écoute subtile", 8: "Écoute subtile",
+    14: "NatVik", 22: "Ancrage", 32: "Voix oubliées",
+    39: "Ancrage", 45: "Disponibilité nue", 58: "Inclusion",
+    64: "Disponibilité nue"
+})
+
+CONSTELLATION_INSIGHTS: Mapping[str, str] = MappingProxyType({
+    "exploration_emotionnelle": "Votre parcours révèle une belle capacité à naviguer entre différents registres émotionnels.",
+    "approfondissement": "Cette séquence d'états montre un processus d'approfondissement naturel.",
+    "integration": "Vous semblez intégrer différentes dimensions de votre expérience.",
+    "transformation": "Un mouvement de transformation se dessine à travers ces transitions."
+})
+
+SUGGESTIONS_BY_STATE: Mapping[int, Tuple[str, ...]] = MappingProxyType({
+    45: (
+        "Explorer les ressources intérieures de résilience",
+        "Identifier le besoin derrière cette émotion",
+        "Trouver des façons saines d'honorer cette vulnérabilité"
+    ),
+    7: (
+        "Approfondir cette curiosité par l'expérimentation",
+        "Identifier les premiers pas concrets possibles",
+        "Explorer ce que cette question révèle de vos valeurs"
+    ),
+    22: (
+        "Lister vos ressources créatives disponibles",
+        "Transformer cette contrainte en opportunité",
+        "Identifier les apprentissages cachés dans ce défi"
+    ),
+    14: (
+        "Clarifier les limites qui demandent à être respectées",
+        "Transformer cette énergie en action constructive",
+        "Exprimer vos besoins de façon assertive"
+    ),
+    32: (
+        "Identifier à qui cette vérité a besoin d'être dite",
+        "Préparer un espace sûr pour cette expression",
+        "Explorer l'impact libérateur de votre authenticité"
+    ),
+    58: (
+        "Créer des ponts entre les parties en conflit",
+        "Développer votre capacité d'écoute empathique",
+        "Identifier les besoins communs derrière les tensions"
+    ),
+    64: (
+        "Faire confiance à votre intuition du changement",
+        "Préparer intérieurement les nouvelles ouvertures",
+        "Cultiver l'art de naviguer dans l'incertitude"
+    ),
+    1: (
+        "Cultiver cette qualité de présence dans le quotidien",
+        "Explorer ce que révèle cette pause consciente",
+        "Développer votre capacité d'écoute intérieure"
+    )
+})
+
+THERAPEUTIC_ORIENTATIONS: Mapping[int, str] = MappingProxyType({
+    45: "Accompagnement empathique de la vulnérabilité",
+    7: "Facilitation de l'exploration et de la découverte",
+    22: "Soutien à la résolution créative de problèmes",
+    14: "Transformation constructive de l'énergie émotionnelle",
+    32: "Libération de l'expression authentique",
+    58: "Médiation et facilitation relationnelle",
+    64: "Accompagnement des transitions et du changement",
+    1: "Cultivation de la présence et de l'écoute intérieure"
+})
+
 class DeepResponseGenerator:
-    """Générateur de réponses approfondies pour FlowMe"""
+    """
+    Générateur de réponses approfondies pour FlowMe
+    
+    Préférer get_deep_response_generator() : les tables et les plans
+    de rendu sont construits une fois et partagés en lecture seule.
+    """
     
     def __init__(self):
         self.question_templates = {
@@ -147,89 +288,80 @@ class DeepResponseGenerator:
             64: ["porte entre les mondes", "horizon qui s'élargit", "semence de possibles"],
             1: ["lac paisible", "respiration consciente", "racine profonde"]
         }
+        
+        # Modèles compilés en plans de rendu (une seule analyse des espaces réservés)
+        self.exploration_plans: Dict[int, RenderPlan] = {
+            state: compile_template(responses["exploration"])
+            for state, responses in self.deep_responses.items()
+        }
+        self.question_plans: Dict[str, Tuple[RenderPlan, ...]] = {
+            category: tuple(compile_template(template) for template in templates)
+            for category, templates in self.question_templates.items()
+        }
 
-    def generate_deep_response(self, message: str, detected_state: int, context: Optional[Dict] = None) -> Dict[str, any]:
-        """Génère une réponse approfondie basée sur l'état détecté"""
+    def generate_deep_response(self, message: Union[str, MessageFeatures], detected_state: int, context: Optional[Dict] = None,
+                               seed: Optional[int] = None) -> Dict[str, any]:
+        """
+        Génère une réponse approfondie basée sur l'état détecté
+        
+        Avec une graine (cf. session_seed), la réponse est reproductible et
+        mémoïsée par (état, thèmes, graine) ; sans graine, elle est tirée au hasard.
+        """
         
         if detected_state not in self.deep_responses:
             detected_state = 1
-            
-        state_responses = self.deep_responses[detected_state]
-        context = context or {}
         
-        # Extraire des éléments clés du message
-        emotional_keywords = self._extract_emotional_keywords(message)
-        situation_elements = self._extract_situation_elements(message)
+        # Extraire des éléments clés du message (caractéristiques partagées)
+        emotional_keywords, situation_elements = extract_themes(message)
         
-        # Construire la réponse
-        response_parts = []
+        if seed is None:
+            parts = self._compose(detected_state, emotional_keywords, situation_elements, random.Random())
+        else:
+            parts = _compose_cached(detected_state, emotional_keywords, situation_elements, seed)
+        response_text, questions, metaphor = parts
         
-        # 1. Accueil empathique
-        response_parts.append(state_responses["accueil"])
+        return {
+            "response_text": response_text,
+            "deepening_questions": list(questions),
+            "wisdom_insight": self.deep_responses[detected_state]["insight"],
+            "metaphor_used": metaphor,
+            "detected_themes": {
+                "emotions": list(emotional_keywords),
+                "situations": list(situation_elements)
+            }
+        }
+    
+    def _compose(self, detected_state: int, emotional_keywords: Tuple[str, ...],
+                 situation_elements: Tuple[str, ...], rng: random.Random) -> Tuple[str, Tuple[str, ...], str]:
+        """Assemble texte, questions et métaphore : (texte, questions, métaphore)"""
+        state_responses = self.deep_responses[detected_state]
         
+        # 1. Accueil empathique
         # 2. Exploration contextuelle
-        exploration = state_responses["exploration"]
+        values = {}
         if emotional_keywords:
-            exploration = exploration.replace("{emotion}", emotional_keywords[0])
+            values["emotion"] = emotional_keywords[0]
         if situation_elements:
-            exploration = exploration.replace("{situation}", situation_elements[0])
-        response_parts.append(exploration)
+            values["situation"] = situation_elements[0]
+        exploration = render_plan(self.exploration_plans[detected_state], values)
         
         # 3. Métaphore enrichissante
-        metaphor = random.choice(self.metaphors[detected_state])
+        metaphor = rng.choice(self.metaphors[detected_state])
         metaphor_sentence = f"Comme {metaphor}, votre expérience porte en elle une sagesse particulière."
-        response_parts.append(metaphor_sentence)
         
         # 4. Questions d'approfondissement (2-3 questions pertinentes)
-        questions = random.sample(state_responses["questions_approfondissement"], 2)
-        
-        # 5. Insight final
-        insight = state_responses["insight"]
+        questions = tuple(rng.sample(state_responses["questions_approfondissement"], 2))
         
-        return {
-            "response_text": "\n\n".join(response_parts),
-            "deepening_questions": questions,
-            "wisdom_insight": insight,
-            "metaphor_used": metaphor,
-            "detected_themes": {
-                "emotions": emotional_keywords,
-                "situations": situation_elements
-            }
-        }
+        response_text = "\n\n".join((state_responses["accueil"], exploration, metaphor_sentence))
+        return response_text, questions, metaphor
     
-    def _extract_emotional_keywords(self, message: str) -> List[str]:
+    def _extract_emotional_keywords(self, message: Union[str, MessageFeatures]) -> List[str]:
         """Extrait les mots-clés émotionnels du message"""
-        emotional_words = [
-            "tristesse", "joie", "colère", "peur", "anxiété", "stress",
-            "solitude", "confusion", "espoir", "gratitude", "amour",
-            "frustration", "déception", "surprise", "nostalgie"
-        ]
-        
-        found_emotions = []
-        message_lower = message.lower()
-        
-        for emotion in emotional_words:
-            if emotion in message_lower:
-                found_emotions.append(emotion)
-                
-        return found_emotions
+        return list(extract_themes(message)[0])
     
-    def _extract_situation_elements(self, message: str) -> List[str]:
+    def _extract_situation_elements(self, message: Union[str, MessageFeatures]) -> List[str]:
         """Extrait les éléments situationnels du message"""
-        situation_words = [
-            "travail", "famille", "couple", "relation", "conflit",
-            "décision", "changement", "projet", "difficulté", "défi",
-            "opportunité", "problème", "objectif", "rêve", "avenir"
-        ]
-        
-        found_situations = []
-        message_lower = message.lower()
-        
-        for situation in situation_words:
-            if situation in message_lower:
-                found_situations.append(situation)
-                
-        return found_situations
+        return list(extract_themes(message)[1])
     
     def generate_constellation_response(self, current_state: int, previous_states: List[int]) -> Dict[str, any]:
         """Génère une réponse tenant compte de la constellation d'états"""
@@ -245,14 +377,6 @@ class DeepResponseGenerator:
         # Identifier les familles d'états explorées
         families_explored = self._get_families_from_states(previous_states + [current_state])
         
-        # Générer insight sur la constellation
-        constellation_insights = {
-            "exploration_emotionnelle": "Votre parcours révèle une belle capacité à naviguer entre différents registres émotionnels.",
-            "approfondissement": "Cette séquence d'états montre un processus d'approfondissement naturel.",
-            "integration": "Vous semblez intégrer différentes dimensions de votre expérience.",
-            "transformation": "Un mouvement de transformation se dessine à travers ces transitions."
-        }
-        
         # Déterminer le type de constellation
         if len(families_explored) >= 3:
             constellation_type = "exploration_emotionnelle"
@@ -264,7 +388,7 @@ class DeepResponseGenerator:
             constellation_type = "integration"
         
         return {
-            "constellation_insight": constellation_insights[constellation_type],
+            "constellation_insight": CONSTELLATION_INSIGHTS[constellation_type],
             "families_explored": families_explored,
             "transition_pattern": constellation_type,
             "depth_indicator": len(set(previous_states + [current_state]))
@@ -272,83 +396,70 @@ class DeepResponseGenerator:
     
     def _get_families_from_states(self, states: List[int]) -> List[str]:
         """Retourne les familles symboliques des états"""
-        state_families = {
-            1: "Écoute subtile", 7: "Écoute subtile", 8: "Écoute subtile",
-            14: "NatVik", 22: "Ancrage", 32: "Voix oubliées",
-            39: "Ancrage", 45: "Disponibilité nue", 58: "Inclusion",
-            64: "Disponibilité nue"
-        }
-        
-        families = []
-        for state in states:
-            if state in state_families:
-                families.append(state_families[state])
-        
-        return list(set(families))
+        return list({STATE_FAMILIES[state] for state in states if state in STATE_FAMILIES})
     
-    def generate_follow_up_suggestions(self, detected_state: int, message: str) -> List[str]:
+    def generate_follow_up_suggestions(self, detected_state: int, message: Union[str, MessageFeatures]) -> List[str]:
         """Génère des suggestions de suivi contextuel"""
         
-        suggestions_by_state = {
-            45: [
-                "Explorer les ressources intérieures de résilience",
-                "Identifier le besoin derrière cette émotion",
-                "Trouver des façons saines d'honorer cette vulnérabilité"
-            ],
-            7: [
-                "Approfondir cette curiosité par l'expérimentation",
-                "Identifier les premiers pas concrets possibles",
-                "Explorer ce que cette question révèle de vos valeurs"
-            ],
-            22: [
-                "Lister vos ressources créatives disponibles",
-                "Transformer cette contrainte en opportunité",
-                "Identifier les apprentissages cachés dans ce défi"
-            ],
-            14: [
-                "Clarifier les limites qui demandent à être respectées",
-                "Transformer cette énergie en action constructive",
-                "Exprimer vos besoins de façon assertive"
-            ],
-            32: [
-                "Identifier à qui cette vérité a besoin d'être dite",
-                "Préparer un espace sûr pour cette expression",
-                "Explorer l'impact libérateur de votre authenticité"
-            ],
-            58: [
-                "Créer des ponts entre les parties en conflit",
-                "Développer votre capacité d'écoute empathique",
-                "Identifier les besoins communs derrière les tensions"
-            ],
-            64: [
-                "Faire confiance à votre intuition du changement",
-                "Préparer intérieurement les nouvelles ouvertures",
-                "Cultiver l'art de naviguer dans l'incertitude"
-            ],
-            1: [
-                "Cultiver cette qualité de présence dans le quotidien",
-                "Explorer ce que révèle cette pause consciente",
-                "Développer votre capacité d'écoute intérieure"
-            ]
-        }
-        
-        return suggestions_by_state.get(detected_state, suggestions_by_state[1])
+        # Copie : la table est partagée par tout le processus
+        return list(SUGGESTIONS_BY_STATE.get(detected_state, SUGGESTIONS_BY_STATE[1]))
+
+_generator: Optional[DeepResponseGenerator] = None
+_generator_lock = threading.Lock()
+
+def get_deep_response_generator() -> DeepResponseGenerator:
+    """Générateur partagé par tout le processus (construit une seule fois)"""
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _generator = DeepResponseGenerator()
+    return _generator
+
+@lru_cache(maxsize=DEEP_RESPONSE_CACHE_SIZE)
+def _compose_cached(detected_state: int, emotions: Tuple[str, ...], situations: Tuple[str, ...],
+                    seed: int) -> Tuple[str, Tuple[str, ...], str]:
+    """Composition mémoïsée : la graine fixe la métaphore et les questions tirées"""
+    return get_deep_response_generator()._compose(detected_state, emotions, situations, random.Random(seed))
+
+def deep_response_cache_info() -> Dict[str, any]:
+    """Statistiques du cache de réponses approfondies"""
+    info = _compose_cached.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hit_rate": info.hits / lookups if lookups else 0.0
+    }
 
 # Intégration avec le système principal
-def generate_enhanced_response(message: str, detected_state: int, previous_states: List[int] = None, context: Dict = None) -> Dict[str, any]:
-    """Fonction principale pour générer une réponse enrichie"""
+@timed("deep_response")
+def generate_enhanced_response(message: Union[str, MessageFeatures], detected_state: int, previous_states: List[int] = None,
+                               context: Dict = None, session_id: Optional[str] = None,
+                               seed: Optional[int] = None) -> Dict[str, any]:
+    """
+    Fonction principale pour générer une réponse enrichie
     
-    generator = DeepResponseGenerator()
+    La graine vaut par défaut session_seed(session_id, len(previous_states)) :
+    même session, même tour, même état et mêmes thèmes donnent la même réponse.
+    """
+    
+    generator = get_deep_response_generator()
+    features = message_features(message)
     previous_states = previous_states or []
+    if seed is None and session_id is not None:
+        seed = session_seed(session_id, len(previous_states))
     
     # Générer la réponse approfondie
-    deep_response = generator.generate_deep_response(message, detected_state, context)
+    deep_response = generator.generate_deep_response(features, detected_state, context, seed=seed)
     
     # Analyser la constellation si applicable
     constellation = generator.generate_constellation_response(detected_state, previous_states)
     
     # Générer les suggestions de suivi
-    suggestions = generator.generate_follow_up_suggestions(detected_state, message)
+    suggestions = generator.generate_follow_up_suggestions(detected_state, features)
     
     return {
         "main_response": deep_response["response_text"],
@@ -364,22 +475,11 @@ def generate_enhanced_response(message: str, detected_state: int, previous_state
 
 def _get_therapeutic_orientation(state: int) -> str:
     """Retourne l'orientation thérapeutique suggérée"""
-    orientations = {
-        45: "Accompagnement empathique de la vulnérabilité",
-        7: "Facilitation de l'exploration et de la découverte", 
-        22: "Soutien à la résolution créative de problèmes",
-        14: "Transformation constructive de l'énergie émotionnelle",
-        32: "Libération de l'expression authentique",
-        58: "Médiation et facilitation relationnelle",
-        64: "Accompagnement des transitions et du changement",
-        1: "Cultivation de la présence et de l'écoute intérieure"
-    }
-    
-    return orientations.get(state, orientations[1])
+    return THERAPEUTIC_ORIENTATIONS.get(state, THERAPEUTIC_ORIENTATIONS[1])
 
 # Test du système de réponses approfondies
 if __name__ == "__main__":
-    generator = DeepResponseGenerator()
+    generator = get_deep_response_generator()
     
     test_cases = [
         ("Je me sens vraiment triste aujourd'hui, j'ai l'impression que rien ne va", 45),
@@ -395,7 +495,7 @@ if __name__ == "__main__":
         print(f"\n📝 Message: '{message}'")
         print(f"🎯 État: {expected_state}")
         
-        response = generate_enhanced_response(message, expected_state, [1], {})
+        response = generate_enhanced_response(message, expected_state, [1], {}, session_id="demo")
         
         print(f"💬 Réponse principale:")
         print(f"   {response['main_response'][:100]}...")
@@ -406,4 +506,9 @@ if __name__ == "__main__":
         print(f"🌱 Orientation: {response['therapeutic_orientation']}")
         print("-" * 40)
     
+    first = generate_enhanced_response(test_cases[0][0], 45, [1], session_id="demo")
+    again = generate_enhanced_response(test_cases[0][0], 45, [1], session_id="demo")
+    assert first == again, "Une même session doit obtenir la même réponse"
+    print(f"\n🔁 Réponses reproductibles par session, cache : {deep_response_cache_info()}")
+    
     print("\n✅ Tests terminés - Réponses approfondies générées")
@@ -0,0 +1,325 @@
+# flowme_events.py - Bus d'événements FlowMe (publication / abonnement)
+"""
+Bus d'événements en mémoire pour les changements d'état
+
+- publication possible depuis n'importe quel thread (livraison différée sur la
+  boucle asyncio, toujours dans l'ordre des identifiants)
+- abonnés filtrés par session, chacun avec un tampon borné
+- historique circulaire pour reprendre un flux après Last-Event-ID
+- un abonné inactif ne coûte qu'une attente sur un asyncio.Event
+- avec un relais (backend de session sqlite), les événements passent par une
+  table partagée : identifiants communs à tous les workers, livrés dans
+  l'ordre par une tâche de relecture propre à chaque worker
+"""
+
+import asyncio
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Set
+
+if TYPE_CHECKING:
+    from flowme_session_state import SQLiteSessionBackend
+
+# Configuration environnement
+EVENT_SUBSCRIBER_BUFFER = max(int(os.getenv("FLOWME_EVENTS_SUBSCRIBER_BUFFER", "100")), 1)
+EVENT_HISTORY_SIZE = int(os.getenv("FLOWME_EVENTS_HISTORY", "1000"))
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("FLOWME_EVENTS_HEARTBEAT", "15"))
+# Relecture du relais entre workers (les publications locales la réveillent aussitôt)
+EVENT_RELAY_POLL_SECONDS = float(os.getenv("FLOWME_EVENTS_RELAY_POLL_MS", "50")) / 1000
+
+
+class Event:
+    """Événement publié sur le bus (identifiant croissant, global au processus ou au relais)"""
+
+    __slots__ = ("id", "session_id", "type", "data", "timestamp")
+
+    def __init__(self, event_id: int, session_id: Optional[str], event_type: str, data: Dict[str, Any],
+                 timestamp: Optional[str] = None):
+        self.id = event_id
+        self.session_id = session_id
+        self.type = event_type
+        self.data = data
+        self.timestamp = timestamp or datetime.now().isoformat()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "event_id": self.id,
+            "session_id": self.session_id,
+            "type": self.type,
+            "timestamp": self.timestamp,
+            **self.data
+        }
+
+
+class Subscription:
+    """
+    Abonnement au bus : tampon borné, le plus ancien événement est écarté
+    quand l'abonné ne suit pas (le client peut reprendre via Last-Event-ID)
+    """
+
+    def __init__(self, bus: "EventBus", session_id: Optional[str], maxsize: int):
+        self.session_id = session_id
+        self.dropped = 0
+        self.last_id = 0
+        self._bus = bus
+        self._buffer: Deque[Event] = deque()
+        self._maxsize = maxsize
+        self._ready = asyncio.Event()
+        self._closed = False
+
+    def _push(self, event: Event):
+        # Un événement peut arriver à la fois par l'historique et par la livraison
+        if event.id <= self.last_id or self._closed:
+            return
+        self.last_id = event.id
+        if len(self._buffer) >= self._maxsize:
+            self._buffer.popleft()
+            self.dropped += 1
+        self._buffer.append(event)
+        self._ready.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """Prochain événement, ou None après `timeout` secondes (battement de cœur)"""
+        while not self._buffer:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._buffer.popleft()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._bus._unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EventBus:
+    """Bus d'événements du processus"""
+
+    ALL_SESSIONS = None
+
+    def __init__(self, history_size: int = EVENT_HISTORY_SIZE,
+                 subscriber_buffer: int = EVENT_SUBSCRIBER_BUFFER):
+        self._subscriber_buffer = subscriber_buffer
+        self._history: Deque[Event] = deque(maxlen=max(history_size, 1))
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Événements en attente de livraison et boucle où leur vidage est programmé
+        self._pending: Deque[Event] = deque()
+        self._drain_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Index des abonnés par session (None : toutes les sessions)
+        self._subscribers: Dict[Optional[str], Set[Subscription]] = {}
+        self._published = 0
+        self._delivered = 0
+        # Relais entre workers : curseur de relecture et tâche associée
+        self._relay: Optional["SQLiteSessionBackend"] = None
+        self._relay_cursor = 0
+        self._relay_task: Optional[asyncio.Task] = None
+        self._relay_wake: Optional[asyncio.Event] = None
+
+    def attach_relay(self, relay: Optional["SQLiteSessionBackend"]):
+        """Fait passer les événements par un relais partagé entre workers (None : bus local)"""
+        self._relay = relay
+        if relay is not None:
+            self._relay_cursor = relay.last_event_id()
+
+    def publish(self, session_id: Optional[str], event_type: str, data: Dict[str, Any]) -> Event:
+        """Publie un événement (sûr depuis n'importe quel thread)"""
+        if self._relay is not None:
+            return self._publish_relayed(session_id, event_type, data)
+
+        with self._lock:
+            event = Event(self._next_id, session_id, event_type, data)
+            self._next_id += 1
+            self._history.append(event)
+            self._published += 1
+            loop = self._loop
+            if loop is None or loop.is_closed():
+                return event  # Aucun abonné n'a encore existé : l'historique suffit
+
+            # Même depuis la boucle, la livraison passe par la file : un événement
+            # publié par un thread ne peut pas être doublé par un plus récent
+            self._pending.append(event)
+            if self._drain_loop is loop:
+                return event  # Vidage déjà programmé
+            self._drain_loop = loop
+
+        try:
+            loop.call_soon_threadsafe(self._drain)
+        except RuntimeError:
+            with self._lock:  # Boucle arrêtée
+                self._pending.clear()
+                self._drain_loop = None
+        return event
+
+    def _drain(self):
+        """Livre les événements en attente, par ordre d'identifiant (sur la boucle)"""
+        with self._lock:
+            events = list(self._pending)
+            self._pending.clear()
+            self._drain_loop = None
+        for event in events:
+            self._deliver(event)
+
+    def _publish_relayed(self, session_id: Optional[str], event_type: str, data: Dict[str, Any]) -> Event:
+        """Écrit l'événement dans le relais ; la tâche de relecture le livre dans l'ordre"""
+        timestamp = datetime.now().isoformat()
+        event = Event(self._relay.append_event(session_id, event_type, data, timestamp),
+                      session_id, event_type, data, timestamp)
+        with self._lock:
+            self._published += 1
+            loop, wake = self._loop, self._relay_wake
+
+        if wake is not None and loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass  # Boucle arrêtée
+        return event
+
+    async def _relay_loop(self):
+        """Livre les événements du relais (tous workers confondus) par ordre d'identifiant"""
+        wake = self._relay_wake
+        while True:
+            try:
+                await asyncio.wait_for(wake.wait(), EVENT_RELAY_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+            relay = self._relay
+            if relay is None:
+                continue
+            while True:
+                rows = await asyncio.to_thread(relay.events_after, self._relay_cursor)
+                for event_id, session_id, event_type, data, timestamp in rows:
+                    event = Event(event_id, session_id, event_type, data, timestamp)
+                    self._relay_cursor = event_id
+                    with self._lock:
+                        self._history.append(event)
+                    self._deliver(event)
+                if len(rows) < 500:
+                    break
+
+    def _ensure_relay_task(self):
+        """Démarre la relecture du relais sur la boucle courante (une tâche par boucle)"""
+        task = self._relay_task
+        if task is not None and not task.done() and task.get_loop() is self._loop:
+            return
+        self._relay_wake = asyncio.Event()
+        self._relay_cursor = max(self._relay_cursor, self._relay.last_event_id())
+        self._relay_task = self._loop.create_task(self._relay_loop())
+
+    def _deliver(self, event: Event):
+        for key in (event.session_id, self.ALL_SESSIONS):
+            subscribers = self._subscribers.get(key)
+            if subscribers:
+                for subscription in subscribers:
+                    subscription._push(event)
+                    self._delivered += 1
+
+    def subscribe(self, session_id: Optional[str] = ALL_SESSIONS,
+                  last_event_id: Optional[int] = None,
+                  maxsize: Optional[int] = None) -> Subscription:
+        """
+        Abonne la tâche courante (à appeler depuis la boucle asyncio)
+
+        Avec `last_event_id`, les événements plus récents encore dans
+        l'historique sont rejoués avant les nouveaux.
+        """
+        self._loop = asyncio.get_running_loop()
+        if self._relay is not None:
+            self._ensure_relay_task()
+        subscription = Subscription(self, session_id, maxsize or self._subscriber_buffer)
+        self._subscribers.setdefault(session_id, set()).add(subscription)
+
+        if last_event_id is not None:
+            for event in self.replay(session_id, last_event_id):
+                subscription._push(event)
+        return subscription
+
+    def replay(self, session_id: Optional[str], last_event_id: int) -> List[Event]:
+        """Événements de l'historique (ou du relais) postérieurs à `last_event_id`"""
+        if self._relay is not None:
+            return [Event(*row) for row in self._relay.events_after(last_event_id, session_id)]
+        with self._lock:
+            history = list(self._history)
+        return [
+            event for event in history
+            if event.id > last_event_id
+            and (session_id is self.ALL_SESSIONS or event.session_id == session_id)
+        ]
+
+    def _unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.session_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.session_id]
+        if not self._subscribers and self._relay_task is not None:
+            # Plus aucun abonné : la relecture reprendra au prochain abonnement
+            self._relay_task.cancel()
+            self._relay_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        subscriptions = [sub for subs in list(self._subscribers.values()) for sub in subs]
+        with self._lock:
+            history_size = len(self._history)
+            oldest = self._history[0].id if self._history else None
+        return {
+            "published": self._published,
+            "delivered": self._delivered,
+            "subscribers": len(subscriptions),
+            "sessions_watched": len(self._subscribers),
+            "dropped": sum(sub.dropped for sub in subscriptions),
+            "history_size": history_size,
+            "oldest_event_id": oldest,
+            "last_event_id": self._relay_cursor if self._relay is not None else self._next_id - 1,
+            "relay": self._relay.name if self._relay is not None else None
+        }
+
+
+# Bus partagé par tout le processus
+event_bus = EventBus()
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    """En-tête Last-Event-ID (ignoré s'il n'est pas numérique)"""
+    if value is None:
+        return None
+    try:
+        return int(value.strip())
+    except ValueError:
+        return None
+
+
+if __name__ == "__main__":
+    async def _demo():
+        print("📡 Test du bus d'événements FlowMe")
+        bus = EventBus(history_size=10, subscriber_buffer=2)
+        subscription = bus.subscribe("demo")
+        for state in (8, 45, 32):
+            bus.publish("demo", "state_change", {"new_state": state})
+        bus.publish("autre", "state_change", {"new_state": 1})
+        while (event := await subscription.get(timeout=0.1)) is not None:
+            print(f"  #{event.id} {event.type} → {event.data}")
+        resumed = bus.subscribe("demo", last_event_id=1)
+        print(f"🔁 Reprise après #1 : {[event.id for event in bus.replay('demo', 1)]}")
+        resumed.close()
+        subscription.close()
+        print(bus.stats())
+
+    asyncio.run(_demo())
@@ -0,0 +1,215 @@
+# flowme_features.py - Caractéristiques d'un message, extraites en une passe
+"""
+Extraction unique des caractéristiques d'un message, partagée par toutes
+les étapes de l'analyse (contexte, émotions, linguistique, réponses)
+
+- texte normalisé une seule fois : minuscules, apostrophes typographiques
+  ramenées à ', espaces multiples réduits (les expressions de plusieurs mots
+  comme "comprends pas" sont reconnues quel que soit l'espacement)
+- lexique unifié : chaque module y inscrit ses mots à l'import, le tout est
+  compilé en un seul automate d'Aho-Corasick
+- un seul parcours du texte donne tous les termes présents (recherche de
+  sous-chaîne, comme les tests `mot in message.lower()` qu'il remplace)
+"""
+
+import re
+import threading
+from collections import deque
+from typing import Collection, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+
+_APOSTROPHES = ("’", "‘", "ʼ")
+
+_WORD_PATTERN = re.compile(r'\b\w+\b')
+
+
+def normalize_text(text: str) -> str:
+    """Forme canonique d'un texte : minuscules, apostrophes droites, espaces réduits"""
+    text = text.lower()
+    for apostrophe in _APOSTROPHES:
+        if apostrophe in text:
+            text = text.replace(apostrophe, "'")
+    return " ".join(text.split())
+
+
+class AhoCorasick:
+    """
+    Automate d'Aho-Corasick (sous forme d'automate déterministe)
+
+    Chaque état porte ses transitions complètes (liens d'échec déjà résolus) :
+    un caractère coûte une consultation de dictionnaire.
+    """
+
+    __slots__ = ("patterns", "_delta", "_outputs")
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: Tuple[str, ...] = tuple(dict.fromkeys(pattern for pattern in patterns if pattern))
+
+        # 1. Trie des motifs
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[Tuple[str, ...]] = [()]
+        for pattern in self.patterns:
+            state = 0
+            for char in pattern:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append(())
+                state = next_state
+            outputs[state] += (pattern,)
+
+        # 2. Liens d'échec en largeur, transitions complétées par celles de l'état d'échec
+        delta: List[Dict[str, int]] = [None] * len(goto)
+        delta[0] = dict(goto[0])
+        fail = [0] * len(goto)
+        pending = deque(goto[0].values())
+        while pending:
+            state = pending.popleft()
+            fallback = fail[state]
+            delta[state] = {**delta[fallback], **goto[state]}
+            outputs[state] += outputs[fallback]
+            for char, child in goto[state].items():
+                fail[child] = delta[fallback].get(char, 0)
+                pending.append(child)
+
+        self._delta = tuple(delta)
+        self._outputs = tuple(outputs)
+
+    def findall(self, text: str) -> Set[str]:
+        """Motifs présents dans le texte (chevauchements compris)"""
+        delta, outputs = self._delta, self._outputs
+        found: Set[str] = set()
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+
+class Lexicon:
+    """Lexique unifié des étapes d'analyse, compilé à la demande en un automate unique"""
+
+    def __init__(self):
+        self._terms: Dict[str, None] = {}
+        self._compiled: Optional[Tuple[AhoCorasick, FrozenSet[str]]] = None
+        self._lock = threading.Lock()
+
+    def register(self, *groups: Iterable[str]):
+        """Ajoute des termes (sans effet pour ceux déjà inscrits)"""
+        with self._lock:
+            added = False
+            for terms in groups:
+                for term in terms:
+                    term = normalize_text(term)
+                    if term and term not in self._terms:
+                        self._terms[term] = None
+                        added = True
+            if added:
+                self._compiled = None
+
+    def compiled(self) -> Tuple[AhoCorasick, FrozenSet[str]]:
+        """(automate, termes couverts), reconstruits après un ajout"""
+        compiled = self._compiled
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled
+                if compiled is None:
+                    compiled = self._compiled = (AhoCorasick(self._terms), frozenset(self._terms))
+        return compiled
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+
+# Lexique partagé par tout le processus
+LEXICON = Lexicon()
+
+
+def register_terms(*groups: Iterable[str]):
+    """Inscrit des termes dans le lexique partagé"""
+    LEXICON.register(*groups)
+
+
+class MessageFeatures:
+    """
+    Caractéristiques d'un message, calculées une fois par requête
+
+    `contains` a la sémantique de `terme in message.lower()` sur le texte
+    normalisé ; un terme absent du lexique compilé est cherché directement.
+    """
+
+    __slots__ = ("message", "text", "matched", "word_count", "sentence_count",
+                 "questions", "exclamations", "_covered", "_tokens")
+
+    def __init__(self, message: str, lexicon: Lexicon = LEXICON):
+        matcher, covered = lexicon.compiled()
+        self.message = message
+        self.text = normalize_text(message)
+        self.matched: FrozenSet[str] = frozenset(matcher.findall(self.text))
+        self.word_count = self.text.count(" ") + 1 if self.text else 0
+        self.sentence_count = sum(1 for sentence in self.text.split(".") if sentence.strip())
+        self.questions = message.count("?")
+        self.exclamations = message.count("!")
+        self._covered = covered
+        self._tokens: Optional[List[str]] = None
+
+    @property
+    def tokens(self) -> List[str]:
+        """Mots du message (\\w+), calculés au premier usage"""
+        if self._tokens is None:
+            self._tokens = _WORD_PATTERN.findall(self.text)
+        return self._tokens
+
+    def contains(self, term: str) -> bool:
+        if term in self._covered:
+            return term in self.matched
+        return normalize_text(term) in self.text
+
+    # Les variantes ci-dessous se réduisent à des opérations d'ensembles
+    # quand tous les termes sont couverts par l'automate (cas des lexiques inscrits)
+
+    def any_of(self, terms: Collection[str]) -> bool:
+        if self._covered.issuperset(terms):
+            return not self.matched.isdisjoint(terms)
+        return any(self.contains(term) for term in terms)
+
+    def count_of(self, terms: Collection[str]) -> int:
+        """Nombre de termes distincts présents"""
+        if self._covered.issuperset(terms):
+            return len(self.matched.intersection(terms))
+        return sum(1 for term in set(terms) if self.contains(term))
+
+    def matches(self, terms: Collection[str]) -> List[str]:
+        """Termes présents, dans l'ordre donné"""
+        if self._covered.issuperset(terms):
+            matched = self.matched
+            return [term for term in terms if term in matched]
+        return [term for term in terms if self.contains(term)]
+
+    def __len__(self) -> int:
+        return len(self.message)
+
+
+def message_features(message: Union[str, MessageFeatures]) -> MessageFeatures:
+    """Caractéristiques d'un message (réutilisées si déjà calculées)"""
+    return MessageFeatures(message) if isinstance(message, str) else message
+
+
+if __name__ == "__main__":
+    import random
+
+    print("🔎 Vérification de l'automate d'Aho-Corasick FlowMe")
+    rng = random.Random(19)
+    alphabet = "abc "
+    for _ in range(2000):
+        patterns = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(8)]
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        assert AhoCorasick(patterns).findall(text) == {p for p in patterns if p in text}, (patterns, text)
+    print("✅ Résultats identiques à la recherche de sous-chaînes")
+
+    register_terms(("triste", "mal", "malheureux", "comprends pas", "j'ai l'impression"))
+    features = MessageFeatures("Je suis MALHEUREUX,\n je ne  comprends\tpas… J’ai l’impression d'être perdu ?")
+    print(f"  termes : {sorted(features.matched)}")
+    print(f"  mots {features.word_count}, phrases {features.sentence_count}, questions {features.questions}")
@@ -0,0 +1,176 @@
+# flowme_http_cache.py - Pages pré-rendues et cache HTTP
+"""
+Pages HTML rendues une fois et conservées en octets, avec ETag fort,
+réponses 304 sur If-None-Match et variantes gzip/brotli précompressées
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:  # Variante br facultative
+    brotli = None
+
+# Configuration environnement
+HTML_MAX_AGE = int(os.getenv("FLOWME_HTML_MAX_AGE", "60"))
+# Fichiers statiques servis depuis la mémoire (au-delà : FileResponse classique)
+STATIC_CACHE_MAX_BYTES = int(os.getenv("FLOWME_STATIC_CACHE_MAX_BYTES", str(1024 * 1024)))
+
+COMPRESSIBLE_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".json": "application/json",
+    ".svg": "image/svg+xml"
+}
+
+
+class CachedPage:
+    """
+    Représentation figée d'une page : corps, ETag et variantes compressées
+
+    Chaque encodage a son propre ETag fort (suffixe -gz / -br) ;
+    un If-None-Match portant l'un d'eux suffit pour répondre 304.
+    """
+
+    __slots__ = ("body", "media_type", "cache_control", "etag", "variants", "_etags")
+
+    def __init__(self, body: bytes, media_type: str = COMPRESSIBLE_TYPES[".html"],
+                 max_age: int = HTML_MAX_AGE):
+        self.body = body
+        self.media_type = media_type
+        self.cache_control = f"public, max-age={max_age}, must-revalidate"
+
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+
+        # encodage → (corps, ETag), dans l'ordre de préférence
+        self.variants: Dict[str, tuple] = {}
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+        self.variants["gzip"] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gz"')
+        self._etags = frozenset([self.etag] + [etag for _, etag in self.variants.values()])
+
+    @classmethod
+    def from_text(cls, text: str, **kwargs) -> "CachedPage":
+        return cls(text.encode("utf-8"), **kwargs)
+
+    def is_not_modified(self, headers: Headers) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return not tags.isdisjoint(self._etags)
+
+    def response(self, headers: Headers) -> Response:
+        """Réponse 200 (variante négociée) ou 304"""
+        body, etag, encoding = self.body, self.etag, None
+        accepted = _accepted_encodings(headers.get("accept-encoding", ""))
+        for candidate, (variant_body, variant_etag) in self.variants.items():
+            if candidate in accepted and len(variant_body) < len(body):
+                body, etag, encoding = variant_body, variant_etag, candidate
+                break
+
+        response_headers = {
+            "ETag": etag,
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding"
+        }
+        if self.is_not_modified(headers):
+            return Response(status_code=304, headers=response_headers)
+
+        if encoding is not None:
+            response_headers["Content-Encoding"] = encoding
+        return Response(body, media_type=self.media_type, headers=response_headers)
+
+
+class RenderedPage:
+    """
+    Page rendue à la demande puis conservée
+
+    `render()` n'est rappelé que lorsque `inputs()` change de valeur
+    (par défaut : jamais après le premier rendu).
+    """
+
+    def __init__(self, render: Callable[[], str],
+                 inputs: Optional[Callable[[], Hashable]] = None,
+                 media_type: str = COMPRESSIBLE_TYPES[".html"],
+                 max_age: int = HTML_MAX_AGE):
+        self._render = render
+        self._inputs = inputs or (lambda: None)
+        self._media_type = media_type
+        self._max_age = max_age
+        self._page: Optional[CachedPage] = None
+        self._key: Hashable = None
+        self._lock = threading.Lock()
+
+    def current(self) -> CachedPage:
+        key = self._inputs()
+        page = self._page
+        if page is not None and key == self._key:
+            return page
+        with self._lock:
+            if self._page is None or key != self._key:
+                self._page = CachedPage.from_text(self._render(), media_type=self._media_type,
+                                                  max_age=self._max_age)
+                self._key = key
+            return self._page
+
+    def invalidate(self):
+        """Force un nouveau rendu à la prochaine requête"""
+        with self._lock:
+            self._page = None
+
+    def response(self, headers: Headers) -> Response:
+        return self.current().response(headers)
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles servant les fichiers texte depuis la mémoire, précompressés
+
+    Un fichier est relu seulement si sa date de modification ou sa taille change.
+    """
+
+    def __init__(self, *args, max_age: int = HTML_MAX_AGE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._max_age = max_age
+        self._pages: Dict[str, tuple] = {}  # chemin → ((mtime_ns, taille), CachedPage)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope,
+                      status_code: int = 200) -> Response:
+        media_type = COMPRESSIBLE_TYPES.get(os.path.splitext(str(full_path))[1].lower())
+        if (media_type is None or status_code != 200
+                or stat_result.st_size > STATIC_CACHE_MAX_BYTES):
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        key = (stat_result.st_mtime_ns, stat_result.st_size)
+        cached = self._pages.get(str(full_path))
+        if cached is None or cached[0] != key:
+            with open(full_path, "rb") as handle:
+                page = CachedPage(handle.read(), media_type=media_type, max_age=self._max_age)
+            cached = self._pages[str(full_path)] = (key, page)
+
+        return cached[1].response(Headers(scope=scope))
+
+
+def _accepted_encodings(accept_encoding: str) -> frozenset:
+    """Encodages acceptés par le client (q=0 exclus)"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            accepted.add(name)
+    return frozenset(accepted)
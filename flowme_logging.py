@@ -0,0 +1,214 @@
+# flowme_logging.py - Journal structuré des interactions FlowMe
+"""
+Journal des interactions en JSON lines, hors du chemin des requêtes
+
+- log_interaction() filtre par niveau puis échantillonne avant toute mise en forme
+- les enregistrements acceptés passent par une file bornée (les excédents sont comptés)
+- un thread dédié les sérialise et les écrit
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime
+from typing import Any, Dict, IO, Optional
+
+# Configuration environnement
+LOG_LEVEL = os.getenv("FLOWME_LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("FLOWME_LOG_QUEUE_SIZE", "10000"))
+LOG_FILE = os.getenv("FLOWME_LOG_FILE", "")
+# Taux d'échantillonnage par niveau, ex. "DEBUG=0.01,INFO=0.25" (1.0 par défaut)
+LOG_SAMPLING = os.getenv("FLOWME_LOG_SAMPLING", "")
+
+INTERACTION_LOGGER = "flowme.interactions"
+
+_STOP = object()
+
+
+def parse_sampling(spec: str) -> Dict[int, float]:
+    """Taux d'échantillonnage par niveau numérique ("INFO=0.1,DEBUG=0")"""
+    rates = {}
+    for part in spec.split(","):
+        name, _, rate = part.partition("=")
+        if not rate.strip():
+            continue
+        level = logging.getLevelName(name.strip().upper())
+        if isinstance(level, int):
+            rates[level] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement (champs structurés à plat)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage()
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            line.update(fields)
+        if record.exc_info:
+            line["exception"] = self.formatException(record.exc_info)
+        return json.dumps(line, ensure_ascii=False, default=str)
+
+
+class SampledQueueHandler(logging.Handler):
+    """
+    Handler non bloquant : échantillonne puis dépose l'enregistrement brut
+    dans une file bornée ; la mise en forme a lieu dans le thread d'écriture
+    """
+
+    def __init__(self, stream: IO[str], maxsize: int = LOG_QUEUE_SIZE,
+                 sampling: Optional[Dict[int, float]] = None,
+                 rng: Optional[random.Random] = None):
+        super().__init__()
+        self.stream = stream
+        self.setFormatter(JsonLinesFormatter())
+        self.sampling = dict(sampling or {})
+        self._rng = rng or random.Random()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(maxsize, 1))
+        self._counters = {"enqueued": 0, "written": 0, "dropped": 0, "sampled_out": 0, "errors": 0}
+        self._counters_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    def sample_rate(self, level: int) -> float:
+        return self.sampling.get(level, 1.0)
+
+    def accepts(self, level: int) -> bool:
+        """Décision d'échantillonnage (avant toute construction de l'enregistrement)"""
+        rate = self.sample_rate(level)
+        if rate >= 1.0 or (rate > 0.0 and self._rng.random() < rate):
+            return True
+        self._count("sampled_out")
+        return False
+
+    def _count(self, name: str):
+        with self._counters_lock:
+            self._counters[name] += 1
+
+    def emit(self, record: logging.LogRecord):
+        # Les enregistrements de log_interaction sont déjà échantillonnés
+        if not getattr(record, "sampled", False) and not self.accepts(record.levelno):
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(record)
+            self._count("enqueued")
+        except queue.Full:
+            self._count("dropped")
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="flowme-log-writer",
+                                                daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                break
+            try:
+                self.stream.write(self.format(record) + "\n")
+                self._count("written")
+                if self._queue.empty():
+                    self.stream.flush()
+            except Exception:
+                self._count("errors")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counters_lock:
+            counters = dict(self._counters)
+        return {
+            **counters,
+            "queue_size": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "sampling": {logging.getLevelName(level): rate for level, rate in self.sampling.items()}
+        }
+
+    def close(self):
+        """Vide la file puis arrête le thread d'écriture"""
+        writer = self._writer
+        if writer is not None:
+            self._queue.put(_STOP)
+            writer.join(timeout=5)
+            self._writer = None
+        try:
+            self.stream.flush()
+        except Exception:
+            pass
+        super().close()
+
+
+_handler: Optional[SampledQueueHandler] = None
+_configure_lock = threading.Lock()
+
+
+def get_interaction_logger() -> logging.Logger:
+    """Logger des interactions, configuré au premier appel"""
+    global _handler
+    logger = logging.getLogger(INTERACTION_LOGGER)
+    if _handler is None:
+        with _configure_lock:
+            if _handler is None:
+                stream = open(LOG_FILE, "a", encoding="utf-8", buffering=1 << 16) if LOG_FILE else sys.stdout
+                _handler = SampledQueueHandler(stream, sampling=parse_sampling(LOG_SAMPLING))
+                logger.addHandler(_handler)
+                logger.setLevel(LOG_LEVEL)
+                logger.propagate = False
+    return logger
+
+
+def log_interaction(event: str, level: int = logging.INFO, **fields: Any):
+    """
+    Journalise un événement structuré
+
+    Rien n'est construit si le niveau est filtré ou si l'échantillonnage
+    écarte l'événement ; les champs ne sont sérialisés que par le thread d'écriture.
+    """
+    logger = get_interaction_logger()
+    handler = _handler
+    if handler is None or not logger.isEnabledFor(level) or not handler.accepts(level):
+        return
+    logger.log(level, event, extra={"fields": fields, "sampled": True})
+
+
+def logging_stats() -> Dict[str, Any]:
+    """Compteurs du journal (écrits, écartés, file pleine...)"""
+    if _handler is None:
+        return {"configured": False}
+    return {"configured": True, "level": LOG_LEVEL, **_handler.stats()}
+
+
+def shutdown_logging():
+    """Écrit les enregistrements en attente puis arrête le thread d'écriture"""
+    global _handler
+    with _configure_lock:
+        if _handler is not None:
+            logging.getLogger(INTERACTION_LOGGER).removeHandler(_handler)
+            _handler.close()
+            _handler = None
+
+
+if __name__ == "__main__":
+    import time
+
+    print("📝 Test du journal structuré FlowMe")
+    for i in range(5):
+        log_interaction("demo", state=i, message_length=10 * i)
+    log_interaction("demo_debug", logging.DEBUG, message="jamais sérialisé au niveau INFO")
+    time.sleep(0.1)
+    print(logging_stats())
+    shutdown_logging()
@@ -0,0 +1,312 @@
+# flowme_metrics.py - Métriques de latence des étapes et des requêtes (format Prometheus)
+"""
+Histogrammes de latence, compteurs et jauges exposés sur /metrics
+(format texte Prometheus 0.0.4)
+
+- étapes de FlowMeCore.process_interaction, constellation, réponses approfondies
+- requêtes HTTP et connexions WebSocket via un middleware ASGI (route = gabarit)
+- désactivées (FLOWME_METRICS=0) : les minuteurs sont un objet inerte partagé
+  et les fonctions décorées ne sont pas enveloppées
+"""
+
+import functools
+import os
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, List, Tuple, TypeVar
+
+# Configuration environnement
+METRICS_ENABLED = os.getenv("FLOWME_METRICS", "1").strip().lower() not in ("0", "false", "off", "no")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bornes des histogrammes (secondes) : de la sous-milliseconde aux requêtes lentes
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """Série de valeurs par combinaison d'étiquettes"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _labels(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(Metric):
+    """Compteur croissant"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._labels(labels)} {_format_value(value)}" for labels, value in values]
+
+
+class Gauge(Counter):
+    """Valeur instantanée (requêtes en cours, connexions ouvertes)"""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    """
+    Histogramme de latences
+
+    Les comptes sont tenus par intervalle et cumulés à l'export : une
+    observation coûte une recherche dichotomique et deux additions.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        # Par série : [compte par intervalle..., compte au-delà, somme]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            snapshot = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = []
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                bucket = self._labels(labels, 'le="%s"' % _format_value(bound))
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {series[-1]!r}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Ensemble des métriques exportées"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrique déjà enregistrée : {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Registre et métriques du processus
+registry = Registry()
+
+STAGE_SECONDS: Histogram = registry.register(Histogram(
+    "flowme_stage_duration_seconds", "Durée des étapes de traitement", ("stage",)))
+STAGE_ERRORS: Counter = registry.register(Counter(
+    "flowme_stage_errors_total", "Étapes interrompues par une exception", ("stage",)))
+HTTP_REQUESTS: Counter = registry.register(Counter(
+    "flowme_http_requests_total", "Requêtes HTTP traitées", ("method", "route", "status")))
+HTTP_SECONDS: Histogram = registry.register(Histogram(
+    "flowme_http_request_duration_seconds", "Durée des requêtes HTTP (réponse complète)", ("method", "route")))
+HTTP_IN_FLIGHT: Gauge = registry.register(Gauge(
+    "flowme_http_requests_in_flight", "Requêtes HTTP en cours"))
+WS_CONNECTIONS: Gauge = registry.register(Gauge(
+    "flowme_websocket_connections", "Connexions WebSocket ouvertes", ("route",)))
+WS_SESSIONS: Counter = registry.register(Counter(
+    "flowme_websocket_sessions_total", "Connexions WebSocket acceptées ou refusées", ("route",)))
+
+
+class StageTimer:
+    """Minuteur d'une étape, utilisé comme gestionnaire de contexte"""
+
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "StageTimer":
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        STAGE_SECONDS.observe(perf_counter() - self.started, self.stage)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(self.stage)
+        return False
+
+
+_DISABLED = nullcontext()
+
+
+def stage(name: str):
+    """Mesure un bloc : `with stage("detection"):` (objet inerte si désactivé)"""
+    return StageTimer(name) if METRICS_ENABLED else _DISABLED
+
+
+def observe_stage(name: str, seconds: float):
+    """Enregistre une durée déjà mesurée"""
+    if METRICS_ENABLED:
+        STAGE_SECONDS.observe(seconds, name)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Décorateur : chaque appel est mesuré comme l'étape `name`"""
+    def decorate(func: F) -> F:
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with StageTimer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _route_label(scope: Dict[str, Any]) -> str:
+    """Gabarit de la route résolue (cardinalité bornée), "unmatched" sinon"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI : durée, statut et requêtes en cours par route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self._websocket(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def _http(self, scope, receive, send):
+        status = 500
+        started = perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = _route_label(scope)
+            HTTP_REQUESTS.inc(scope["method"], route, str(status))
+            HTTP_SECONDS.observe(perf_counter() - started, scope["method"], route)
+
+    async def _websocket(self, scope, receive, send):
+        opened = False
+
+        async def send_tracking(message):
+            nonlocal opened
+            if message["type"] == "websocket.accept" and not opened:
+                opened = True
+                WS_CONNECTIONS.inc(_route_label(scope))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_tracking)
+        finally:
+            route = _route_label(scope)
+            WS_SESSIONS.inc(route)
+            if opened:
+                WS_CONNECTIONS.dec(route)
+
+
+def render_metrics() -> str:
+    """Export texte de toutes les métriques"""
+    return registry.render()
+
+
+if __name__ == "__main__":
+    import timeit
+
+    print("📈 Test des métriques FlowMe")
+    for stage_name, duration in (("detection", 0.0004), ("detection", 0.003), ("response", 0.02)):
+        observe_stage(stage_name, duration)
+    with stage("transition"):
+        pass
+    print(render_metrics().split("# HELP flowme_http")[0])
+
+    def timed_block():
+        with stage("bench"):
+            pass
+
+    cost = min(timeit.repeat(timed_block, number=100000, repeat=3)) / 100000
+    state = "actif" if METRICS_ENABLED else "inerte (FLOWME_METRICS=0)"
+    print(f"⏱️  coût d'un minuteur {state} : {cost * 1e9:.0f} ns")
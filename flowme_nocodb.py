@@ -0,0 +1,529 @@
+# flowme_nocodb.py - Export des interactions vers NocoDB
+"""
+Synchronisation asynchrone des interactions vers la table NocoDB configurée
+
+- export_interaction() ne fait qu'ajouter à un tampon borné (jamais d'attente réseau)
+- une tâche de fond envoie des insertions groupées sur un pool de connexions persistant
+- nouvelles tentatives avec attente exponentielle aléatoire (full jitter)
+- disjoncteur : après plusieurs échecs, plus d'appel distant pendant un délai
+- pendant une panne, les lots sont déversés sur disque (fichier borné) puis renvoyés
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import httpx
+
+# Configuration environnement (mêmes variables que main.py)
+NOCODB_URL = os.getenv("NOCODB_URL", "https://app.nocodb.com")
+NOCODB_TOKEN = os.getenv("NOCODB_TOKEN", "")
+TABLE_ID = os.getenv("TABLE_ID", "")
+
+NOCODB_BATCH_SIZE = max(int(os.getenv("FLOWME_NOCODB_BATCH_SIZE", "100")), 1)
+NOCODB_FLUSH_INTERVAL = float(os.getenv("FLOWME_NOCODB_FLUSH_INTERVAL", "2"))
+NOCODB_BUFFER_SIZE = int(os.getenv("FLOWME_NOCODB_BUFFER_SIZE", "10000"))
+NOCODB_MAX_RETRIES = int(os.getenv("FLOWME_NOCODB_MAX_RETRIES", "4"))
+NOCODB_BACKOFF_BASE = float(os.getenv("FLOWME_NOCODB_BACKOFF_BASE", "0.5"))
+NOCODB_BACKOFF_MAX = float(os.getenv("FLOWME_NOCODB_BACKOFF_MAX", "30"))
+NOCODB_TIMEOUT = float(os.getenv("FLOWME_NOCODB_TIMEOUT", "10"))
+NOCODB_MAX_CONNECTIONS = int(os.getenv("FLOWME_NOCODB_MAX_CONNECTIONS", "4"))
+NOCODB_BREAKER_THRESHOLD = int(os.getenv("FLOWME_NOCODB_BREAKER_THRESHOLD", "5"))
+NOCODB_BREAKER_RESET = float(os.getenv("FLOWME_NOCODB_BREAKER_RESET", "30"))
+NOCODB_SPILL_PATH = os.getenv("FLOWME_NOCODB_SPILL_PATH", "flowme_nocodb_spill.jsonl")
+NOCODB_SPILL_MAX_BYTES = int(os.getenv("FLOWME_NOCODB_SPILL_MAX_BYTES", str(10 * 1024 * 1024)))
+
+RETRYABLE_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Jeton refusé : erreur de configuration, pas du lot (conservé jusqu'à correction)
+AUTH_FAILURE_STATUS = frozenset({401, 403})
+
+
+class NocoDBError(Exception):
+    """Échec d'envoi vers NocoDB"""
+
+    def __init__(self, message: str, retryable: bool = True, retry_after: Optional[float] = None,
+                 status: Optional[int] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.status = status
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur à trois états
+
+    closed : appels autorisés ; open : appels refusés pendant `reset_timeout` ;
+    half_open : un seul appel d'essai, qui referme ou rouvre le disjoncteur.
+    """
+
+    def __init__(self, threshold: int = NOCODB_BREAKER_THRESHOLD,
+                 reset_timeout: float = NOCODB_BREAKER_RESET,
+                 clock: Callable[[], float] = time.monotonic):
+        self.threshold = max(threshold, 1)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if self._clock() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = self._clock()
+
+    def trip(self):
+        """Ouvre immédiatement le disjoncteur (panne qui ne se résoudra pas d'elle-même)"""
+        if self.state != "open":
+            self.trips += 1
+        self.state = "open"
+        self.opened_at = self._clock()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "trips": self.trips}
+
+
+class SpillBuffer:
+    """
+    Tampon disque en JSON lines, borné en octets
+
+    Appelé hors de la boucle d'événements (asyncio.to_thread).
+    """
+
+    def __init__(self, path: str = NOCODB_SPILL_PATH, max_bytes: int = NOCODB_SPILL_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def append(self, records: List[Dict[str, Any]]) -> int:
+        """Ajoute les enregistrements qui tiennent dans la limite ; retourne leur nombre"""
+        with self._lock:
+            available = self.max_bytes - self.size()
+            lines = []
+            for record in records:
+                line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+                size = len(line.encode("utf-8"))
+                if size > available:
+                    break
+                available -= size
+                lines.append(line)
+            self.dropped += len(records) - len(lines)
+            if lines:
+                with open(self.path, "a", encoding="utf-8") as spill:
+                    spill.writelines(lines)
+            return len(lines)
+
+    def take(self, limit: int) -> List[Dict[str, Any]]:
+        """Retire jusqu'à `limit` enregistrements du début du fichier"""
+        with self._lock:
+            try:
+                with open(self.path, encoding="utf-8") as spill:
+                    lines = spill.readlines()
+            except FileNotFoundError:
+                return []
+            head, rest = lines[:limit], lines[limit:]
+            if rest:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as spill:
+                    spill.writelines(rest)
+                os.replace(tmp_path, self.path)
+            else:
+                os.remove(self.path)
+        records = []
+        for line in head:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                self.dropped += 1  # Ligne tronquée (arrêt brutal pendant l'écriture)
+        return records
+
+
+class NocoDBSync:
+    """
+    Exportateur NocoDB (API v2, insertion groupée de records)
+
+    Les enregistrements sont envoyés par lots de `batch_size`, au plus tard
+    `flush_interval` secondes après leur arrivée.
+    """
+
+    def __init__(self, base_url: str = NOCODB_URL, token: str = NOCODB_TOKEN,
+                 table_id: str = TABLE_ID, batch_size: int = NOCODB_BATCH_SIZE,
+                 flush_interval: float = NOCODB_FLUSH_INTERVAL,
+                 buffer_size: int = NOCODB_BUFFER_SIZE,
+                 max_retries: int = NOCODB_MAX_RETRIES,
+                 backoff_base: float = NOCODB_BACKOFF_BASE,
+                 backoff_max: float = NOCODB_BACKOFF_MAX,
+                 timeout: float = NOCODB_TIMEOUT,
+                 max_connections: int = NOCODB_MAX_CONNECTIONS,
+                 breaker: Optional[CircuitBreaker] = None,
+                 spill: Optional[SpillBuffer] = None,
+                 rng: Optional[random.Random] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.table_id = table_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer_size = max(buffer_size, 1)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.breaker = breaker or CircuitBreaker()
+        self.spill = spill or SpillBuffer()
+        self._rng = rng or random.Random()
+        self._transport = transport  # httpx.MockTransport dans les tests
+
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._counters = {"enqueued": 0, "sent": 0, "batches": 0, "retries": 0,
+                          "spilled": 0, "recovered": 0, "dropped": 0, "rejected": 0,
+                          "auth_failures": 0}
+        self._counters_lock = threading.Lock()
+        self._last_error: Optional[str] = None
+
+    @property
+    def records_path(self) -> str:
+        return f"/api/v2/tables/{self.table_id}/records"
+
+    def _count(self, name: str, amount: int = 1):
+        with self._counters_lock:
+            self._counters[name] += amount
+
+    # Mise en file
+
+    def enqueue(self, record: Dict[str, Any]) -> bool:
+        """Ajoute un enregistrement (sûr depuis n'importe quel thread) ; False si écarté"""
+        if len(self._buffer) >= self.buffer_size:
+            self._count("dropped")
+            return False
+        self._buffer.append(record)
+        self._count("enqueued")
+        if len(self._buffer) >= self.batch_size:
+            self._wake()
+        return True
+
+    def _wake(self):
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            wakeup.set()
+        else:
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        batch = []
+        while self._buffer and len(batch) < self.batch_size:
+            batch.append(self._buffer.popleft())
+        return batch
+
+    # Cycle de vie
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"xc-token": self.token, "Content-Type": "application/json"},
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+            transport=self._transport
+        )
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0):
+        """Dernier envoi des lots en attente (déversés sur disque en cas d'échec)"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._task = None
+
+        try:
+            await asyncio.wait_for(self._drain_buffer(retries=0), timeout)
+        except asyncio.TimeoutError:
+            pass
+        if self._buffer:
+            await self._spill(list(self._buffer))
+            self._buffer.clear()
+        await self._client.aclose()
+        self._client = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._drain_buffer()
+                await self._recover_spill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error("Erreur de synchronisation NocoDB: %s", e)
+
+    async def flush(self):
+        """Envoie immédiatement tout le tampon (utile aux tests et à l'arrêt)"""
+        await self._drain_buffer()
+        await self._recover_spill()
+
+    # Envoi
+
+    async def _drain_buffer(self, retries: Optional[int] = None):
+        while self._buffer:
+            batch = self._take_batch()
+            if not await self._deliver(batch, retries):
+                await self._spill(batch)
+
+    async def _recover_spill(self):
+        """Renvoie le contenu du fichier de débordement une fois NocoDB joignable"""
+        while self.spill.size() and self.breaker.allow():
+            batch = await asyncio.to_thread(self.spill.take, self.batch_size)
+            if not batch:
+                break
+            if not await self._deliver(batch, retries=0):
+                await self._spill(batch)
+                break
+            self._count("recovered", len(batch))
+
+    async def _spill(self, batch: List[Dict[str, Any]]):
+        written = await asyncio.to_thread(self.spill.append, batch)
+        self._count("spilled", written)
+        self._count("dropped", len(batch) - written)
+
+    async def _deliver(self, batch: List[Dict[str, Any]], retries: Optional[int] = None) -> bool:
+        """Envoie un lot avec nouvelles tentatives ; False si le lot doit être déversé"""
+        retries = self.max_retries if retries is None else retries
+        for attempt in range(retries + 1):
+            if not self.breaker.allow():
+                return False
+            try:
+                await self._post(batch)
+            except NocoDBError as e:
+                self._last_error = str(e)
+                if e.status in AUTH_FAILURE_STATUS:
+                    # Jeton invalide ou révoqué : le lot est déversé sur disque et
+                    # renvoyé par l'essai suivant la réouverture du disjoncteur
+                    self._count("auth_failures")
+                    self.breaker.trip()
+                    logging.error("NocoDB refuse le jeton, lot conservé: %s", e)
+                    return False
+                if not e.retryable:
+                    # Rejet définitif (ex. schéma incompatible) : inutile de réessayer
+                    self._count("rejected", len(batch))
+                    logging.error("Lot rejeté par NocoDB: %s", e)
+                    return True
+                self.breaker.record_failure()
+                if attempt < retries:
+                    self._count("retries")
+                    await asyncio.sleep(self._backoff(attempt, e.retry_after))
+                continue
+            self.breaker.record_success()
+            self._count("sent", len(batch))
+            self._count("batches")
+            return True
+        return False
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Attente exponentielle plafonnée, tirée uniformément (full jitter)"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return self._rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _post(self, batch: List[Dict[str, Any]]):
+        try:
+            response = await self._client.post(self.records_path, json=batch)
+        except httpx.HTTPError as e:
+            raise NocoDBError(f"{e.__class__.__name__}: {e}") from e
+
+        if response.is_success:
+            return
+        retry_after = response.headers.get("retry-after")
+        raise NocoDBError(
+            f"HTTP {response.status_code}: {response.text[:200]}",
+            retryable=response.status_code in RETRYABLE_STATUS,
+            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            status=response.status_code
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counters_lock:
+            counters = dict(self._counters)
+        return {
+            **counters,
+            "buffered": len(self._buffer),
+            "buffer_capacity": self.buffer_size,
+            "spill_bytes": self.spill.size(),
+            "spill_dropped": self.spill.dropped,
+            "breaker": self.breaker.snapshot(),
+            "last_error": self._last_error
+        }
+
+
+def is_configured() -> bool:
+    return bool(NOCODB_TOKEN and TABLE_ID)
+
+
+_sync: Optional[NocoDBSync] = None
+
+
+def get_nocodb_sync() -> Optional[NocoDBSync]:
+    """Exportateur du processus (None si NOCODB_TOKEN ou TABLE_ID manque)"""
+    global _sync
+    if _sync is None and is_configured():
+        _sync = NocoDBSync()
+    return _sync
+
+
+def export_interaction(record: Dict[str, Any]) -> bool:
+    """Programme l'export d'une interaction si NocoDB est configuré"""
+    sync = get_nocodb_sync()
+    return sync.enqueue(record) if sync is not None else False
+
+
+def nocodb_stats() -> Dict[str, Any]:
+    if not is_configured():
+        return {"configured": False}
+    if _sync is None:
+        return {"configured": True, "started": False}
+    return {"configured": True, "table_id": TABLE_ID, **_sync.stats()}
+
+
+async def start_nocodb_sync():
+    sync = get_nocodb_sync()
+    if sync is not None:
+        await sync.start()
+
+
+async def stop_nocodb_sync():
+    if _sync is not None:
+        await _sync.stop()
+
+
+if __name__ == "__main__":
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubNocoDB(BaseHTTPRequestHandler):
+        """Émule POST /api/v2/tables/{table}/records ; `down` simule une panne"""
+
+        down = False
+        revoked = False
+        records: List[Dict[str, Any]] = []
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.revoked or self.headers.get("xc-token") != "demo-token":
+                self._reply(401, {"msg": "Unauthorized"})
+            elif self.down:
+                self._reply(503, {"msg": "Service Unavailable"})
+            elif not self.path.startswith("/api/v2/tables/demo/records"):
+                self._reply(404, {"msg": "Table not found"})
+            else:
+                rows = json.loads(body)
+                start = len(StubNocoDB.records)
+                StubNocoDB.records.extend(rows)
+                self._reply(200, [{"Id": start + i + 1} for i in range(len(rows))])
+
+        def _reply(self, status: int, payload: Any):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    async def _demo(url: str, directory: str):
+        print("☁️  Test de la synchronisation NocoDB (serveur factice)")
+        sync = NocoDBSync(base_url=url, token="demo-token", table_id="demo", batch_size=50,
+                          flush_interval=0.05, max_retries=2, backoff_base=0.01,
+                          breaker=CircuitBreaker(threshold=2, reset_timeout=0.2),
+                          spill=SpillBuffer(os.path.join(directory, "spill.jsonl")))
+        await sync.start()
+
+        for i in range(120):
+            sync.enqueue({"session_id": f"s{i % 4}", "detected_state": 1 + i % 64})
+        await sync.flush()
+        print(f"  ✅ en ligne : {len(StubNocoDB.records)} enregistrements reçus")
+
+        StubNocoDB.down = True
+        for i in range(200):
+            sync.enqueue({"session_id": "panne", "detected_state": 45})
+        await sync.flush()
+        print(f"  🔌 panne : disjoncteur {sync.breaker.state}, {sync.stats()['spilled']} déversés sur disque")
+
+        StubNocoDB.down = False
+        await asyncio.sleep(0.25)
+        sync.enqueue({"session_id": "retour", "detected_state": 1})
+        await sync.flush()
+        print(f"  🔁 rétabli : {len(StubNocoDB.records)} reçus au total, "
+              f"{sync.stats()['recovered']} récupérés du disque")
+
+        StubNocoDB.revoked = True
+        for i in range(30):
+            sync.enqueue({"session_id": "jeton", "detected_state": 12})
+        await sync.flush()
+        print(f"  🔑 jeton refusé : disjoncteur {sync.breaker.state}, "
+              f"{sync.stats()['rejected']} rejetés, {len(StubNocoDB.records)} reçus")
+
+        StubNocoDB.revoked = False
+        await asyncio.sleep(0.25)
+        await sync.flush()
+        print(f"  🔁 jeton rétabli : {len(StubNocoDB.records)} reçus au total")
+        await sync.stop()
+        print(sync.stats())
+        assert len(StubNocoDB.records) == 351
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubNocoDB)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(_demo(f"http://127.0.0.1:{server.server_address[1]}", directory))
+    server.shutdown()
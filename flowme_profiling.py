@@ -0,0 +1,496 @@
+# flowme_profiling.py - Profilage à la demande des requêtes
+"""
+Profilage opt-in d'une requête et échantillonnage continu 1 requête sur N
+
+- par requête : en-tête X-FlowMe-Profile (ou ?profile=) accompagné de
+  X-FlowMe-Admin-Token (FLOWME_ADMIN_TOKEN)
+  - cprofile (ou 1) : profileur déterministe, fonctions triées par temps cumulé
+  - sample : échantillonneur de piles (surcoût faible), piles repliées
+  - top : comme cprofile, le résumé est joint à la réponse JSON
+  Le profil est conservé sous un identifiant (en-tête X-FlowMe-Profile-Id),
+  consultable et téléchargeable via /debug/profiles/{id}.
+- serveur : FLOWME_PROFILE_SAMPLE_EVERY=N échantillonne une requête sur N ;
+  les piles sont agrégées dans un fichier "folded" (flamegraph.pl, speedscope),
+  pondérées en microsecondes
+- le calcul déporté dans un thread suit le profil de la requête (profiled()) ;
+  une requête profilée contourne le cache d'analyses pour mesurer le calcul
+"""
+
+import cProfile
+import itertools
+import json
+import marshal
+import os
+import pstats
+import secrets
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, TypeVar
+from urllib.parse import parse_qs
+
+# Configuration environnement
+ADMIN_TOKEN = os.getenv("FLOWME_ADMIN_TOKEN", "")
+PROFILE_SAMPLE_EVERY = int(os.getenv("FLOWME_PROFILE_SAMPLE_EVERY", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("FLOWME_PROFILE_INTERVAL_MS", "1"))
+PROFILE_KEEP = int(os.getenv("FLOWME_PROFILE_KEEP", "32"))
+PROFILE_TOP = int(os.getenv("FLOWME_PROFILE_TOP", "25"))
+PROFILE_FOLDED_FILE = os.getenv("FLOWME_PROFILE_FOLDED_FILE",
+                                os.path.join(tempfile.gettempdir(), "flowme-profile.folded"))
+PROFILE_FLUSH_SECONDS = float(os.getenv("FLOWME_PROFILE_FLUSH_SECONDS", "30"))
+
+PROFILE_HEADER = b"x-flowme-profile"
+PROFILE_ID_HEADER = b"x-flowme-profile-id"
+TOKEN_HEADER = b"x-flowme-admin-token"
+
+MODES = {"1": "cprofile", "cprofile": "cprofile", "sample": "sample", "top": "top"}
+
+# Avant Python 3.12, un profileur cProfile par thread ; ensuite cProfile repose sur
+# sys.monitoring, global au processus : un seul profileur, qui voit tous les threads
+CPROFILE_PER_THREAD = sys.version_info < (3, 12)
+
+T = TypeVar("T")
+
+
+def is_admin(token: Optional[str]) -> bool:
+    """Jeton d'administration valide (toujours faux si FLOWME_ADMIN_TOKEN est vide)"""
+    return bool(ADMIN_TOKEN) and token is not None and secrets.compare_digest(token, ADMIN_TOKEN)
+
+
+# Échantillonnage de piles
+
+_labels: Dict[Any, str] = {}
+
+
+def _frame_label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label
+
+
+def fold_stack(frame) -> str:
+    """Pile repliée, de la racine à la feuille ("a (f.py:1);b (g.py:7)")"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Relève périodiquement les piles des threads suivis (thread dédié)"""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._threads: Set[int] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, thread_id: int):
+        self._threads.add(thread_id)
+
+    def untrack(self, thread_id: int):
+        self._threads.discard(thread_id)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="flowme-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        # Chaque relevé est pondéré par le temps écoulé depuis le précédent (µs) :
+        # un calcul qui garde le GIL espace les relevés sans fausser les durées
+        previous = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight = round((now - previous) * 1e6)
+            previous = now
+            frames = sys._current_frames()
+            for thread_id in tuple(self._threads):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.stacks[fold_stack(frame)] += weight
+            self.samples += 1
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+
+def stack_summary(stacks: Counter, top: int) -> List[Dict[str, Any]]:
+    """Fonctions par temps inclusif (piles qui les contiennent) et propre (feuille)"""
+    inclusive: Counter = Counter()
+    own: Counter = Counter()
+    for stack, micros in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += micros
+        for label in set(frames):
+            inclusive[label] += micros
+    return [
+        {"function": label, "cumulative_ms": round(micros / 1000, 3), "self_ms": round(own[label] / 1000, 3)}
+        for label, micros in inclusive.most_common(top)
+    ]
+
+
+def format_folded(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+# Sessions de profilage
+
+class ProfileSession:
+    """
+    Profil d'une requête
+
+    Le thread de la boucle d'événements est profilé pendant toute la requête
+    (les autres requêtes servies entre-temps y apparaissent aussi) ; les
+    threads de calcul le sont pendant `thread_scope()`, ou directement par
+    le profileur de la requête depuis Python 3.12.
+    """
+
+    # Un seul profileur déterministe à la fois (un profileur actif par thread)
+    _cprofile_lock = threading.Lock()
+
+    def __init__(self, mode: str, method: str = "", path: str = "", explicit: bool = True):
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.method = method
+        self.path = path
+        self.explicit = explicit
+        self.created_at = datetime.now().isoformat()
+        self.duration_ms = 0.0
+        self._started = 0.0
+        self._profiles: List[cProfile.Profile] = []
+        self._sampler: Optional[StackSampler] = None
+        self._lock = threading.Lock()
+
+    @property
+    def deterministic(self) -> bool:
+        return self.mode in ("cprofile", "top")
+
+    def begin(self) -> bool:
+        """Démarre le profil ; False si un profil déterministe est déjà en cours"""
+        if self.deterministic:
+            if not self._cprofile_lock.acquire(blocking=False):
+                return False
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Autre outil déjà branché sur sys.monitoring (débogueur, couverture)
+                self._cprofile_lock.release()
+                return False
+            self._profiles.append(profile)
+        else:
+            self._sampler = StackSampler()
+            self._sampler.track(threading.get_ident())
+            self._sampler.start()
+        self._started = time.perf_counter()
+        return True
+
+    def end(self):
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        if self.deterministic:
+            self._profiles[0].disable()
+            self._cprofile_lock.release()
+        else:
+            self._sampler.stop()
+
+    @contextmanager
+    def thread_scope(self) -> Iterator[None]:
+        """Profile le thread courant pendant le bloc (calcul déporté)"""
+        if self.deterministic and not CPROFILE_PER_THREAD:
+            yield  # Déjà couvert par le profileur de la requête
+        elif self.deterministic:
+            profile = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profile)
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+        else:
+            thread_id = threading.get_ident()
+            self._sampler.track(thread_id)
+            try:
+                yield
+            finally:
+                self._sampler.untrack(thread_id)
+
+    @property
+    def stacks(self) -> Counter:
+        return self._sampler.stacks if self._sampler is not None else Counter()
+
+    def _stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self._profiles[0])
+        for profile in self._profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def summary(self, top: int = PROFILE_TOP) -> Dict[str, Any]:
+        """Fonctions les plus coûteuses (temps cumulé décroissant)"""
+        info = {"id": self.id, "mode": self.mode, "method": self.method, "path": self.path,
+                "created_at": self.created_at, "duration_ms": round(self.duration_ms, 3)}
+        if not self.deterministic:
+            return {**info, "samples": self._sampler.samples,
+                    "functions": stack_summary(self.stacks, top)}
+
+        stats = self._stats()
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+        return {**info, "threads": len(self._profiles), "total_calls": stats.total_calls,
+                "functions": [
+                    {"function": name, "file": os.path.basename(filename), "line": line,
+                     "calls": calls, "total_ms": round(total * 1000, 3),
+                     "cumulative_ms": round(cumulative * 1000, 3)}
+                    for (filename, line, name), (_, calls, total, cumulative, _) in rows
+                ]}
+
+    def export(self) -> Tuple[bytes, str, str]:
+        """(contenu, type, nom de fichier) : .pstats (pstats, snakeviz) ou .folded"""
+        if self.deterministic:
+            return marshal.dumps(self._stats().stats), "application/octet-stream", f"flowme-{self.id}.pstats"
+        return format_folded(self.stacks).encode(), "text/plain; charset=utf-8", f"flowme-{self.id}.folded"
+
+
+_current: ContextVar[Optional[ProfileSession]] = ContextVar("flowme_profile", default=None)
+
+
+def current_profile() -> Optional[ProfileSession]:
+    """Profil de la requête en cours (None hors profilage)"""
+    return _current.get()
+
+
+def profiled(func: Callable[..., T]) -> Callable[..., T]:
+    """
+    `func` suivie par le profil de la requête en cours quand elle s'exécute
+    dans un autre thread (à appeler dans le contexte de la requête)
+    """
+    session = _current.get()
+    if session is None:
+        return func
+
+    def run(*args, **kwargs):
+        with session.thread_scope():
+            return func(*args, **kwargs)
+    return run
+
+
+class ProfileStore:
+    """Derniers profils demandés, par identifiant"""
+
+    def __init__(self, maxsize: int = PROFILE_KEEP):
+        self.maxsize = max(maxsize, 1)
+        self._profiles: "OrderedDict[str, ProfileSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, session: ProfileSession):
+        with self._lock:
+            self._profiles[session.id] = session
+            while len(self._profiles) > self.maxsize:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[ProfileSession]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            sessions = list(self._profiles.values())
+        return [{"id": s.id, "mode": s.mode, "method": s.method, "path": s.path,
+                 "created_at": s.created_at, "duration_ms": round(s.duration_ms, 3)}
+                for s in reversed(sessions)]
+
+
+class FlamegraphAggregator:
+    """Piles des requêtes échantillonnées, cumulées et écrites au format folded"""
+
+    def __init__(self, path: str = PROFILE_FOLDED_FILE, every: int = PROFILE_SAMPLE_EVERY,
+                 flush_seconds: float = PROFILE_FLUSH_SECONDS):
+        self.path = path
+        self.every = every
+        self.flush_seconds = flush_seconds
+        self.stacks: Counter = Counter()
+        self.requests = 0
+        self._seen = itertools.count(1)
+        self._flushed_at = time.monotonic()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def due(self) -> bool:
+        """Vrai pour une requête sur N"""
+        return self.every > 0 and next(self._seen) % self.every == 0
+
+    def add(self, stacks: Counter):
+        with self._lock:
+            self.stacks.update(stacks)
+            self.requests += 1
+            self._dirty = True
+            flush = time.monotonic() - self._flushed_at >= self.flush_seconds
+        if flush:
+            self.flush()
+
+    def folded(self) -> str:
+        with self._lock:
+            return format_folded(self.stacks)
+
+    def flush(self):
+        """Réécrit le fichier (écriture atomique)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            content = format_folded(self.stacks)
+            self._dirty = False
+            self._flushed_at = time.monotonic()
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            handle.write(content)
+        os.replace(temporary, self.path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sample_every": self.every, "sampled_requests": self.requests,
+                "distinct_stacks": len(self.stacks), "file": self.path}
+
+
+profile_store = ProfileStore()
+flamegraph = FlamegraphAggregator()
+
+
+def shutdown_profiling():
+    """Écrit les piles agrégées restantes"""
+    flamegraph.flush()
+
+
+# Middleware ASGI
+
+def _requested_mode(scope: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """(mode demandé, jeton) d'après les en-têtes ou la chaîne de requête"""
+    mode = token = None
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER:
+            mode = value.decode("latin-1")
+        elif name == TOKEN_HEADER:
+            token = value.decode("latin-1")
+    if mode is None and b"profile=" in scope.get("query_string", b""):
+        mode = parse_qs(scope["query_string"].decode("latin-1")).get("profile", [None])[0]
+    return (MODES.get(mode.strip().lower()) if mode else None), token
+
+
+class ProfilingMiddleware:
+    """Profile les requêtes demandées (jeton d'administration) et une requête sur N"""
+
+    def __init__(self, app, store: ProfileStore = profile_store, aggregator: FlamegraphAggregator = flamegraph):
+        self.app = app
+        self.store = store
+        self.aggregator = aggregator
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode, token = _requested_mode(scope)
+        if mode is not None and not is_admin(token):
+            await self.app(scope, receive, self._with_headers(send, [(PROFILE_HEADER, b"denied")]))
+            return
+        if mode is None:
+            if not self.aggregator.due():
+                await self.app(scope, receive, send)
+                return
+            session = ProfileSession("sample", scope["method"], scope["path"], explicit=False)
+        else:
+            session = ProfileSession(mode, scope["method"], scope["path"])
+
+        if not session.begin():
+            await self.app(scope, receive, self._with_headers(send, [(PROFILE_HEADER, b"busy")]))
+            return
+
+        context_token = _current.set(session)
+        try:
+            if session.mode == "top":
+                await self._inline(session, scope, receive, send)
+            else:
+                headers = [(PROFILE_HEADER, session.mode.encode()),
+                           (PROFILE_ID_HEADER, session.id.encode())] if session.explicit else []
+                await self.app(scope, receive, self._with_headers(send, headers))
+        finally:
+            _current.reset(context_token)
+            if session.mode != "top":
+                session.end()
+            if session.explicit:
+                self.store.add(session)
+            else:
+                self.aggregator.add(session.stacks)
+
+    @staticmethod
+    def _with_headers(send, headers: List[Tuple[bytes, bytes]]):
+        if not headers:
+            return send
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", ()), *headers]}
+            await send(message)
+        return send_with_headers
+
+    async def _inline(self, session: ProfileSession, scope, receive, send):
+        """Réponse JSON complétée par le résumé du profil : {"result": ..., "profile": ...}"""
+        start: Dict[str, Any] = {}
+        chunks: List[bytes] = []
+
+        async def buffer(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        try:
+            await self.app(scope, receive, buffer)
+        finally:
+            session.end()
+
+        headers = [(name, value) for name, value in start.get("headers", ()) if name != b"content-length"]
+        body = b"".join(chunks)
+        content_type = dict(headers).get(b"content-type", b"")
+        if content_type.startswith(b"application/json"):
+            body = json.dumps({"result": json.loads(body or b"null"), "profile": session.summary()},
+                              ensure_ascii=False).encode()
+        headers += [(b"content-length", str(len(body)).encode()),
+                    (PROFILE_HEADER, b"top"), (PROFILE_ID_HEADER, session.id.encode())]
+        await send({**start, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+if __name__ == "__main__":
+    import re
+
+    print("🔬 Test du profilage FlowMe")
+
+    def slow_regex(text: str) -> int:
+        return sum(len(re.findall(r"(\w+)\s+\1", text * 200)) for _ in range(100))
+
+    for mode in ("cprofile", "sample"):
+        session = ProfileSession(mode, "POST", "/demo")
+        session.begin()
+        token = _current.set(session)
+        work = profiled(lambda: slow_regex("je je suis suis là "))
+        _current.reset(token)
+        worker = threading.Thread(target=work)
+        worker.start()
+        worker.join()
+        session.end()
+        summary = session.summary(top=5)
+        print(f"  {mode}: {summary['duration_ms']:.1f} ms")
+        for row in summary["functions"]:
+            print(f"    {row['cumulative_ms']:8.2f} ms  {row['function']}")
+        content, media_type, filename = session.export()
+        print(f"  export {filename} ({len(content)} octets, {media_type})")
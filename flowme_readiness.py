@@ -0,0 +1,103 @@
+# flowme_readiness.py - Auto-test de disponibilité mis en cache
+"""
+Exécute périodiquement l'auto-test du service dans une tâche de fond
+et conserve le dernier résultat pour /readyz et /health
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+# Configuration environnement
+READINESS_INTERVAL = float(os.getenv("FLOWME_READINESS_INTERVAL", "30"))
+
+
+class ReadinessMonitor:
+    """
+    Cache du dernier auto-test
+
+    `check()` retourne le diagnostic complet ; le service est prêt si
+    `is_ready(diagnostic)` est vrai. Une exception rend le service non prêt.
+    """
+
+    def __init__(self, check: Callable[[], Dict[str, Any]],
+                 is_ready: Callable[[Dict[str, Any]], bool],
+                 interval: float = READINESS_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        self._check = check
+        self._is_ready = is_ready
+        self._interval = max(interval, 0.1)
+        self._clock = clock
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._computed_at_monotonic = 0.0
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def refresh(self) -> Dict[str, Any]:
+        """Exécute l'auto-test et remplace le résultat en cache"""
+        started = time.perf_counter()
+        try:
+            diagnostic = self._check()
+            ready = bool(self._is_ready(diagnostic))
+            error = None
+        except Exception as e:
+            diagnostic, ready, error = {}, False, str(e) or e.__class__.__name__
+            logging.warning("Auto-test de disponibilité en échec: %s", e)
+
+        snapshot = {
+            "ready": ready,
+            "pending": False,
+            "error": error,
+            "computed_at": datetime.now().isoformat(),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "diagnostic": diagnostic
+        }
+        with self._lock:
+            self._snapshot = snapshot
+            self._computed_at_monotonic = self._clock()
+        return snapshot
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Dernier résultat, ou résultat "en attente" (non prêt) avant le premier auto-test"""
+        with self._lock:
+            snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        # L'auto-test tourne dans la tâche de fond : jamais exécuté ici, sur la boucle
+        return {
+            "ready": False,
+            "pending": True,
+            "error": "Auto-test initial en cours",
+            "computed_at": None,
+            "duration_ms": None,
+            "diagnostic": {}
+        }
+
+    def age_seconds(self) -> Optional[float]:
+        with self._lock:
+            if self._snapshot is None:
+                return None
+            return round(self._clock() - self._computed_at_monotonic, 3)
+
+    async def _run(self):
+        while True:
+            await asyncio.to_thread(self.refresh)
+            await asyncio.sleep(self._interval)
+
+    def start(self):
+        """Lance l'auto-test périodique dans la boucle courante"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,376 @@
+# flowme_session_state.py - État de session partagé entre workers (mémoire ou SQLite)
+"""
+État des sessions FlowMe derrière un backend interchangeable
+
+- memory : état propre au processus, borné comme les sessions (un seul worker)
+- sqlite : base locale en WAL partagée par les workers d'une même machine ;
+  chaque mise à jour d'une session (état courant, historique, compteurs)
+  est une transaction BEGIN IMMEDIATE, donc atomique entre processus
+- sqlite relaie aussi les événements du bus entre workers : chaque
+  publication est écrite dans session_events, que chaque worker relit
+
+Sélection par FLOWME_SESSION_BACKEND (memory par défaut).
+"""
+
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from flowme_sessions import SESSION_IDLE_TTL, SessionStore
+from flowme_store import connect
+
+# Configuration environnement
+SESSION_BACKEND = os.getenv("FLOWME_SESSION_BACKEND", "memory").strip().lower()
+SESSION_DB_PATH = os.getenv("FLOWME_SESSION_DB", "flowme_sessions.db")
+SESSION_EVENTS_KEEP = max(int(os.getenv("FLOWME_SESSION_EVENTS_KEEP", "10000")), 1)
+
+# Historique borné : au-delà de HISTORY_LIMIT états, seuls les HISTORY_KEEP derniers sont gardés
+HISTORY_LIMIT = 50
+HISTORY_KEEP = 25
+
+# Purge des sessions inactives (base sqlite) toutes les PURGE_EVERY écritures
+PURGE_EVERY = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_state (
+    session_id TEXT PRIMARY KEY,
+    epoch TEXT NOT NULL,
+    current_state INTEGER NOT NULL,
+    history TEXT NOT NULL,
+    interactions INTEGER NOT NULL,
+    transitions INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_session_state_updated ON session_state (updated_at);
+CREATE TABLE IF NOT EXISTS session_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts TEXT NOT NULL,
+    session_id TEXT,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+STATE_COLUMNS = ("session_id", "epoch", "current_state", "history", "interactions",
+                 "transitions", "version", "updated_at")
+
+EventRow = Tuple[int, Optional[str], str, Dict[str, Any], str]
+
+
+class SessionState:
+    """
+    État partagé d'une session : état courant, historique borné et compteurs
+
+    `epoch` change à chaque création ou réinitialisation de la session,
+    `version` à chaque mise à jour.
+    """
+
+    __slots__ = ("session_id", "epoch", "current_state", "history", "interactions", "transitions", "version")
+
+    def __init__(self, session_id: str, epoch: Optional[str] = None, current_state: int = 1,
+                 history: Optional[List[int]] = None, interactions: int = 0,
+                 transitions: int = 0, version: int = 0):
+        self.session_id = session_id
+        self.epoch = epoch or uuid.uuid4().hex[:16]
+        self.current_state = current_state
+        self.history = history if history is not None else []
+        self.interactions = interactions
+        self.transitions = transitions
+        self.version = version
+
+    def apply(self, new_state: int, interaction: bool = True) -> Optional[int]:
+        """Compte l'interaction et transite vers new_state ; retourne l'état quitté (None sans transition)"""
+        if interaction:
+            self.interactions += 1
+        previous_state = None
+        if new_state != self.current_state:
+            previous_state = self.current_state
+            self.history.append(previous_state)
+            if len(self.history) > HISTORY_LIMIT:
+                self.history = self.history[-HISTORY_KEEP:]
+            self.transitions += 1
+            self.current_state = new_state
+        self.version += 1
+        return previous_state
+
+    def copy(self) -> "SessionState":
+        return SessionState(self.session_id, self.epoch, self.current_state, list(self.history),
+                            self.interactions, self.transitions, self.version)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class SessionStateBackend:
+    """Interface des backends d'état de session"""
+
+    name = "abstract"
+    shared = False  # True si l'état est visible de tous les workers
+
+    def load(self, session_id: str) -> SessionState:
+        """État de la session (état initial si elle n'existe pas)"""
+        raise NotImplementedError
+
+    def commit(self, session_id: str, new_state: int, interaction: bool = True) -> Tuple[SessionState, Optional[int]]:
+        """Applique atomiquement SessionState.apply ; retourne (état à jour, état quitté)"""
+        raise NotImplementedError
+
+    def discard(self, session_id: str) -> bool:
+        """Supprime l'état de la session ; True s'il existait"""
+        raise NotImplementedError
+
+    def event_relay(self) -> Optional["SQLiteSessionBackend"]:
+        """Relais d'événements entre workers (None si l'état est local au processus)"""
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "shared": self.shared}
+
+    def close(self):
+        pass
+
+
+class InMemorySessionBackend(SessionStateBackend):
+    """État local au processus, évincé comme les sessions (LRU, inactivité, mémoire)"""
+
+    name = "memory"
+
+    def __init__(self, **limits: Any):
+        self._states: SessionStore[SessionState] = SessionStore(factory=SessionState, **limits)
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> SessionState:
+        with self._lock:
+            state = self._states.peek(session_id)
+            return state.copy() if state is not None else SessionState(session_id)
+
+    def commit(self, session_id: str, new_state: int, interaction: bool = True) -> Tuple[SessionState, Optional[int]]:
+        with self._lock:
+            state = self._states.get(session_id)
+            previous_state = state.apply(new_state, interaction)
+            return state.copy(), previous_state
+
+    def discard(self, session_id: str) -> bool:
+        with self._lock:
+            return self._states.discard(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "sessions": self._states.stats()}
+
+
+class SQLiteSessionBackend(SessionStateBackend):
+    """
+    État partagé dans une base SQLite locale (WAL), une connexion par thread
+
+    Les mises à jour prennent le verrou d'écriture dès le début de la
+    transaction (BEGIN IMMEDIATE) : lecture, modification et écriture d'une
+    session ne s'entrelacent jamais entre workers. Les événements relayés
+    reçoivent un identifiant croissant commun à tous les workers.
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path: str = SESSION_DB_PATH, idle_ttl: float = SESSION_IDLE_TTL,
+                 events_keep: int = SESSION_EVENTS_KEEP):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.events_keep = events_keep
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._writes = itertools.count(1)
+        self._counters = {"commits": 0, "events_written": 0, "purged": 0}
+        self._counters_lock = threading.Lock()
+        # Schéma créé une fois avant l'ouverture des connexions par thread
+        self._connection()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._counters_lock:
+            self._counters[name] += amount
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = connect(self.path, SCHEMA)
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _write(self, operation):
+        """Exécute operation(connexion) dans une transaction d'écriture immédiate"""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = operation(connection)
+            if self.idle_ttl > 0 and next(self._writes) % PURGE_EVERY == 0:
+                self._count("purged", connection.execute("DELETE FROM session_state WHERE updated_at < ?",
+                                                         (time.time() - self.idle_ttl,)).rowcount)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return result
+
+    # État des sessions
+
+    @staticmethod
+    def _state(session_id: str, row: Optional[Tuple[Any, ...]]) -> SessionState:
+        if row is None:
+            return SessionState(session_id)
+        epoch, current_state, history, interactions, transitions, version = row
+        return SessionState(session_id, epoch, current_state, json.loads(history),
+                            interactions, transitions, version)
+
+    def load(self, session_id: str) -> SessionState:
+        row = self._connection().execute(
+            "SELECT epoch, current_state, history, interactions, transitions, version "
+            "FROM session_state WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return self._state(session_id, row)
+
+    def commit(self, session_id: str, new_state: int, interaction: bool = True) -> Tuple[SessionState, Optional[int]]:
+        def update(connection: sqlite3.Connection):
+            row = connection.execute(
+                "SELECT epoch, current_state, history, interactions, transitions, version "
+                "FROM session_state WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            state = self._state(session_id, row)
+            previous_state = state.apply(new_state, interaction)
+            connection.execute(
+                f"INSERT OR REPLACE INTO session_state ({', '.join(STATE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(STATE_COLUMNS))})",
+                (session_id, state.epoch, state.current_state, json.dumps(state.history, separators=(",", ":")),
+                 state.interactions, state.transitions, state.version, time.time())
+            )
+            return state, previous_state
+
+        result = self._write(update)
+        self._count("commits")
+        return result
+
+    def discard(self, session_id: str) -> bool:
+        return self._write(lambda connection: connection.execute(
+            "DELETE FROM session_state WHERE session_id = ?", (session_id,)
+        ).rowcount > 0)
+
+    # Relais d'événements
+
+    def event_relay(self) -> "SQLiteSessionBackend":
+        return self
+
+    def append_event(self, session_id: Optional[str], event_type: str,
+                     data: Dict[str, Any], timestamp: str) -> int:
+        """Écrit un événement ; retourne son identifiant commun à tous les workers"""
+        def insert(connection: sqlite3.Connection) -> int:
+            event_id = connection.execute(
+                "INSERT INTO session_events (ts, session_id, type, data) VALUES (?, ?, ?, ?)",
+                (timestamp, session_id, event_type, json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+            ).lastrowid
+            # Rétention bornée : les plus anciens sont retirés par paquets
+            if event_id % 100 == 0:
+                connection.execute("DELETE FROM session_events WHERE id <= ?", (event_id - self.events_keep,))
+            return event_id
+
+        event_id = self._write(insert)
+        self._count("events_written")
+        return event_id
+
+    def events_after(self, last_event_id: int, session_id: Optional[str] = None,
+                     limit: int = 500) -> List[EventRow]:
+        """Événements postérieurs à last_event_id, dans l'ordre (toutes sessions si session_id est None)"""
+        if session_id is None:
+            rows = self._connection().execute(
+                "SELECT id, session_id, type, data, ts FROM session_events WHERE id > ? ORDER BY id LIMIT ?",
+                (last_event_id, limit)
+            ).fetchall()
+        else:
+            rows = self._connection().execute(
+                "SELECT id, session_id, type, data, ts FROM session_events "
+                "WHERE id > ? AND session_id = ? ORDER BY id LIMIT ?",
+                (last_event_id, session_id, limit)
+            ).fetchall()
+        return [(event_id, session, event_type, json.loads(data), ts)
+                for event_id, session, event_type, data, ts in rows]
+
+    def last_event_id(self) -> int:
+        return self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM session_events").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        sessions = self._connection().execute("SELECT COUNT(*) FROM session_state").fetchone()[0]
+        with self._counters_lock:
+            counters = dict(self._counters)
+        return {**super().stats(), **counters, "path": self.path, "sessions": sessions,
+                "last_event_id": self.last_event_id()}
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.close()
+            except sqlite3.ProgrammingError:
+                pass  # Connexion d'un autre thread : fermée à la fin de celui-ci
+        self._local = threading.local()
+
+
+BACKENDS = {"memory": InMemorySessionBackend, "sqlite": SQLiteSessionBackend}
+
+_backend: Optional[SessionStateBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_session_backend() -> SessionStateBackend:
+    """Backend du processus, choisi par FLOWME_SESSION_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if SESSION_BACKEND not in BACKENDS:
+                    raise ValueError(f"FLOWME_SESSION_BACKEND inconnu : {SESSION_BACKEND} "
+                                     f"(attendu : {', '.join(BACKENDS)})")
+                _backend = BACKENDS[SESSION_BACKEND]()
+    return _backend
+
+
+def shutdown_session_backend():
+    """Ferme les connexions du backend"""
+    global _backend
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+            _backend = None
+
+
+if __name__ == "__main__":
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    print("🗂️  Test de l'état de session partagé FlowMe")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        workers = [SQLiteSessionBackend(path) for _ in range(4)]  # Un backend par « worker »
+
+        def chat(index: int):
+            backend = workers[index % len(workers)]
+            for turn in range(50):
+                backend.commit("demo", (1, 8, 32, 45)[(index + turn) % 4])
+
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(chat, range(8)))
+
+        state = workers[0].load("demo")
+        print(f"  400 interactions sur 4 backends → {state.interactions} comptées, "
+              f"{state.transitions} transitions, historique {len(state.history)}")
+        event_id = workers[1].append_event("demo", "state_change", {"new_state": 8}, "2024-01-01T00:00:00")
+        print(f"  événement #{event_id} relu par un autre worker : {workers[2].events_after(event_id - 1)}")
+        print(workers[3].stats())
+        for backend in workers:
+            backend.close()
@@ -0,0 +1,169 @@
+# flowme_sessions.py - Magasin de sessions FlowMe borné
+"""
+Magasin de sessions avec éviction LRU, expiration par inactivité
+et plafond mémoire, pour isoler l'état de chaque utilisateur
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Configuration environnement
+SESSION_MAX_COUNT = int(os.getenv("FLOWME_SESSION_MAX", "10000"))
+SESSION_IDLE_TTL = float(os.getenv("FLOWME_SESSION_TTL", "1800"))
+SESSION_MAX_BYTES = int(os.getenv("FLOWME_SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def estimate_size(value: Any) -> int:
+    """Estime l'empreinte mémoire d'une session (en octets)"""
+    footprint = getattr(value, "memory_footprint", None)
+    if callable(footprint):
+        return footprint()
+    return sys.getsizeof(value)
+
+
+class _Entry(Generic[T]):
+    __slots__ = ("value", "last_access", "size")
+
+    def __init__(self, value: T, now: float, size: int):
+        self.value = value
+        self.last_access = now
+        self.size = size
+
+
+class SessionStore(Generic[T]):
+    """
+    Magasin de sessions borné, sûr entre threads
+
+    Les sessions sont créées à la demande par `factory(key)` puis évincées :
+    - par inactivité au-delà de `idle_ttl` secondes
+    - en ordre LRU au-delà de `max_sessions` sessions
+    - en ordre LRU tant que l'empreinte estimée dépasse `max_bytes`
+    """
+
+    def __init__(self, factory: Callable[[Hashable], T],
+                 max_sessions: int = SESSION_MAX_COUNT,
+                 idle_ttl: float = SESSION_IDLE_TTL,
+                 max_bytes: int = SESSION_MAX_BYTES,
+                 size_of: Callable[[T], int] = estimate_size,
+                 clock: Callable[[], float] = time.monotonic):
+        self._factory = factory
+        self._max_sessions = max(max_sessions, 1)
+        self._idle_ttl = idle_ttl
+        self._max_bytes = max_bytes
+        self._size_of = size_of
+        self._clock = clock
+
+        self._entries: "OrderedDict[Hashable, _Entry[T]]" = OrderedDict()
+        self._resident_bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = {"lru": 0, "ttl": 0, "memory": 0}
+
+    def get(self, key: Hashable) -> T:
+        """Retourne la session `key`, en la créant si nécessaire"""
+        with self._lock:
+            now = self._clock()
+            self._expire_idle(now)
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._hits += 1
+                self._entries.move_to_end(key)
+                entry.last_access = now
+                # La session a pu grossir depuis le dernier accès
+                self._resize(entry)
+            else:
+                self._misses += 1
+                value = self._factory(key)
+                entry = _Entry(value, now, self._size_of(value))
+                self._entries[key] = entry
+                self._resident_bytes += entry.size
+
+            self._enforce_limits(keep=key)
+            return entry.value
+
+    def peek(self, key: Hashable) -> Optional[T]:
+        """Retourne la session si elle est résidente, sans la créer ni la rafraîchir"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._is_idle(entry, self._clock()):
+                return None
+            return entry.value
+
+    def discard(self, key: Hashable) -> bool:
+        """Supprime une session ; retourne True si elle existait"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return False
+            self._resident_bytes -= entry.size
+            return True
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.peek(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs d'usage du magasin"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "resident_sessions": len(self._entries),
+                "resident_bytes": self._resident_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": dict(self._evictions),
+                "limits": {
+                    "max_sessions": self._max_sessions,
+                    "idle_ttl_seconds": self._idle_ttl,
+                    "max_bytes": self._max_bytes
+                }
+            }
+
+    def _is_idle(self, entry: "_Entry[T]", now: float) -> bool:
+        return self._idle_ttl > 0 and now - entry.last_access > self._idle_ttl
+
+    def _expire_idle(self, now: float):
+        """Évince les sessions inactives (les plus anciennes sont en tête)"""
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if not self._is_idle(entry, now):
+                break
+            self._evict(key, "ttl")
+
+    def _enforce_limits(self, keep: Hashable):
+        """Évince en ordre LRU jusqu'à respecter les plafonds"""
+        while len(self._entries) > self._max_sessions:
+            if not self._evict_oldest("lru", keep):
+                break
+        while self._max_bytes > 0 and self._resident_bytes > self._max_bytes:
+            if not self._evict_oldest("memory", keep):
+                break
+
+    def _evict_oldest(self, reason: str, keep: Hashable) -> bool:
+        for key in self._entries:
+            if key != keep:
+                self._evict(key, reason)
+                return True
+        return False
+
+    def _evict(self, key: Hashable, reason: str):
+        entry = self._entries.pop(key)
+        self._resident_bytes -= entry.size
+        self._evictions[reason] += 1
+
+    def _resize(self, entry: "_Entry[T]"):
+        size = self._size_of(entry.value)
+        self._resident_bytes += size - entry.size
+        entry.size = size
@@ -1,111 +1,168 @@
-from typing import Optional, Dict
+from types import MappingProxyType
+from typing import Optional, Dict, FrozenSet, Iterable, List, Mapping, Tuple, Union
 import re
 
-def detect_flowme_state_improved(message: str, context: Optional[Dict] = None) -> int:
+from flowme_features import MessageFeatures, message_features, register_terms
+
+
+# Dictionnaire des mots-clés pour chaque état (version étendue).
+# L'ordre des états compte : un mot présent dans plusieurs listes est
+# attribué au premier état rencontré.
+STATE_KEYWORDS: Mapping[int, Tuple[str, ...]] = MappingProxyType({
+    # États de Violence/Conflit (priorité haute)
+    32: ("despotisme", "carnage", "violence", "guerre", "haine", "destruction", "massacre",
+         "tyrannie", "oppression", "brutalité", "sauvagerie", "barbarie"),
+
+    14: ("colère", "rage", "fureur", "révolte", "indignation", "combat", "lutte",
+         "résistance", "protestation"),
+
+    # États d'Inclusion/Intégration (pour contradictions)
+    58: ("paradoxe", "contradiction", "ensemble", "inclusion", "intégration", "unité",
+         "synthèse", "réconciliation"),
+
+    # États Positifs/Harmonieux
+    8: ("résonance", "harmonie", "écoute", "subtil", "connexion", "accord", "paix"),
+
+    1: ("émerveillement", "surprise", "découverte", "nouveauté", "étonnement"),
+
+    16: ("amour", "affection", "tendresse", "compassion", "bienveillance", "cœur"),
+
+    22: ("joie", "bonheur", "gaieté", "euphorie", "allégresse", "félicité"),
+
+    # États Neutres/Réflectifs
+    40: ("réflexion", "pensée", "analyse", "méditation", "contemplation"),
+})
+
+# Mots de liaison faibles (ne déclenchent pas automatiquement un état)
+WEAK_KEYWORDS: FrozenSet[str] = frozenset(
+    ["bien", "bon", "très", "assez", "plutôt", "vraiment", "tout", "ça", "cela"]
+)
+
+# Ordre de priorité en cas d'égalité : violence/conflit d'abord
+PRIORITY_ORDER: Tuple[int, ...] = (32, 14, 58, 16, 22, 8, 1, 40)
+
+# États dont la co-présence signale une contradiction (→ Inclusion)
+VIOLENCE_STATES: FrozenSet[int] = frozenset((32, 14))
+LOVE_STATES: FrozenSet[int] = frozenset((16, 8, 22))
+CONTRADICTION_STATE = 58
+
+_WORD_PATTERN = re.compile(r'\b\w+\b')
+
+# Mots recherchés par analyze_message_context (sous-chaînes)
+CONTEXT_VIOLENCE_WORDS: Tuple[str, ...] = ("despotisme", "carnage", "violence", "guerre", "haine")
+CONTEXT_LOVE_WORDS: Tuple[str, ...] = ("amour", "compassion", "tendresse", "cœur")
+
+register_terms(CONTEXT_VIOLENCE_WORDS, CONTEXT_LOVE_WORDS)
+
+
+def _build_keyword_index() -> Mapping[str, Tuple[int, int]]:
     """
-    Détecte l'état de conscience FlowMe basé sur le message et le contexte.
-    Version améliorée avec gestion des contradictions et hiérarchisation.
-    
-    Args:
-        message (str): Message à analyser
-        context (Optional[Dict]): Contexte additionnel (optionnel)
-    
-    Returns:
-        int: Numéro de l'état détecté (1-64)
+    Construit l'index inversé mot → (état, poids).
+
+    Le premier état qui revendique un mot l'emporte, comme dans le
+    parcours séquentiel historique de STATE_KEYWORDS.
     """
-    if not message or not isinstance(message, str):
-        return 1  # État par défaut
-    
-    # Nettoyer et normaliser le message
-    message_clean = message.lower().strip()
-    words = re.findall(r'\b\w+\b', message_clean)
-    
-    if not words:
-        return 1
-    
-    # Dictionnaire des mots-clés pour chaque état (version étendue)
-    state_keywords = {
-        # États de Violence/Conflit (priorité haute)
-        32: ["despotisme", "carnage", "violence", "guerre", "haine", "destruction", "massacre", 
-             "tyrannie", "oppression", "brutalité", "sauvagerie", "barbarie"],
-        
-        14: ["colère", "rage", "fureur", "révolte", "indignation", "combat", "lutte", 
-             "résistance", "protestation"],
-        
-        # États d'Inclusion/Intégration (pour contradictions)
-        58: ["paradoxe", "contradiction", "ensemble", "inclusion", "intégration", "unité",
-             "synthèse", "réconciliation"],
-        
-        # États Positifs/Harmonieux
-        8: ["résonance", "harmonie", "écoute", "subtil", "connexion", "accord", "paix"],
-        
-        1: ["émerveillement", "surprise", "découverte", "nouveauté", "étonnement"],
-        
-        16: ["amour", "affection", "tendresse", "compassion", "bienveillance", "cœur"],
-        
-        22: ["joie", "bonheur", "gaieté", "euphorie", "allégresse", "félicité"],
-        
-        # États Neutres/Réflectifs  
-        40: ["réflexion", "pensée", "analyse", "méditation", "contemplation"],
-        
-        # Mots de liaison faibles (ne déclenchent pas automatiquement un état)
-        "weak": ["bien", "bon", "très", "assez", "plutôt", "vraiment", "tout", "ça", "cela"]
-    }
-    
-    # Scores pour chaque état
-    state_scores = {}
-    detected_words = {"strong": [], "weak": []}
-    
-    # Analyser chaque mot
-    for word in words:
-        word_found = False
-        
-        # Vérifier les mots forts (états spécifiques)
-        for state_id, keywords in state_keywords.items():
-            if isinstance(state_id, int) and word in keywords:
-                if state_id not in state_scores:
-                    state_scores[state_id] = 0
-                state_scores[state_id] += 1
-                detected_words["strong"].append((word, state_id))
-                word_found = True
-                break
-        
-        # Vérifier les mots faibles
-        if not word_found and word in state_keywords.get("weak", []):
-            detected_words["weak"].append(word)
-    
-    # Logique de décision améliorée
+    index: Dict[str, Tuple[int, int]] = {}
+    for state_id, keywords in STATE_KEYWORDS.items():
+        for keyword in keywords:
+            index.setdefault(keyword, (state_id, 1))
+    return MappingProxyType(index)
+
+
+# Index construit une seule fois au chargement du module
+KEYWORD_INDEX: Mapping[str, Tuple[int, int]] = _build_keyword_index()
+
+# Rang de priorité de chaque état (plus petit = plus prioritaire)
+PRIORITY_RANK: Mapping[int, int] = MappingProxyType(
+    {state_id: rank for rank, state_id in enumerate(PRIORITY_ORDER)}
+)
+
+
+def _resolve_state(state_scores: Dict[int, int], has_weak: bool) -> int:
+    """Applique la logique de décision aux scores accumulés."""
     if state_scores:
         # Détecter les contradictions (mots de violence + mots d'amour)
-        has_violence = any(state_id in [32, 14] for state_id in state_scores.keys())
-        has_love = any(state_id in [16, 8, 22] for state_id in state_scores.keys())
-        
-        if has_violence and has_love:
+        if not VIOLENCE_STATES.isdisjoint(state_scores) and not LOVE_STATES.isdisjoint(state_scores):
             # Contradiction détectée → État d'Inclusion
-            return 58
-        
+            return CONTRADICTION_STATE
+
         # Prioriser les états avec les scores les plus élevés
         max_score = max(state_scores.values())
         best_states = [state_id for state_id, score in state_scores.items() if score == max_score]
-        
+
         # En cas d'égalité, prioriser les états de violence/conflit
-        priority_order = [32, 14, 58, 16, 22, 8, 1, 40]
-        for priority_state in priority_order:
-            if priority_state in best_states:
-                return priority_state
-        
+        ranked = [state_id for state_id in best_states if state_id in PRIORITY_RANK]
+        if ranked:
+            return min(ranked, key=PRIORITY_RANK.__getitem__)
+
         # Retourner le premier état trouvé
         return best_states[0]
-    
+
     # Aucun mot-clé fort trouvé
-    if detected_words["weak"]:
+    if has_weak:
         # Mots faibles seulement → État neutre de réflexion
         return 40
-    
+
     # Aucun mot reconnu → État d'émerveillement par défaut
     return 1
 
 
+def detect_flowme_state_improved(message: Union[str, MessageFeatures], context: Optional[Dict] = None) -> int:
+    """
+    Détecte l'état de conscience FlowMe basé sur le message et le contexte.
+    Version améliorée avec gestion des contradictions et hiérarchisation.
+
+    Chaque mot est résolu par une seule consultation de KEYWORD_INDEX.
+
+    Args:
+        message (str | MessageFeatures): Message à analyser (ou ses caractéristiques)
+        context (Optional[Dict]): Contexte additionnel (optionnel)
+
+    Returns:
+        int: Numéro de l'état détecté (1-64)
+    """
+    if isinstance(message, MessageFeatures):
+        words = message.tokens
+    elif not message or not isinstance(message, str):
+        return 1  # État par défaut
+    else:
+        # Nettoyer et normaliser le message
+        words = _WORD_PATTERN.findall(message.lower().strip())
+
+    if not words:
+        return 1
+
+    # Scores pour chaque état
+    state_scores: Dict[int, int] = {}
+    has_weak = False
+    lookup = KEYWORD_INDEX.get
+
+    for word in words:
+        entry = lookup(word)
+        if entry is not None:
+            state_id, weight = entry
+            state_scores[state_id] = state_scores.get(state_id, 0) + weight
+        elif not has_weak and word in WEAK_KEYWORDS:
+            has_weak = True
+
+    return _resolve_state(state_scores, has_weak)
+
+
+def detect_many(messages: Iterable[str], context: Optional[Dict] = None) -> List[int]:
+    """
+    Détecte l'état FlowMe d'une série de messages.
+
+    Args:
+        messages (Iterable[str]): Messages à analyser
+        context (Optional[Dict]): Contexte commun (optionnel)
+
+    Returns:
+        List[int]: États détectés, dans l'ordre des messages
+    """
+    detect = detect_flowme_state_improved
+    return [detect(message, context) for message in messages]
+
+
 def get_state_description(state_id: int) -> str:
     """
     Retourne la description d'un état FlowMe.
@@ -130,23 +187,21 @@ def get_state_description(state_id: int) -> str:
     return descriptions.get(state_id, f"État {state_id} - Description non disponible")
 
 
-def analyze_message_context(message: str) -> Dict:
+def analyze_message_context(message: Union[str, MessageFeatures]) -> Dict:
     """
     Analyse le contexte émotionnel d'un message.
     
     Args:
-        message (str): Message à analyser
+        message (str | MessageFeatures): Message à analyser (ou ses caractéristiques)
     
     Returns:
         Dict: Analyse contextuelle
     """
-    message_clean = message.lower()
+    features = message_features(message)
     
     analysis = {
-        "has_violence": any(word in message_clean for word in 
-                          ["despotisme", "carnage", "violence", "guerre", "haine"]),
-        "has_love": any(word in message_clean for word in 
-                       ["amour", "compassion", "tendresse", "cœur"]),
+        "has_violence": features.any_of(CONTEXT_VIOLENCE_WORDS),
+        "has_love": features.any_of(CONTEXT_LOVE_WORDS),
         "has_contradiction": False,
         "dominant_emotion": "neutre",
         "intensity": "faible"
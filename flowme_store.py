@@ -0,0 +1,321 @@
+# flowme_store.py - Stockage durable des interactions FlowMe (SQLite WAL)
+"""
+Historique des interactions dans une base SQLite locale
+
+- record() ne fait qu'une mise en file non bloquante (aucune latence ajoutée aux requêtes)
+- un thread dédié écrit par lots, dans une seule transaction,
+  dès que le lot est plein ou que l'intervalle de vidage est écoulé
+- mode WAL : les lectures ne bloquent pas les écritures (et inversement)
+- index par session et par date pour les requêtes de consultation
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Configuration environnement
+STORE_ENABLED = os.getenv("FLOWME_STORE", "on").lower() not in ("0", "off", "false", "no")
+STORE_PATH = os.getenv("FLOWME_STORE_PATH", "flowme_interactions.db")
+STORE_BATCH_SIZE = max(int(os.getenv("FLOWME_STORE_BATCH_SIZE", "500")), 1)
+STORE_FLUSH_INTERVAL = float(os.getenv("FLOWME_STORE_FLUSH_INTERVAL", "0.5"))
+STORE_QUEUE_SIZE = int(os.getenv("FLOWME_STORE_QUEUE_SIZE", "50000"))
+# Texte des messages conservé seulement sur demande (longueur toujours enregistrée)
+STORE_MESSAGES = os.getenv("FLOWME_STORE_MESSAGES", "off").lower() in ("1", "on", "true", "yes")
+
+STORE_QUERY_MAX_LIMIT = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interactions (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    session_id TEXT,
+    user_id TEXT,
+    source TEXT NOT NULL,
+    detected_state INTEGER,
+    previous_state INTEGER,
+    flow_quality REAL,
+    message_length INTEGER,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_interactions_session_ts ON interactions (session_id, ts);
+CREATE INDEX IF NOT EXISTS idx_interactions_ts ON interactions (ts);
+"""
+
+COLUMNS = ("ts", "session_id", "user_id", "source", "detected_state", "previous_state",
+           "flow_quality", "message_length", "message")
+
+INSERT = f"INSERT INTO interactions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+Row = Tuple[Any, ...]
+
+_STOP = object()
+
+
+def connect(path: str, schema: str = SCHEMA, check_same_thread: bool = True) -> sqlite3.Connection:
+    """Connexion configurée (WAL, synchronisation allégée) avec schéma à jour"""
+    connection = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=check_same_thread)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA busy_timeout=5000")
+    connection.executescript(schema)
+    return connection
+
+
+class InteractionStore:
+    """
+    Magasin d'interactions à écriture différée
+
+    Les lignes acceptées passent par une file bornée ; si elle est pleine,
+    la ligne est écartée et comptée plutôt que de ralentir l'appelant.
+    """
+
+    def __init__(self, path: str = STORE_PATH, batch_size: int = STORE_BATCH_SIZE,
+                 flush_interval: float = STORE_FLUSH_INTERVAL,
+                 queue_size: int = STORE_QUEUE_SIZE,
+                 store_messages: bool = STORE_MESSAGES):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.store_messages = store_messages
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(queue_size, 1))
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._readers = threading.local()
+        # Connexions de lecture de tous les threads, fermées par close()
+        self._reader_connections: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._counters = {"enqueued": 0, "written": 0, "dropped": 0, "batches": 0, "errors": 0}
+        self._counters_lock = threading.Lock()
+        self._last_batch_ms = 0.0
+
+    def _count(self, name: str, amount: int = 1):
+        with self._counters_lock:
+            self._counters[name] += amount
+
+    # Écriture
+
+    def record(self, source: str, session_id: Optional[str] = None,
+               user_id: Optional[str] = None, detected_state: Optional[int] = None,
+               previous_state: Optional[int] = None, flow_quality: Optional[float] = None,
+               message: Optional[str] = None) -> bool:
+        """Met une interaction en file (sûr depuis n'importe quel thread) ; False si écartée"""
+        row = (
+            time.time(), session_id, user_id, source, detected_state, previous_state,
+            flow_quality, len(message) if message is not None else None,
+            message if self.store_messages else None
+        )
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("enqueued")
+        return True
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="flowme-store-writer",
+                                                daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        connection = connect(self.path)
+        try:
+            while True:
+                rows, markers, stop = self._next_batch()
+                if rows:
+                    self._write_batch(connection, rows)
+                for marker in markers:
+                    marker.set()
+                if stop:
+                    break
+        finally:
+            connection.close()
+
+    def _next_batch(self) -> Tuple[List[Row], List[threading.Event], bool]:
+        """Attend une première ligne puis regroupe jusqu'au lot plein ou à l'échéance"""
+        rows: List[Row] = []
+        markers: List[threading.Event] = []
+        item = self._queue.get()
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            if item is _STOP:
+                return rows, markers, True
+            if isinstance(item, threading.Event):
+                # Demande de vidage : écrire sans attendre l'échéance
+                markers.append(item)
+                return rows, markers, False
+            rows.append(item)
+            if len(rows) >= self.batch_size:
+                return rows, markers, False
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return rows, markers, False
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                return rows, markers, False
+
+    def _write_batch(self, connection: sqlite3.Connection, rows: List[Row]):
+        started = time.perf_counter()
+        try:
+            connection.execute("BEGIN")
+            connection.executemany(INSERT, rows)
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            self._count("errors")
+            self._count("dropped", len(rows))
+            logging.error("Erreur d'écriture du magasin d'interactions: %s", e)
+            return
+        self._last_batch_ms = (time.perf_counter() - started) * 1000
+        with self._counters_lock:
+            self._counters["written"] += len(rows)
+            self._counters["batches"] += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Attend l'écriture de tout ce qui a été mis en file avant l'appel"""
+        if self._writer is None:
+            return True
+        marker = threading.Event()
+        self._queue.put(marker)
+        return marker.wait(timeout)
+
+    # Lecture
+
+    def _reader(self) -> sqlite3.Connection:
+        """Connexion de lecture propre au thread appelant"""
+        connection = getattr(self._readers, "connection", None)
+        if connection is None:
+            # Utilisée par ce seul thread, mais fermée par celui qui arrête le magasin
+            connection = connect(self.path, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            self._readers.connection = connection
+            with self._readers_lock:
+                self._reader_connections.append(connection)
+        return connection
+
+    def query(self, session_id: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Interactions les plus récentes d'abord, filtrées par session et par période (epoch)"""
+        clauses, params = [], []
+        if session_id is not None:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.append(min(max(limit, 1), STORE_QUERY_MAX_LIMIT))
+
+        rows = self._reader().execute(
+            f"SELECT id, {', '.join(COLUMNS)} FROM interactions {where} ORDER BY ts DESC LIMIT ?",
+            params
+        ).fetchall()
+        return [
+            {**dict(row), "timestamp": datetime.fromtimestamp(row["ts"]).isoformat()}
+            for row in rows
+        ]
+
+    def count(self, session_id: Optional[str] = None) -> int:
+        if session_id is None:
+            return self._reader().execute("SELECT COUNT(*) FROM interactions").fetchone()[0]
+        return self._reader().execute(
+            "SELECT COUNT(*) FROM interactions WHERE session_id = ?", (session_id,)
+        ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counters_lock:
+            counters = dict(self._counters)
+        return {
+            **counters,
+            "path": self.path,
+            "queue_size": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "batch_size": self.batch_size,
+            "flush_interval_s": self.flush_interval,
+            "last_batch_ms": round(self._last_batch_ms, 3),
+            "reader_connections": len(self._reader_connections)
+        }
+
+    def close(self):
+        """Écrit les lignes en attente, arrête le thread d'écriture et ferme les lectures"""
+        writer = self._writer
+        if writer is not None:
+            self._queue.put(_STOP)
+            writer.join(timeout=10)
+            self._writer = None
+        with self._readers_lock:
+            connections, self._reader_connections = self._reader_connections, []
+        for connection in connections:
+            connection.close()
+        self._readers = threading.local()
+
+
+_store: Optional[InteractionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[InteractionStore]:
+    """Magasin du processus (None si désactivé par FLOWME_STORE=off)"""
+    global _store
+    if not STORE_ENABLED:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = InteractionStore()
+    return _store
+
+
+def record_interaction(source: str, **fields: Any) -> bool:
+    """Enregistre une interaction si le magasin est activé"""
+    store = get_store()
+    return store.record(source, **fields) if store is not None else False
+
+
+def store_stats() -> Dict[str, Any]:
+    if not STORE_ENABLED:
+        return {"enabled": False}
+    if _store is None:
+        return {"enabled": True, "started": False}
+    return {"enabled": True, "started": True, **_store.stats()}
+
+
+def shutdown_store():
+    """Vide la file d'écriture et ferme la base"""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("🗄️  Test du magasin d'interactions FlowMe")
+    with tempfile.TemporaryDirectory() as directory:
+        store = InteractionStore(os.path.join(directory, "demo.db"), batch_size=100, flush_interval=0.05)
+        for i in range(1000):
+            store.record("demo", session_id=f"s{i % 3}", detected_state=1 + i % 64, message="bonjour")
+        store.flush()
+        print(f"  {store.count()} interactions, {store.count('s1')} pour s1")
+        print(f"  dernière : {store.query(session_id='s1', limit=1)[0]}")
+        print(store.stats())
+        store.close()
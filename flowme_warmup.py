@@ -0,0 +1,110 @@
+# flowme_warmup.py - Préchauffage et auto-tests au démarrage
+"""
+Préchauffage des index et caches FlowMe, exécuté depuis le lifespan FastAPI
+Les sous-systèmes lourds (numpy, networkx) ne sont importés qu'ici ou au premier usage
+"""
+
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# Configuration environnement : "background" (défaut), "sync" ou "off"
+WARMUP_MODE = os.getenv("FLOWME_WARMUP", "background").strip().lower()
+
+WARMUP_MESSAGES = (
+    "je suis triste",
+    "comment changer",
+    "mon lacet est cassé",
+    "je me suis disputé avec ma femme",
+    "bonjour"
+)
+
+
+def _warm_detection():
+    from flowme_states_detection import detect_many
+    detect_many(list(WARMUP_MESSAGES))
+
+
+def _warm_analysis():
+    from flowme_batch import build_analysis
+    for message in WARMUP_MESSAGES:
+        build_analysis(message)
+
+
+def _warm_state_analyzer():
+    from core.flowme_core import _state_analyzer
+    analyzer = _state_analyzer()  # Instance partagée par les moteurs de session
+    analyzer.scoring_tables  # Construit les tables de scoring partagées
+    analyzer.analyze_and_recommend_batch(list(WARMUP_MESSAGES), [{}] * len(WARMUP_MESSAGES), [])
+
+
+def _warm_constellations():
+    from flowme_constellation_system import get_constellation_engine
+    get_constellation_engine()
+
+
+def _run_self_tests():
+    from flowme_states_detection import test_flowme_detection
+    test_flowme_detection()
+
+
+# Étapes dans l'ordre d'exécution : (nom, fonction, obligatoire)
+WARMUP_STEPS = (
+    ("detection_index", _warm_detection, True),
+    ("analysis", _warm_analysis, True),
+    ("state_analyzer", _warm_state_analyzer, False),
+    ("constellations", _warm_constellations, False),
+    ("self_tests", _run_self_tests, True),
+)
+
+
+def new_warmup_report(mode: str = WARMUP_MODE) -> Dict[str, Any]:
+    """Rapport initial, avant exécution"""
+    return {
+        "mode": mode,
+        "status": "disabled" if mode == "off" else "pending",
+        "steps": {},
+        "total_ms": None,
+        "completed_at": None
+    }
+
+
+def warm_up(report: Optional[Dict[str, Any]] = None,
+            steps=WARMUP_STEPS) -> Dict[str, Any]:
+    """
+    Exécute les étapes de préchauffage et met à jour `report` au fil de l'eau
+
+    Toute erreur, import compris, marque l'étape "failed" ; seul l'échec
+    d'une étape obligatoire rend le statut global "failed".
+    """
+    report = report if report is not None else new_warmup_report()
+    report["status"] = "running"
+    started = time.perf_counter()
+    failed = False
+
+    for name, step, required in steps:
+        step_started = time.perf_counter()
+        try:
+            step()
+            outcome = {"status": "ok"}
+        except Exception as e:
+            failed = failed or required
+            outcome = {"status": "failed", "error": str(e) or e.__class__.__name__}
+            logging.warning("Préchauffage FlowMe - étape %s en échec: %s", name, e)
+
+        outcome["ms"] = round((time.perf_counter() - step_started) * 1000, 3)
+        report["steps"][name] = outcome
+
+    report["total_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    report["completed_at"] = datetime.now().isoformat()
+    report["status"] = "failed" if failed else "ready"
+    return report
+
+
+if __name__ == "__main__":
+    import json
+
+    print("🔥 Préchauffage FlowMe")
+    print(json.dumps(warm_up(new_warmup_report("sync")), indent=2, ensure_ascii=False))
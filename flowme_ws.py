@@ -0,0 +1,207 @@
+# flowme_ws.py - Traitement des messages WebSocket hors de la boucle d'événements
+"""
+Files de travail ordonnées par connexion WebSocket
+
+- les traitements s'exécutent sur un pool de threads borné et partagé
+- une connexion traite ses messages un par un, dans l'ordre de réception
+- au-delà de la profondeur maximale, le client reçoit une trame "busy"
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from flowme_metrics import observe_stage
+
+# Configuration environnement
+WS_QUEUE_SIZE = max(int(os.getenv("FLOWME_WS_QUEUE_SIZE", "8")), 1)
+WS_WORKERS = int(os.getenv("FLOWME_WS_WORKERS", "0")) or min(32, (os.cpu_count() or 1) + 4)
+WS_BUSY_RETRY_MS = int(os.getenv("FLOWME_WS_BUSY_RETRY_MS", "250"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_ws_executor() -> ThreadPoolExecutor:
+    """Pool de threads partagé par toutes les connexions (créé au premier message)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=WS_WORKERS, thread_name_prefix="flowme-ws")
+    return _executor
+
+
+def shutdown_ws_executor():
+    """Arrête le pool de threads s'il a été démarré"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+class ConnectionStats:
+    """Compteurs d'une connexion : profondeur de file et latences"""
+
+    __slots__ = ("session_id", "connected_at", "received", "processed", "busy_rejections",
+                 "errors", "max_queue_depth", "last_processing_ms", "total_processing_ms",
+                 "max_processing_ms", "total_wait_ms", "max_wait_ms")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.connected_at = datetime.now().isoformat()
+        self.received = 0
+        self.processed = 0
+        self.busy_rejections = 0
+        self.errors = 0
+        self.max_queue_depth = 0
+        self.last_processing_ms = 0.0
+        self.total_processing_ms = 0.0
+        self.max_processing_ms = 0.0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def record(self, wait_ms: float, processing_ms: float):
+        self.processed += 1
+        self.last_processing_ms = processing_ms
+        self.total_processing_ms += processing_ms
+        self.max_processing_ms = max(self.max_processing_ms, processing_ms)
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def snapshot(self, queue_depth: int) -> Dict[str, Any]:
+        processed = max(self.processed, 1)
+        return {
+            "session_id": self.session_id,
+            "connected_at": self.connected_at,
+            "queue_depth": queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "received": self.received,
+            "processed": self.processed,
+            "busy_rejections": self.busy_rejections,
+            "errors": self.errors,
+            "processing_ms": {
+                "last": round(self.last_processing_ms, 3),
+                "avg": round(self.total_processing_ms / processed, 3),
+                "max": round(self.max_processing_ms, 3)
+            },
+            "queue_wait_ms": {
+                "avg": round(self.total_wait_ms / processed, 3),
+                "max": round(self.max_wait_ms, 3)
+            }
+        }
+
+
+class OrderedWorkQueue:
+    """
+    File de travail d'une connexion
+
+    `handler(item)` est synchrone et s'exécute sur le pool de threads ;
+    il retourne la trame de réponse. Les réponses partent dans l'ordre des messages.
+    """
+
+    def __init__(self, session_id: str, handler: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 send: Callable[[Dict[str, Any]], Awaitable[None]],
+                 maxsize: int = WS_QUEUE_SIZE):
+        self.session_id = session_id
+        self.stats = ConnectionStats(session_id)
+        self._handler = handler
+        self._send = send
+        self._send_lock = asyncio.Lock()
+        self._queue: "asyncio.Queue" = asyncio.Queue(maxsize=maxsize)
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def send(self, frame: Dict[str, Any]):
+        """Envoie une trame (les envois du lecteur et du worker ne s'entrelacent pas)"""
+        async with self._send_lock:
+            await self._send(frame)
+
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    def submit(self, item: Dict[str, Any]) -> bool:
+        """Met un message en file ; False si la file est pleine"""
+        self.stats.received += 1
+        try:
+            self._queue.put_nowait((item, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.stats.busy_rejections += 1
+            return False
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, self._queue.qsize())
+        return True
+
+    def busy_frame(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Trame de contre-pression : le message n'a pas été accepté"""
+        return {
+            "type": "busy",
+            "ref": item.get("id"),
+            "queue_depth": self.depth,
+            "queue_capacity": self._queue.maxsize,
+            "retry_after_ms": WS_BUSY_RETRY_MS
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item, enqueued_at = await self._queue.get()
+            started = time.perf_counter()
+            try:
+                frame = await loop.run_in_executor(get_ws_executor(), self._handler, item)
+            except Exception as e:
+                self.stats.errors += 1
+                frame = {"type": "error", "detail": str(e) or e.__class__.__name__}
+            finished = time.perf_counter()
+
+            wait_ms = (started - enqueued_at) * 1000
+            processing_ms = (finished - started) * 1000
+            self.stats.record(wait_ms, processing_ms)
+            observe_stage("ws_queue_wait", started - enqueued_at)
+            observe_stage("ws_message", finished - started)
+
+            await self.send({
+                **frame,
+                "ref": item.get("id"),
+                "queue_depth": self.depth,
+                "queue_wait_ms": round(wait_ms, 3),
+                "processing_ms": round(processing_ms, 3)
+            })
+
+    async def close(self):
+        """Arrête le worker ; les messages encore en file sont abandonnés"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._worker = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self.stats.snapshot(self.depth)
+
+
+# Connexions ouvertes, par session
+connections: Dict[str, OrderedWorkQueue] = {}
+
+
+def ws_stats() -> Dict[str, Any]:
+    """Statistiques des connexions ouvertes"""
+    snapshots = [work.snapshot() for work in list(connections.values())]
+    return {
+        "connections": len(snapshots),
+        "queue_capacity": WS_QUEUE_SIZE,
+        "workers": WS_WORKERS,
+        "total_queue_depth": sum(snapshot["queue_depth"] for snapshot in snapshots),
+        "sessions": snapshots,
+        "timestamp": datetime.now().isoformat()
+    }
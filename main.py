@@ -4,17 +4,17 @@ FlowMe Backend v3 - Architecture Éthique
 Version avec détection des états qui fonctionne RÉELLEMENT
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-import requests
+from contextlib import asynccontextmanager
 import json
 import os
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 import asyncio
+import logging
 
 # Import du module de détection CORRIGÉ
 try:
@@ -26,23 +26,67 @@ try:
         get_compatible_states,
         analyze_message_flow,
         FLOWME_STATES,
-        FAMILLE_SYMBOLIQUE,
-        test_flowme_detection
+        FAMILLE_SYMBOLIQUE
     )
-    print("✅ Module FlowMe States Detection CORRIGÉ importé avec succès")
-    
-    # Test immédiat pour vérifier que ça fonctionne
-    test_result = detect_flowme_state("je suis triste")
-    print(f"🧪 Test rapide: 'je suis triste' -> État {test_result} ({FLOWME_STATES[test_result]['name']})")
-    
 except ImportError as e:
     print(f"❌ Erreur import flowme_states_detection: {e}")
     raise e  # Arrêter l'application si le module ne fonctionne pas
 
+from flowme_analysis_cache import analysis_cache, freeze_context, normalize_message
+from flowme_batch import (
+    BATCH_MAX_ITEMS, analysis_context, analyze_core, shutdown_batch_executor, stream_batch, wrap_analysis
+)
+from flowme_catalog import Catalog, project_item
+from flowme_http_cache import CachedStaticFiles, RenderedPage
+from flowme_logging import log_interaction, logging_stats, shutdown_logging
+from flowme_metrics import METRICS_ENABLED, PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, render_metrics, stage
+from flowme_nocodb import export_interaction, nocodb_stats, start_nocodb_sync, stop_nocodb_sync
+from flowme_profiling import (
+    ADMIN_TOKEN, PROFILE_SAMPLE_EVERY, PROFILE_TOP, ProfilingMiddleware, flamegraph, is_admin, profile_store,
+    shutdown_profiling
+)
+from flowme_readiness import ReadinessMonitor
+from flowme_store import record_interaction, shutdown_store, store_stats
+from flowme_warmup import WARMUP_MODE, new_warmup_report, warm_up
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Préchauffage et auto-tests au démarrage, libération des ressources à l'arrêt"""
+    app.state.warmup = new_warmup_report(WARMUP_MODE)
+    warmup_task = None
+    
+    # Pages HTML rendues et compressées une seule fois
+    for page in (root_page, interface_page):
+        page.current()
+    
+    if WARMUP_MODE == "sync":
+        await asyncio.to_thread(warm_up, app.state.warmup)
+    elif WARMUP_MODE != "off":
+        # Le serveur accepte les requêtes pendant le préchauffage
+        warmup_task = asyncio.create_task(asyncio.to_thread(warm_up, app.state.warmup))
+    
+    # Auto-test périodique pour /readyz et /health
+    readiness.start()
+    
+    # Export NocoDB en tâche de fond (si NOCODB_TOKEN et TABLE_ID sont définis)
+    await start_nocodb_sync()
+    
+    yield
+    
+    await readiness.stop()
+    await stop_nocodb_sync()
+    if warmup_task is not None and not warmup_task.done():
+        await warmup_task
+    shutdown_batch_executor()
+    shutdown_store()
+    shutdown_profiling()
+    shutdown_logging()
+
 app = FastAPI(
     title="FlowMe Backend v3 - Architecture Éthique FONCTIONNELLE", 
     description="IA éthique avec détection réelle des 64 états de conscience",
-    version="3.0.1"
+    version="3.0.1",
+    lifespan=lifespan
 )
 
 # Configuration CORS
@@ -54,9 +98,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Profilage à la demande (jeton d'administration) et une requête sur N
+if ADMIN_TOKEN or PROFILE_SAMPLE_EVERY > 0:
+    app.add_middleware(ProfilingMiddleware)
+
+# Durée, statut et requêtes en cours par route (/metrics)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Servir les fichiers statiques si disponibles
 if os.path.exists("static"):
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+    app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 
 # Configuration environnement
 NOCODB_URL = os.getenv("NOCODB_URL", "https://app.nocodb.com")
@@ -71,6 +123,9 @@ class AnalyzeRequest(BaseModel):
     context: Optional[dict] = None
     session_history: Optional[List[int]] = None
 
+class BatchAnalyzeRequest(BaseModel):
+    items: List[AnalyzeRequest]
+
 class TransitionRequest(BaseModel):
     current_state: int
     desired_outcome: str
@@ -81,13 +136,14 @@ class FlowAnalysisRequest(BaseModel):
     previous_states: Optional[List[int]] = None
     deep_analysis: Optional[bool] = False
 
-# Variables globales pour les sessions
-active_sessions = {}
+@app.api_route("/", methods=["GET", "HEAD"], response_class=HTMLResponse)
+async def root(request: Request):
+    """Page d'accueil avec test de détection (pré-rendue, ETag + 304)"""
+    return root_page.response(request.headers)
 
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    """Page d'accueil avec test de détection"""
-    # Test en temps réel de la détection
+def render_root_html() -> str:
+    """Page d'accueil : rendue une fois, la détection étant déterministe"""
+    # Test de la détection au rendu
     test_message = "je suis triste"
     detected_state = detect_flowme_state(test_message)
     state_name = FLOWME_STATES[detected_state]["name"]
@@ -153,6 +209,8 @@ async def root():
     </html>
     """
 
+root_page = RenderedPage(render_root_html)
+
 @app.get("/test-detection")
 async def test_detection_endpoint():
     """Endpoint pour tester la détection en profondeur"""
@@ -188,10 +246,10 @@ async def test_detection_endpoint():
         "detection_working": len(set(r["detected_state"] for r in results)) > 1
     }
 
-@app.get("/interface", response_class=HTMLResponse)
-async def get_interface():
-    """Interface FlowMe avec détection fonctionnelle"""
-    return HTMLResponse(get_enhanced_interface_html())
+@app.api_route("/interface", methods=["GET", "HEAD"], response_class=HTMLResponse)
+async def get_interface(request: Request):
+    """Interface FlowMe avec détection fonctionnelle (pré-rendue, ETag + 304)"""
+    return interface_page.response(request.headers)
 
 def get_enhanced_interface_html():
     """Interface FlowMe avec détection VRAIMENT fonctionnelle"""
@@ -624,71 +682,112 @@ def get_enhanced_interface_html():
     </html>
     """
 
+interface_page = RenderedPage(get_enhanced_interface_html)
+
+def _persist_interaction(source: str, message: str, **fields: Any):
+    """Historique local (SQLite) et export NocoDB, tous deux mis en file sans attente"""
+    record_interaction(source, message=message, **fields)
+    export_interaction({
+        "source": source,
+        "message_length": len(message),
+        "timestamp": datetime.now().isoformat(),
+        **fields
+    })
+
 @app.post("/analyze")
-async def analyze_message(request: AnalyzeRequest):
-    """Analyse RÉELLEMENT fonctionnelle d'un message"""
+async def analyze_message(request: AnalyzeRequest, response: Response):
+    """Analyse RÉELLEMENT fonctionnelle d'un message (X-FlowMe-Cache : HIT, MISS, COALESCED, BYPASS)"""
     try:
         if not request.message or not request.message.strip():
             raise HTTPException(status_code=400, detail="Message vide")
         
-        print(f"🔍 ANALYSE RÉELLE: '{request.message}'")  # Debug log
-        
-        # Construire le contexte
-        context = request.context or {}
-        if request.session_history:
-            context["etat_precedent"] = request.session_history[-1]
-        
-        # DÉTECTION RÉELLE avec le nouveau module
-        detected_state = detect_flowme_state(request.message, context)
-        print(f"✅ État détecté: {detected_state}")  # Debug log
-        
-        # Obtenir les informations complètes
-        state_info = get_state_info(detected_state)
-        advice = get_state_advice(detected_state, request.message, context)
+        # DÉTECTION RÉELLE avec le nouveau module, partagée entre messages identiques
+        context = analysis_context(request.context, request.session_history)
+        frozen_context = freeze_context(context)
+        cache_key = (
+            ("analyze", normalize_message(request.message), frozen_context)
+            if frozen_context is not None else None
+        )
+        core, cache_status = await analysis_cache.get_or_compute(
+            cache_key, lambda: analyze_core(request.message, context)
+        )
+        analysis = wrap_analysis(core, request.message, request.user_id)
+        response.headers["X-FlowMe-Cache"] = cache_status
         
-        print(f"📝 Conseil généré: {advice[:50]}...")  # Debug log
+        log_interaction("analyze", user_id=request.user_id,
+                        message_length=len(request.message),
+                        detected_state=analysis["detected_state"], cache=cache_status)
+        _persist_interaction("analyze", request.message, user_id=request.user_id,
+                             detected_state=analysis["detected_state"],
+                             previous_state=request.session_history[-1] if request.session_history else None)
+        log_interaction("analyze_detail", logging.DEBUG,
+                        message=request.message, advice=analysis["advice"])
         
-        return {
-            "status": "success",
-            "detected_state": detected_state,
-            "state_info": {
-                "name": state_info.get("name", "Présence"),
-                "famille_symbolique": state_info.get("famille_symbolique", "Écoute subtile"),
-                "mot_cle": state_info.get("mot_cle", "Présence consciente"),
-                "tension_dominante": state_info.get("tension_dominante", "équilibre"),
-                "posture_adaptative": state_info.get("posture_adaptative", "J'accueille avec attention"),
-                "etats_compatibles": state_info.get("etats_compatibles", [8, 32, 45, 58])
-            },
-            "advice": advice,
-            "timestamp": datetime.now().isoformat(),
-            "user_id": request.user_id,
-            "debug_info": {
-                "message_analyzed": request.message,
-                "detection_method": "flowme_states_detection_v3",
-                "module_working": True
-            }
-        }
+        return analysis
         
     except Exception as e:
-        print(f"❌ Erreur dans analyze_message: {e}")
+        log_interaction("analyze_error", logging.ERROR, error=str(e))
         raise HTTPException(status_code=500, detail=f"Erreur d'analyse: {str(e)}")
 
+@app.get("/analyze/cache")
+async def analyze_cache_stats():
+    """Statistiques du cache d'analyses"""
+    return {"status": "success", **analysis_cache.stats()}
+
+def _model_dict(model: BaseModel) -> Dict[str, Any]:
+    """Champs du modèle : model_dump (pydantic v2), repli sur dict (v1)"""
+    dump = getattr(model, "model_dump", None)
+    return dump() if dump is not None else model.dict()
+
+@app.post("/analyze/batch")
+async def analyze_batch(request: BatchAnalyzeRequest):
+    """
+    Analyse par lots, résultats streamés en NDJSON (une ligne par message)
+    Les erreurs sont signalées ligne par ligne sans interrompre le lot
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Lot vide")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lot trop volumineux: {len(request.items)} messages (max {BATCH_MAX_ITEMS})"
+        )
+    
+    items = [_model_dict(item) for item in request.items]
+    
+    return StreamingResponse(
+        stream_batch(items),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+def _analyze_flow(message: str, previous_states: List[int]) -> Dict[str, Any]:
+    """Analyse complète, mesurée comme l'étape analysis_enhanced"""
+    with stage("analysis_enhanced"):
+        return analyze_message_flow(message=message, previous_states=previous_states)
+
 @app.post("/analyze/enhanced")
-async def analyze_message_enhanced(request: FlowAnalysisRequest):
-    """Analyse complète FONCTIONNELLE avec historique"""
+async def analyze_message_enhanced(request: FlowAnalysisRequest, response: Response):
+    """Analyse complète FONCTIONNELLE avec historique (X-FlowMe-Cache comme /analyze)"""
     try:
         if not request.message or not request.message.strip():
             raise HTTPException(status_code=400, detail="Message vide")
         
-        print(f"🔍 ANALYSE ENHANCED: '{request.message}'")  # Debug
-        
         # Analyse complète avec le nouveau module
-        analysis = analyze_message_flow(
-            message=request.message,
-            previous_states=request.previous_states or []
+        previous_states = list(request.previous_states or [])
+        cache_key = ("analyze_enhanced", normalize_message(request.message), tuple(previous_states))
+        analysis, cache_status = await analysis_cache.get_or_compute(
+            cache_key, lambda: _analyze_flow(request.message, previous_states)
         )
+        response.headers["X-FlowMe-Cache"] = cache_status
         
-        print(f"✅ Analyse terminée - État: {analysis['detected_state']}")  # Debug
+        log_interaction("analyze_enhanced", message_length=len(request.message),
+                        detected_state=analysis["detected_state"],
+                        previous_states=len(previous_states), cache=cache_status)
+        log_interaction("analyze_enhanced_detail", logging.DEBUG, message=request.message)
+        _persist_interaction("analyze_enhanced", request.message,
+                             detected_state=analysis["detected_state"],
+                             previous_state=request.previous_states[-1] if request.previous_states else None)
         
         return {
             "status": "success",
@@ -707,73 +806,185 @@ async def analyze_message_enhanced(request: FlowAnalysisRequest):
         }
         
     except Exception as e:
-        print(f"❌ Erreur dans analyze_message_enhanced: {e}")
+        log_interaction("analyze_enhanced_error", logging.ERROR, error=str(e))
         raise HTTPException(status_code=500, detail=f"Erreur d'analyse avancée: {str(e)}")
 
-# Autres endpoints inchangés...
+# Sondes de disponibilité
+def run_health_diagnostics() -> Dict[str, Any]:
+    """Auto-test complet de la détection (exécuté en tâche de fond, cf. readiness)"""
+    # Tests de détection
+    test_cases = [
+        ("je suis triste", 45),
+        ("comment changer", 7),
+        ("bonjour", 1),
+        ("mon lacet est cassé", 22)
+    ]
+    
+    detection_results = []
+    detection_working = True
+    
+    for message, expected_state in test_cases:
+        detected = detect_flowme_state(message)
+        result_ok = detected != 1 or message == "bonjour"  # Seul "bonjour" devrait donner 1
+        detection_results.append({
+            "message": message,
+            "detected": detected,
+            "expected": expected_state,
+            "working": result_ok
+        })
+        if not result_ok and message != "bonjour":
+            detection_working = False
+    
+    return {
+        "status": "healthy" if detection_working else "degraded",
+        "timestamp": datetime.now().isoformat(),
+        "service": "FlowMe Backend v3",
+        "version": "3.0.1-functional",
+        "components": {
+            "flowme_detection": "✅ FONCTIONNEL" if detection_working else "❌ DÉFAILLANT",
+            "states_loaded": f"✅ {len(FLOWME_STATES)} états",
+            "families_loaded": f"✅ {len(FAMILLE_SYMBOLIQUE)} familles",
+            "api_endpoints": "✅ Opérationnels"
+        },
+        "detection_tests": detection_results,
+        "detection_working": detection_working,
+        "architecture": "Stefan Hoareau - Détection réelle des états"
+    }
+
+readiness = ReadinessMonitor(
+    check=run_health_diagnostics,
+    is_ready=lambda diagnostic: diagnostic.get("detection_working", False)
+)
+
+def _self_test_info(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "computed_at": snapshot["computed_at"],
+        "duration_ms": snapshot["duration_ms"],
+        "age_seconds": readiness.age_seconds()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Métriques au format texte Prometheus (FLOWME_METRICS=0 pour les désactiver)"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Métriques désactivées")
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+# Profils de requêtes (X-FlowMe-Admin-Token requis)
+def _require_admin(request: Request):
+    if not is_admin(request.headers.get("x-flowme-admin-token")):
+        raise HTTPException(status_code=403, detail="Jeton d'administration requis")
+
+@app.get("/debug/profiles")
+async def list_profiles(request: Request):
+    """Profils conservés (les plus récents d'abord) et échantillonnage continu"""
+    _require_admin(request)
+    return {"status": "success", "profiles": profile_store.list(), "sampling": flamegraph.stats()}
+
+@app.get("/debug/profiles/flamegraph")
+async def download_flamegraph(request: Request):
+    """Piles agrégées des requêtes échantillonnées (format folded, µs)"""
+    _require_admin(request)
+    return Response(flamegraph.folded(), media_type="text/plain; charset=utf-8",
+                    headers={"Content-Disposition": 'attachment; filename="flowme-profile.folded"'})
+
+@app.get("/debug/profiles/{profile_id}")
+async def get_profile(request: Request, profile_id: str, top: int = PROFILE_TOP):
+    """Fonctions les plus coûteuses d'un profil (temps cumulé)"""
+    _require_admin(request)
+    session = profile_store.get(profile_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Profil {profile_id} introuvable")
+    return {"status": "success", **session.summary(top)}
+
+@app.get("/debug/profiles/{profile_id}/download")
+async def download_profile(request: Request, profile_id: str):
+    """Profil brut : .pstats (python -m pstats, snakeviz) ou .folded"""
+    _require_admin(request)
+    session = profile_store.get(profile_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Profil {profile_id} introuvable")
+    content, media_type, filename = session.export()
+    return Response(content, media_type=media_type,
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.api_route("/livez", methods=["GET", "HEAD"])
+async def liveness_probe():
+    """Le processus répond : aucun travail effectué"""
+    return Response(content=b'{"status":"alive"}', media_type="application/json")
+
+@app.api_route("/readyz", methods=["GET", "HEAD"])
+async def readiness_probe():
+    """Dernier auto-test en cache (503 tant qu'il n'est pas concluant)"""
+    snapshot = readiness.snapshot()
+    return JSONResponse(
+        status_code=200 if snapshot["ready"] else 503,
+        content={
+            "status": "ready" if snapshot["ready"] else "pending" if snapshot["pending"] else "not_ready",
+            "error": snapshot["error"],
+            "warmup": app.state.warmup["status"],
+            "self_test": _self_test_info(snapshot)
+        }
+    )
+
 @app.get("/health")
 async def health_check():
-    """Vérification avec test de détection en temps réel"""
-    try:
-        # Tests de détection en temps réel
-        test_cases = [
-            ("je suis triste", 45),
-            ("comment changer", 7),
-            ("bonjour", 1),
-            ("mon lacet est cassé", 22)
-        ]
-        
-        detection_results = []
-        detection_working = True
-        
-        for message, expected_state in test_cases:
-            detected = detect_flowme_state(message)
-            result_ok = detected != 1 or message == "bonjour"  # Seul "bonjour" devrait donner 1
-            detection_results.append({
-                "message": message,
-                "detected": detected,
-                "expected": expected_state,
-                "working": result_ok
-            })
-            if not result_ok and message != "bonjour":
-                detection_working = False
-        
+    """Diagnostic complet, servi depuis le dernier auto-test en cache"""
+    snapshot = readiness.snapshot()
+    
+    if snapshot["pending"]:
         return {
-            "status": "healthy" if detection_working else "degraded",
-            "timestamp": datetime.now().isoformat(),
-            "service": "FlowMe Backend v3",
-            "version": "3.0.1-functional",
-            "components": {
-                "flowme_detection": "✅ FONCTIONNEL" if detection_working else "❌ DÉFAILLANT",
-                "states_loaded": f"✅ {len(FLOWME_STATES)} états",
-                "families_loaded": f"✅ {len(FAMILLE_SYMBOLIQUE)} familles",
-                "api_endpoints": "✅ Opérationnels"
-            },
-            "detection_tests": detection_results,
-            "detection_working": detection_working,
-            "architecture": "Stefan Hoareau - Détection réelle des états"
+            "status": "starting",
+            "error": snapshot["error"],
+            "warmup": app.state.warmup["status"],
+            "self_test": _self_test_info(snapshot)
         }
-        
-    except Exception as e:
+    
+    if snapshot["error"] is not None:
         return {
             "status": "unhealthy",
-            "error": str(e),
-            "timestamp": datetime.now().isoformat(),
-            "detection_working": False
+            "error": snapshot["error"],
+            "timestamp": snapshot["computed_at"],
+            "detection_working": False,
+            "self_test": _self_test_info(snapshot)
         }
+    
+    return {
+        **snapshot["diagnostic"],
+        "warmup": app.state.warmup,
+        "logging": logging_stats(),
+        "store": store_stats(),
+        "nocodb": nocodb_stats(),
+        "analysis_cache": analysis_cache.stats(),
+        "self_test": _self_test_info(snapshot)
+    }
 
 # Endpoints simples pour les autres fonctionnalités
+def _build_states_catalog() -> Dict[str, Any]:
+    return {
+        "status": "success",
+        "total_states": len(FLOWME_STATES),
+        "states": [{"id": i, **get_state_info(i)} for i in FLOWME_STATES.keys()],
+        "detection_working": True,
+        "message": "Module de détection entièrement fonctionnel"
+    }
+
+# Catalogue des états : sérialisé une fois, servi avec ETag / Last-Modified
+states_catalog = Catalog(
+    build=_build_states_catalog,
+    project=lambda payload, fields: {
+        **payload, "states": [project_item(state, fields) for state in payload["states"]]
+    },
+    allowed_fields=lambda payload: {field for state in payload["states"] for field in state}
+)
+
 @app.get("/states")
-async def get_all_states():
-    """Liste tous les états avec détection fonctionnelle"""
+async def get_all_states(request: Request, fields: Optional[str] = None):
+    """Liste tous les états (?fields=id,name pour ne garder que certains champs)"""
     try:
-        return {
-            "status": "success",
-            "total_states": len(FLOWME_STATES),
-            "states": [get_state_info(i) for i in FLOWME_STATES.keys()],
-            "detection_working": True,
-            "message": "Module de détection entièrement fonctionnel"
-        }
+        return states_catalog.response(request.headers, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -813,15 +1024,7 @@ async def suggest_state_transition(request: TransitionRequest):
 if __name__ == "__main__":
     import uvicorn
     
-    # Test final avant démarrage
-    print("\n🧪 TEST FINAL DE DÉTECTION:")
-    try:
-        test_flowme_detection()
-        print("✅ Module de détection VALIDÉ - Démarrage du serveur")
-    except Exception as e:
-        print(f"❌ ERREUR DE DÉTECTION: {e}")
-        print("🚨 Le serveur va démarrer mais la détection ne fonctionnera pas")
-    
+    # Les auto-tests de détection s'exécutent dans le lifespan (FLOWME_WARMUP)
     port = int(os.environ.get("PORT", 8000))
     print(f"\n🚀 FlowMe v3 FONCTIONNEL sur le port {port}")
     print(f"🌐 Interface: http://localhost:{port}/interface")
@@ -0,0 +1 @@
+# states/__init__.py - Analyse et définitions des états FlowMe
@@ -4,45 +4,162 @@ Analyseur intelligent des 64 états FlowMe
 Utilise l'IA pour détecter l'état optimal selon le contexte
 """
 
-from typing import Dict, List, Any, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Sequence, Tuple, Union
 import re
 from datetime import datetime
 import logging
 
+import numpy as np
+
+from flowme_features import MessageFeatures, message_features, register_terms
+
+STATE_COUNT = 64
+
+# États adaptés aux situations complexes / simples (cf. _is_complex_state, _is_simple_state)
+COMPLEX_STATES = (32, 45, 58, 64)  # Expression, Vulnérabilité, Inclusion, Ouverture
+SIMPLE_STATES = (1, 8)             # Présence, Résonance
+
+# Pondérations du scoring
+BASE_SCORE = 0.1
+EMOTION_WEIGHT = 0.3
+CONTEXT_BONUS = 0.25
+HISTORY_BONUS = 0.15
+COMPATIBILITY_WEIGHT = 0.2
+LINGUISTIC_BONUS = 0.1
+
+# Indicateurs lexicaux (recherche de sous-chaîne dans le message normalisé)
+GREETING_WORDS = ("bonjour", "salut", "hello")
+FAREWELL_WORDS = ("au revoir", "bye", "à bientôt")
+PROBLEM_WORDS = ("problème", "difficulté", "aide")
+GRATITUDE_WORDS = ("merci", "remercie")
+SHARING_WORDS = ("je pense", "il me semble", "j'ai l'impression")
+URGENT_INDICATORS = ("urgent", "vite", "rapidement", "immédiatement", "maintenant")
+SUPPORT_INDICATORS = ("aide", "soutien", "accompagnement", "difficile", "dur")
+EXPLORATION_INDICATORS = ("pourquoi", "comment", "comprendre", "expliquer", "explorer")
+FORMAL_TONE_WORDS = ("vous", "votre", "monsieur", "madame")
+INFORMAL_TONE_WORDS = ("tu", "ton", "salut")
+FORMAL_INDICATORS = ("vous", "votre", "pourriez", "souhaiteriez")
+INFORMAL_INDICATORS = ("tu", "ton", "peux", "veux")
+TEMPORAL_INDICATORS: Dict[str, Tuple[str, ...]] = {
+    "past": ("était", "avait", "faisait", "hier"),
+    "present": ("est", "ai", "suis", "maintenant", "aujourd'hui"),
+    "future": ("sera", "aura", "fera", "demain", "bientôt")
+}
+
+register_terms(GREETING_WORDS, FAREWELL_WORDS, PROBLEM_WORDS, GRATITUDE_WORDS, SHARING_WORDS,
+               URGENT_INDICATORS, SUPPORT_INDICATORS, EXPLORATION_INDICATORS,
+               FORMAL_TONE_WORDS, INFORMAL_TONE_WORDS, FORMAL_INDICATORS, INFORMAL_INDICATORS,
+               *TEMPORAL_INDICATORS.values())
+
+
+@lru_cache(maxsize=256)
+def _state_mask(states: Tuple[int, ...]) -> np.ndarray:
+    """Vecteur indicateur (64,) des états donnés, en lecture seule"""
+    mask = np.zeros(STATE_COUNT)
+    for state_id in states:
+        if 1 <= state_id <= STATE_COUNT:
+            mask[state_id - 1] = 1.0
+    mask.flags.writeable = False
+    return mask
+
+
+class _ScoringTables:
+    """
+    Tables NumPy précalculées pour scorer les 64 états en quelques opérations vectorielles
+    
+    Les bonus sont pré-multipliés par leur pondération afin que chaque terme
+    ajouté soit identique, au bit près, à celui du calcul scalaire historique.
+    """
+    
+    def __init__(self, emotional_patterns: Dict[str, Dict], compatibility_matrix: Dict[int, List[int]]):
+        # Matrice émotion → état (n_émotions × 64)
+        self.emotions = tuple(emotional_patterns.keys())
+        self.emotion_index = {emotion: i for i, emotion in enumerate(self.emotions)}
+        self.emotion_weights = np.zeros((len(self.emotions), STATE_COUNT))
+        for i, emotion in enumerate(self.emotions):
+            targets = tuple(emotional_patterns[emotion].get("target_states", [1]))
+            self.emotion_weights[i] = _state_mask(targets) * EMOTION_WEIGHT
+        
+        # Matrice de compatibilité 64 × 64 (cf. _get_state_compatibility)
+        compatibility = np.full((STATE_COUNT, STATE_COUNT), 0.3)
+        for state_id, compatible_states in compatibility_matrix.items():
+            for other in compatible_states:
+                if 1 <= state_id <= STATE_COUNT and 1 <= other <= STATE_COUNT:
+                    compatibility[state_id - 1, other - 1] = 0.8
+        np.fill_diagonal(compatibility, 1.0)
+        self.compatibility_bonus = compatibility * COMPATIBILITY_WEIGHT
+        self.default_compatibility_bonus = np.full(STATE_COUNT, 0.3 * COMPATIBILITY_WEIGHT)
+        
+        # Vecteurs de bonus linguistiques
+        self.complex_bonus = _state_mask(COMPLEX_STATES) * LINGUISTIC_BONUS
+        self.simple_bonus = _state_mask(SIMPLE_STATES) * LINGUISTIC_BONUS
+        
+        for table in (self.emotion_weights, self.compatibility_bonus,
+                      self.default_compatibility_bonus, self.complex_bonus, self.simple_bonus):
+            table.flags.writeable = False
+    
+    def compatibility_row(self, last_state: Optional[int]) -> Optional[np.ndarray]:
+        """Bonus de compatibilité avec le dernier état (None si pas d'historique)"""
+        if last_state is None:
+            return None
+        if 1 <= last_state <= STATE_COUNT:
+            return self.compatibility_bonus[last_state - 1]
+        return self.default_compatibility_bonus
+
+
+_scoring_tables: Optional[_ScoringTables] = None
+
+
 class StateAnalyzer:
     """
     Analyseur avancé pour la détection des états FlowMe
+    
+    Les scores des états sont des tableaux NumPy de forme (64,) (ou (N, 64)
+    pour un lot), l'état k occupant l'indice k - 1.
     """
     
     def __init__(self):
         self.emotional_patterns = self._load_emotional_patterns()
         self.contextual_triggers = self._load_contextual_triggers()
         self.state_compatibility_matrix = self._load_compatibility_matrix()
-        
-    def analyze_and_recommend(self, message: str, context: Dict, history: List[int]) -> int:
+        for patterns in self.emotional_patterns.values():
+            register_terms(patterns["keywords"], patterns.get("intensifiers", ()))
+    
+    @property
+    def scoring_tables(self) -> _ScoringTables:
+        """Tables de scoring partagées, construites au premier usage"""
+        global _scoring_tables
+        if _scoring_tables is None:
+            _scoring_tables = _ScoringTables(self.emotional_patterns, self.state_compatibility_matrix)
+        return _scoring_tables
+        
+    def analyze_and_recommend(self, message: Union[str, MessageFeatures], context: Dict,
+                              history: List[int]) -> int:
         """
         Analyse complète et recommandation d'état optimal
         
         Args:
-            message: Message utilisateur
+            message: Message utilisateur (ou ses caractéristiques déjà extraites)
             context: Contexte enrichi
             history: Historique des états
             
         Returns:
             ID de l'état FlowMe recommandé
         """
+        features = message_features(message)
         
         # 1. Analyse émotionnelle
-        emotional_analysis = self._analyze_emotions(message)
+        emotional_analysis = self._analyze_emotions(features)
         
         # 2. Analyse contextuelle
-        contextual_analysis = self._analyze_context(message, context)
+        contextual_analysis = self._analyze_context(features, context)
         
         # 3. Analyse de l'historique
         historical_analysis = self._analyze_history(history)
         
         # 4. Détection des patterns linguistiques
-        linguistic_analysis = self._analyze_linguistics(message)
+        linguistic_analysis = self._analyze_linguistics(features)
         
         # 5. Scoring des états candidats
         state_scores = self._score_all_states(
@@ -56,14 +173,35 @@ class StateAnalyzer:
         optimal_state = self._select_optimal_state(state_scores, context)
         
         logging.info("État recommandé: %d (score: %.2f)", 
-                    optimal_state, state_scores.get(optimal_state, 0))
+                    optimal_state, state_scores[optimal_state - 1])
         
         return optimal_state
     
-    def _analyze_emotions(self, message: str) -> Dict[str, Any]:
+    def analyze_and_recommend_batch(self, messages: Sequence[Union[str, MessageFeatures]], contexts: Sequence[Dict],
+                                    history: List[int]) -> List[int]:
+        """
+        Recommandation d'état pour un lot de messages d'une même session
+        
+        Le scoring des N messages est un unique calcul matriciel (N × 64).
+        """
+        historical_analysis = self._analyze_history(history)
+        
+        emotional, contextual, linguistic = [], [], []
+        for message, context in zip(messages, contexts):
+            features = message_features(message)
+            emotional.append(self._analyze_emotions(features))
+            contextual.append(self._analyze_context(features, context))
+            linguistic.append(self._analyze_linguistics(features))
+        
+        scores = self._score_states_batch(emotional, contextual,
+                                          [historical_analysis] * len(emotional), linguistic)
+        
+        return [self._select_optimal_state(row, context) for row, context in zip(scores, contexts)]
+    
+    def _analyze_emotions(self, message: Union[str, MessageFeatures]) -> Dict[str, Any]:
         """Analyse les émotions dans le message"""
         
-        message_lower = message.lower()
+        features = message_features(message)
         detected_emotions = {}
         
         for emotion_family, patterns in self.emotional_patterns.items():
@@ -71,13 +209,13 @@ class StateAnalyzer:
             matched_words = []
             
             for pattern in patterns["keywords"]:
-                if pattern in message_lower:
+                if features.contains(pattern):
                     matched_words.append(pattern)
                     intensity += patterns.get("base_intensity", 0.5)
             
             # Modificateurs d'intensité
             for intensifier in patterns.get("intensifiers", []):
-                if intensifier in message_lower:
+                if features.contains(intensifier):
                     intensity *= 1.3
             
             if matched_words:
@@ -95,15 +233,16 @@ class StateAnalyzer:
             "emotional_complexity": len(detected_emotions)
         }
     
-    def _analyze_context(self, message: str, context: Dict) -> Dict[str, Any]:
+    def _analyze_context(self, message: Union[str, MessageFeatures], context: Dict) -> Dict[str, Any]:
         """Analyse le contexte situationnel"""
         
+        features = message_features(message)
         analysis = {
-            "interaction_type": self._classify_interaction_type(message),
-            "urgency_level": self._assess_urgency(message, context),
-            "support_need": self._assess_support_need(message),
-            "exploration_depth": self._assess_exploration_need(message),
-            "relational_tone": self._assess_relational_tone(message)
+            "interaction_type": self._classify_interaction_type(features),
+            "urgency_level": self._assess_urgency(features, context),
+            "support_need": self._assess_support_need(features),
+            "exploration_depth": self._assess_exploration_need(features),
+            "relational_tone": self._assess_relational_tone(features)
         }
         
         # Déduction des états appropriés selon le contexte
@@ -156,40 +295,30 @@ class StateAnalyzer:
             "session_length": len(history)
         }
     
-    def _analyze_linguistics(self, message: str) -> Dict[str, Any]:
+    def _analyze_linguistics(self, message: Union[str, MessageFeatures]) -> Dict[str, Any]:
         """Analyse linguistique approfondie"""
         
-        # Analyse de la complexité
-        words = message.split()
-        sentences = [s.strip() for s in message.split('.') if s.strip()]
+        features = message_features(message)
         
-        complexity_score = len(words) / max(len(sentences), 1)
+        # Analyse de la complexité
+        complexity_score = features.word_count / max(features.sentence_count, 1)
         
         # Analyse des modalités
         modalities = {
-            "interrogative": message.count('?'),
-            "exclamative": message.count('!'),
-            "declarative": len(sentences) - message.count('?') - message.count('!')
+            "interrogative": features.questions,
+            "exclamative": features.exclamations,
+            "declarative": features.sentence_count - features.questions - features.exclamations
         }
         
         # Analyse du registre
-        formal_indicators = ['vous', 'votre', 'pourriez', 'souhaiteriez']
-        informal_indicators = ['tu', 'ton', 'peux', 'veux']
-        
-        formality = sum(1 for indicator in formal_indicators if indicator in message.lower())
-        informality = sum(1 for indicator in informal_indicators if indicator in message.lower())
+        formality = features.count_of(FORMAL_INDICATORS)
+        informality = features.count_of(INFORMAL_INDICATORS)
         
         # Analyse temporelle
-        temporal_indicators = {
-            "past": ['était', 'avait', 'faisait', 'hier'],
-            "present": ['est', 'ai', 'suis', 'maintenant', 'aujourd\'hui'],
-            "future": ['sera', 'aura', 'fera', 'demain', 'bientôt']
+        temporal_focus = {
+            time: features.count_of(indicators) for time, indicators in TEMPORAL_INDICATORS.items()
         }
         
-        temporal_focus = {}
-        for time, indicators in temporal_indicators.items():
-            temporal_focus[time] = sum(1 for ind in indicators if ind in message.lower())
-        
         dominant_time = max(temporal_focus.keys(), key=lambda x: temporal_focus[x]) \
                        if any(temporal_focus.values()) else "present"
         
@@ -198,72 +327,101 @@ class StateAnalyzer:
             "modalities": modalities,
             "formality_level": formality - informality,
             "temporal_focus": dominant_time,
-            "word_count": len(words),
-            "sentence_count": len(sentences),
+            "word_count": features.word_count,
+            "sentence_count": features.sentence_count,
             "avg_sentence_length": complexity_score
         }
     
     def _score_all_states(self, emotional: Dict, contextual: Dict, 
-                         historical: Dict, linguistic: Dict) -> Dict[int, float]:
-        """Score tous les états selon les analyses"""
+                         historical: Dict, linguistic: Dict) -> np.ndarray:
+        """Score tous les états selon les analyses (tableau (64,))"""
         
-        state_scores = {}
+        return self._score_states_batch([emotional], [contextual], [historical], [linguistic])[0]
+    
+    def _score_states_batch(self, emotional: Sequence[Dict], contextual: Sequence[Dict],
+                            historical: Sequence[Dict], linguistic: Sequence[Dict]) -> np.ndarray:
+        """Score les 64 états pour N analyses : tableau (N, 64)"""
         
-        # Score de base pour tous les états
-        for state_id in range(1, 65):
-            base_score = 0.1
-            
-            # Bonus émotionnel
-            if emotional["detected"]:
-                for emotion_data in emotional["detected"].values():
-                    if state_id in emotion_data["suggested_states"]:
-                        base_score += emotion_data["intensity"] * 0.3
-            
-            # Bonus contextuel
-            if state_id in contextual.get("suggested_states", []):
-                base_score += 0.25
-            
-            # Bonus historique (préférences utilisateur)
-            if state_id in historical.get("preferred_states", []):
-                base_score += 0.15
-            
-            # Bonus de compatibilité avec l'état précédent
-            recent_states = historical.get("recent_states", [])
-            if recent_states:
-                last_state = recent_states[-1]
-                compatibility = self._get_state_compatibility(last_state, state_id)
-                base_score += compatibility * 0.2
-            
-            # Ajustement selon la complexité linguistique
-            if linguistic["complexity"] > 0.7 and self._is_complex_state(state_id):
-                base_score += 0.1
-            elif linguistic["complexity"] < 0.3 and self._is_simple_state(state_id):
-                base_score += 0.1
-            
-            state_scores[state_id] = min(base_score, 1.0)
+        tables = self.scoring_tables
+        count = len(emotional)
+        if count == 0:
+            return np.zeros((0, STATE_COUNT))
         
-        return state_scores
+        # Score de base pour tous les états
+        scores = np.full((count, STATE_COUNT), BASE_SCORE)
+        
+        # Bonus émotionnel : intensités (N × émotions) appliquées à la matrice émotion → état,
+        # une émotion après l'autre pour conserver l'ordre d'accumulation
+        intensities = np.zeros((count, len(tables.emotions)))
+        for row, analysis in enumerate(emotional):
+            for emotion, emotion_data in analysis["detected"].items():
+                index = tables.emotion_index.get(emotion)
+                if index is not None:
+                    intensities[row, index] = emotion_data["intensity"]
+        for index in range(len(tables.emotions)):
+            scores += intensities[:, index:index + 1] * tables.emotion_weights[index]
+        
+        # Bonus contextuel
+        scores += np.stack([
+            _state_mask(tuple(analysis.get("suggested_states", []))) for analysis in contextual
+        ]) * CONTEXT_BONUS
+        
+        # Bonus historique (préférences utilisateur)
+        scores += np.stack([
+            _state_mask(tuple(analysis.get("preferred_states", []))) for analysis in historical
+        ]) * HISTORY_BONUS
+        
+        # Bonus de compatibilité avec l'état précédent
+        for row, analysis in enumerate(historical):
+            recent_states = analysis.get("recent_states", [])
+            compatibility = tables.compatibility_row(recent_states[-1] if recent_states else None)
+            if compatibility is not None:
+                scores[row] += compatibility
+        
+        # Ajustement selon la complexité linguistique
+        complexity = np.array([analysis["complexity"] for analysis in linguistic], dtype=float)
+        scores += (complexity > 0.7)[:, None] * tables.complex_bonus
+        scores += (complexity < 0.3)[:, None] * tables.simple_bonus
+        
+        return np.minimum(scores, 1.0)
+    
+    def _rank_states(self, scores: np.ndarray) -> np.ndarray:
+        """Indices des états par score décroissant (égalités : plus petit ID d'abord)"""
+        return np.argsort(-scores, kind="stable")
+    
+    def top_states(self, scores: np.ndarray, k: int,
+                   exclude: Sequence[int] = ()) -> List[Tuple[int, float]]:
+        """Les k meilleurs états (ID, score), hors états exclus"""
+        
+        ranked = []
+        for index in self._rank_states(scores):
+            state_id = int(index) + 1
+            if state_id in exclude:
+                continue
+            ranked.append((state_id, float(scores[index])))
+            if len(ranked) == k:
+                break
+        return ranked
     
-    def _select_optimal_state(self, scores: Dict[int, float], context: Dict) -> int:
+    def _select_optimal_state(self, scores: np.ndarray, context: Dict) -> int:
         """Sélectionne l'état optimal selon les scores et contraintes"""
         
         # Filtrer les états avec score trop faible
-        viable_states = {k: v for k, v in scores.items() if v > 0.2}
+        ranked = self._rank_states(scores)
+        viable_states = ranked[scores[ranked] > 0.2]
         
-        if not viable_states:
+        if not len(viable_states):
             return 1  # Fallback vers Présence
         
         # Sélection du meilleur score
-        optimal_state = max(viable_states.keys(), key=lambda x: viable_states[x])
+        optimal_state = int(viable_states[0]) + 1
         
         # Validation finale
         if self._validate_state_choice(optimal_state, context):
             return optimal_state
         else:
             # Fallback vers le deuxième meilleur ou Présence
-            sorted_states = sorted(viable_states.keys(), 
-                                 key=lambda x: viable_states[x], reverse=True)
-            return sorted_states[1] if len(sorted_states) > 1 else 1
+            return int(viable_states[1]) + 1 if len(viable_states) > 1 else 1
     
     def _load_emotional_patterns(self) -> Dict[str, Dict]:
         """Charge les patterns émotionnels"""
@@ -333,55 +491,54 @@ class StateAnalyzer:
             64: [1, 45, 32, 8]    # Ouverture compatible avec exploration
         }
     
-    def _classify_interaction_type(self, message: str) -> str:
+    def _classify_interaction_type(self, message: Union[str, MessageFeatures]) -> str:
         """Classifie le type d'interaction"""
         
-        if any(word in message.lower() for word in ["bonjour", "salut", "hello"]):
+        features = message_features(message)
+        if features.any_of(GREETING_WORDS):
             return "greeting"
-        elif any(word in message.lower() for word in ["au revoir", "bye", "à bientôt"]):
+        elif features.any_of(FAREWELL_WORDS):
             return "farewell"
-        elif "?" in message:
+        elif features.questions:
             return "question"
-        elif any(word in message.lower() for word in ["problème", "difficulté", "aide"]):
+        elif features.any_of(PROBLEM_WORDS):
             return "problem"
-        elif any(word in message.lower() for word in ["merci", "remercie"]):
+        elif features.any_of(GRATITUDE_WORDS):
             return "gratitude"
-        elif any(word in message.lower() for word in ["je pense", "il me semble", "j'ai l'impression"]):
+        elif features.any_of(SHARING_WORDS):
             return "sharing"
         else:
             return "statement"
     
-    def _assess_urgency(self, message: str, context: Dict) -> float:
+    def _assess_urgency(self, message: Union[str, MessageFeatures], context: Dict) -> float:
         """Évalue le niveau d'urgence"""
         
-        urgent_indicators = ["urgent", "vite", "rapidement", "immédiatement", "maintenant"]
-        urgency_score = sum(1 for indicator in urgent_indicators 
-                          if indicator in message.lower())
+        features = message_features(message)
+        urgency_score = features.count_of(URGENT_INDICATORS)
         
         # Ajustement selon la ponctuation
-        if message.count("!") > 1:
+        if features.exclamations > 1:
             urgency_score += 0.5
         
         return min(urgency_score / 3, 1.0)
     
-    def _assess_support_need(self, message: str) -> float:
+    def _assess_support_need(self, message: Union[str, MessageFeatures]) -> float:
         """Évalue le besoin de soutien"""
         
-        support_indicators = ["aide", "soutien", "accompagnement", "difficile", "dur"]
-        return min(sum(1 for ind in support_indicators if ind in message.lower()) / 3, 1.0)
+        return min(message_features(message).count_of(SUPPORT_INDICATORS) / 3, 1.0)
     
-    def _assess_exploration_need(self, message: str) -> float:
+    def _assess_exploration_need(self, message: Union[str, MessageFeatures]) -> float:
         """Évalue le besoin d'exploration"""
         
-        exploration_indicators = ["pourquoi", "comment", "comprendre", "expliquer", "explorer"]
-        return min(sum(1 for ind in exploration_indicators if ind in message.lower()) / 3, 1.0)
+        return min(message_features(message).count_of(EXPLORATION_INDICATORS) / 3, 1.0)
     
-    def _assess_relational_tone(self, message: str) -> str:
+    def _assess_relational_tone(self, message: Union[str, MessageFeatures]) -> str:
         """Évalue le ton relationnel"""
         
-        if any(word in message.lower() for word in ["vous", "votre", "monsieur", "madame"]):
+        features = message_features(message)
+        if features.any_of(FORMAL_TONE_WORDS):
             return "formal"
-        elif any(word in message.lower() for word in ["tu", "ton", "salut"]):
+        elif features.any_of(INFORMAL_TONE_WORDS):
             return "informal"
         else:
             return "neutral"
@@ -417,7 +574,7 @@ class StateAnalyzer:
             return "initial"
         
         # Analyser les familles d'états
-        from .state_definitions import FLOWME_STATES
+        from states.state_definitions import FLOWME_STATES
         
         recent_families = []
         for state_id in history[-3:]:
@@ -450,14 +607,12 @@ class StateAnalyzer:
     def _is_complex_state(self, state_id: int) -> bool:
         """Détermine si un état est adapté aux situations complexes"""
         # États plus sophistiqués pour les situations complexes
-        complex_states = [32, 45, 58, 64]  # Expression, Vulnérabilité, Inclusion, Ouverture
-        return state_id in complex_states
+        return state_id in COMPLEX_STATES
     
     def _is_simple_state(self, state_id: int) -> bool:
         """Détermine si un état est adapté aux situations simples"""
         # États plus directs pour les situations simples
-        simple_states = [1, 8]  # Présence, Résonance
-        return state_id in simple_states
+        return state_id in SIMPLE_STATES
     
     def _validate_state_choice(self, state_id: int, context: Dict) -> bool:
         """Valide le choix d'état selon le contexte"""
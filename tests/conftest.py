@@ -0,0 +1,6 @@
+# tests/conftest.py - Modules FlowMe importés depuis la racine du dépôt
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("FLOWME_LOG_LEVEL", "WARNING")
@@ -0,0 +1,51 @@
+# tests/test_constellation.py - Analyse de constellation incrémentale contre le calcul complet
+import random
+
+import pytest
+
+from flowme_constellation_system import STATE_COUNT, ConstellationAccumulator, get_constellation_engine
+
+COMMON_STATES = (1, 7, 8, 14, 22, 32, 39, 45, 58, 64)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return get_constellation_engine()
+
+
+@pytest.mark.parametrize("sequence", [
+    [],
+    [45],
+    [1, 45],
+    [1, 45, 32, 58],       # Pattern de guérison
+    [7, 22, 64, 32],       # Pattern créatif
+    [1, 7, 1, 8, 1],       # Spirale d'écoute
+    [14, 32, 45, 58, 1],   # Intégration émotionnelle
+    [0, 65, 66, 1],        # États hors des familles connues
+])
+def test_accumulator_matches_batch_on_known_sequences(engine, sequence):
+    accumulator = ConstellationAccumulator(engine)
+    accumulator.extend(sequence)
+    assert accumulator.constellation() == engine.analyze_constellation(list(sequence))
+
+
+def test_accumulator_matches_batch_after_every_append(engine):
+    rng = random.Random(7)
+    candidates = list(range(0, STATE_COUNT + 3))
+    for _ in range(300):
+        accumulator = ConstellationAccumulator(engine)
+        sequence = []
+        for _ in range(rng.randint(1, 30)):
+            state = rng.choice(COMMON_STATES) if rng.random() < 0.7 else rng.choice(candidates)
+            sequence.append(state)
+            accumulator.append(state)
+            assert accumulator.constellation() == engine.analyze_constellation(list(sequence)), sequence
+
+
+def test_reset_empties_the_sequence(engine):
+    accumulator = ConstellationAccumulator(engine)
+    accumulator.extend([1, 45, 32, 58])
+    accumulator.reset()
+    assert len(accumulator) == 0
+    accumulator.extend([7, 22, 64])
+    assert accumulator.constellation() == engine.analyze_constellation([7, 22, 64])
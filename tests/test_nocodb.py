@@ -0,0 +1,147 @@
+# tests/test_nocodb.py - Envoi groupé, nouvelles tentatives et débordement NocoDB
+import asyncio
+import json
+import random
+
+import httpx
+
+from flowme_nocodb import CircuitBreaker, NocoDBSync, SpillBuffer
+
+
+class StubNocoDB:
+    """Répond à POST /api/v2/tables/{table}/records ; `statuses` force les réponses suivantes"""
+
+    def __init__(self):
+        self.batches = []
+        self.statuses = []
+        self.down = False
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        assert request.method == "POST"
+        assert request.url.path == "/api/v2/tables/test/records"
+        assert request.headers["xc-token"] == "test-token"
+        if self.statuses:
+            return httpx.Response(self.statuses.pop(0), json={"msg": "stub"})
+        if self.down:
+            return httpx.Response(503, json={"msg": "Service Unavailable"})
+        rows = json.loads(request.content)
+        self.batches.append(rows)
+        return httpx.Response(200, json=[{"Id": i + 1} for i in range(len(rows))])
+
+    @property
+    def received(self):
+        return [row for batch in self.batches for row in batch]
+
+
+def _sync(stub, tmp_path, breaker=None, **options):
+    options.setdefault("batch_size", 100)
+    return NocoDBSync(base_url="http://nocodb.test", token="test-token", table_id="test",
+                      flush_interval=60, backoff_base=0, backoff_max=0,
+                      breaker=breaker or CircuitBreaker(threshold=3, reset_timeout=60),
+                      spill=SpillBuffer(str(tmp_path / "spill.jsonl")),
+                      rng=random.Random(0), transport=httpx.MockTransport(stub), **options)
+
+
+def _run(sync, scenario):
+    async def main():
+        await sync.start()
+        try:
+            await scenario()
+        finally:
+            await sync.stop()
+    asyncio.run(main())
+
+
+def test_records_are_sent_in_batches(tmp_path):
+    stub = StubNocoDB()
+    sync = _sync(stub, tmp_path)
+
+    async def scenario():
+        for i in range(250):
+            assert sync.enqueue({"n": i})
+        await sync.flush()
+
+    _run(sync, scenario)
+    assert [len(batch) for batch in stub.batches] == [100, 100, 50]
+    assert [row["n"] for row in stub.received] == list(range(250))
+    stats = sync.stats()
+    assert (stats["sent"], stats["batches"], stats["retries"]) == (250, 3, 0)
+
+
+def test_transient_errors_are_retried(tmp_path):
+    stub = StubNocoDB()
+    stub.statuses = [503, 429]
+    sync = _sync(stub, tmp_path, max_retries=3)
+
+    async def scenario():
+        for i in range(10):
+            sync.enqueue({"n": i})
+        await sync.flush()
+
+    _run(sync, scenario)
+    assert len(stub.batches) == 1 and len(stub.received) == 10
+    stats = sync.stats()
+    assert (stats["retries"], stats["sent"], stats["spilled"]) == (2, 10, 0)
+    assert stats["breaker"]["state"] == "closed"
+
+
+def test_outage_spills_to_disk_then_recovers(tmp_path):
+    stub = StubNocoDB()
+    stub.down = True
+    breaker = CircuitBreaker(threshold=2, reset_timeout=0.05)
+    sync = _sync(stub, tmp_path, breaker=breaker, batch_size=20, max_retries=1)
+
+    async def scenario():
+        for i in range(50):
+            sync.enqueue({"n": i})
+        await sync.flush()
+        assert breaker.state == "open"
+        assert sync.stats()["spilled"] == 50 and sync.spill.size() > 0
+        assert stub.received == []
+
+        stub.down = False
+        await asyncio.sleep(0.1)
+        await sync.flush()
+
+    _run(sync, scenario)
+    assert sorted(row["n"] for row in stub.received) == list(range(50))
+    stats = sync.stats()
+    assert (stats["recovered"], stats["dropped"], stats["spill_bytes"]) == (50, 0, 0)
+    assert breaker.state == "closed"
+
+
+def test_revoked_token_keeps_records(tmp_path):
+    stub = StubNocoDB()
+    stub.statuses = [401]
+    breaker = CircuitBreaker(threshold=5, reset_timeout=0.05)
+    sync = _sync(stub, tmp_path, breaker=breaker)
+
+    async def scenario():
+        for i in range(5):
+            sync.enqueue({"n": i})
+        await sync.flush()
+        assert breaker.state == "open"
+        assert (sync.stats()["auth_failures"], sync.stats()["spilled"]) == (1, 5)
+
+        await asyncio.sleep(0.1)
+        await sync.flush()
+
+    _run(sync, scenario)
+    assert sorted(row["n"] for row in stub.received) == list(range(5))
+    assert sync.stats()["rejected"] == 0
+
+
+def test_invalid_batch_is_rejected_without_retry(tmp_path):
+    stub = StubNocoDB()
+    stub.statuses = [422]
+    sync = _sync(stub, tmp_path, max_retries=3)
+
+    async def scenario():
+        for i in range(5):
+            sync.enqueue({"n": i})
+        await sync.flush()
+
+    _run(sync, scenario)
+    stats = sync.stats()
+    assert (stats["rejected"], stats["retries"], stats["spilled"]) == (5, 0, 0)
+    assert stub.received == []